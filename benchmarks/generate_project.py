@@ -0,0 +1,230 @@
+import os
+import sys
+import random
+import argparse
+import shutil
+import toml
+
+sys.path.insert(0, os.path.join(os.path.dirname(os.path.abspath(__file__)), "..", "engine_editor"))
+
+from project import create_project
+
+# Written into every generated project, only folders holding it are replaced without --force
+GENERATED_MARKER = ".arpg_generated"
+
+
+def make_image_bytes(rng, width, height):
+    # Half flat color rows, half noise, so the PNGs compress like real sprite sheets
+    color = bytes([rng.randrange(256), rng.randrange(256), rng.randrange(256), 255])
+    rows = []
+    for y in range(height):
+        if (y // 8) % 2:
+            rows.append(rng.randbytes(width * 4))
+        else:
+            rows.append(color * width)
+    return b"".join(rows)
+
+
+def make_layer_chunks(rng, map_size, density):
+    import numpy as np
+    from tilechunks import CHUNK_SIZE, encode_chunk, chunk_name
+
+    # Patches of a few ground tiles with scattered details, like a painted map; density < 1 leaves cells empty
+    gen = np.random.default_rng(rng.randrange(2**32))
+    chunks = {}
+    count = (map_size + CHUNK_SIZE - 1) // CHUNK_SIZE
+    for cy in range(count):
+        for cx in range(count):
+            patches = gen.integers(1, 17, size=(CHUNK_SIZE // 8, CHUNK_SIZE // 8), dtype=np.uint32)
+            ids = np.kron(patches, np.ones((8, 8), dtype=np.uint32))
+            details = gen.random((CHUNK_SIZE, CHUNK_SIZE)) < 0.05
+            ids[details] = gen.integers(17, 65, size=int(details.sum()), dtype=np.uint32)
+            if density < 1:
+                ids[gen.random((CHUNK_SIZE, CHUNK_SIZE)) >= density] = 0
+            # Cells past the map edge stay empty
+            ids[map_size - cy * CHUNK_SIZE :, :] = 0
+            ids[:, map_size - cx * CHUNK_SIZE :] = 0
+            if ids.any():
+                chunks[chunk_name((cx, cy))] = encode_chunk(ids)
+    return chunks
+
+
+def save_png(path, width, height, pixels):
+    from PySide6.QtGui import QImage
+
+    image = QImage(pixels, width, height, width * 4, QImage.Format.Format_RGBA8888)
+    if not image.save(path, "PNG"):
+        raise OSError(f"Failed to write {path}")
+
+
+def generate_project(
+    path,
+    images=100,
+    image_size=(256, 256),
+    sheets=20,
+    states=4,
+    frames=8,
+    stages=5,
+    stage_size=64,
+    layers=0,
+    actors=20,
+    frame_size=(16, 16),
+    atlas=False,
+    transcode="",
+    seed=0,
+    force=False,
+):
+    rng = random.Random(seed)
+    width, height = image_size
+    frame_width, frame_height = frame_size
+
+    prepare_output(path, force)
+    create_project(path)
+
+    if atlas or transcode:
+        project_file = os.path.join(path, "project.toml")
+        with open(project_file, "r", encoding="utf-8") as f:
+            project = toml.load(f)
+        if atlas:
+            project["atlas"] = {"enabled": True}
+        if transcode:
+            project["transcode"] = {"format": transcode}
+        with open(project_file, "w", encoding="utf-8") as f:
+            toml.dump(project, f)
+
+    for folder in ("stages", "actors", "spritesheets"):
+        os.makedirs(os.path.join(path, folder), exist_ok=True)
+
+    image_names = []
+    for i in range(images):
+        name = f"sprites/image_{i}.png" if i % 2 else f"image_{i}.png"
+        os.makedirs(os.path.dirname(os.path.join(path, "assets", name)), exist_ok=True)
+        save_png(os.path.join(path, "assets", name), width, height, make_image_bytes(rng, width, height))
+        image_names.append(name)
+
+    columns = max(1, width // frame_width)
+    rows = max(1, height // frame_height)
+
+    sheet_names = []
+    for i in range(sheets):
+        data = {
+            "image_path": image_names[i % len(image_names)] if image_names else "",
+            "fps": 12,
+            "width": frame_width,
+            "height": frame_height,
+            "states": {},
+        }
+        for s in range(states):
+            cells = [rng.randrange(columns * rows) for _ in range(frames)]
+            data["states"][f"state_{s}"] = {
+                "fps": rng.choice((6, 8, 12, 24)),
+                "frames": [[(c % columns) * frame_width, (c // columns) * frame_height] for c in cells],
+            }
+
+        name = f"sheet_{i}.toml"
+        with open(os.path.join(path, "spritesheets", name), "w", encoding="utf-8") as f:
+            toml.dump(data, f)
+        sheet_names.append(name)
+
+    actor_names = []
+    for i in range(actors):
+        data = {
+            "name": f"actor_{i}",
+            "spritesheet": sheet_names[i % len(sheet_names)] if sheet_names else "",
+            "speed": rng.randint(1, 8),
+            "width": frame_width,
+            "height": frame_height,
+        }
+        name = f"actor_{i}.toml"
+        with open(os.path.join(path, "actors", name), "w", encoding="utf-8") as f:
+            toml.dump(data, f)
+        actor_names.append(name)
+
+    for i in range(stages):
+        data = {
+            "name": f"stage_{i}",
+            "width": stage_size,
+            "height": stage_size,
+            "actors": [
+                {"actor": rng.choice(actor_names), "x": rng.randrange(stage_size * 8), "y": rng.randrange(stage_size * 8)}
+                for _ in range(min(len(actor_names), 10))
+            ],
+        }
+        if layers:
+            from documentsaver import save_document
+
+            # The ground layer is full, the ones above it get sparser
+            data["tile_size"] = 8
+            data["tileset"] = image_names[0] if image_names else ""
+            data["layers"] = [
+                {"name": f"layer_{l}", "visible": True, "chunks": make_layer_chunks(rng, stage_size, 1 / (1 + 4 * l))}
+                for l in range(layers)
+            ]
+            # Written like the stage editor saves it
+            save_document(os.path.join(path, "stages", f"stage_{i}.toml"), data)
+        else:
+            with open(os.path.join(path, "stages", f"stage_{i}.toml"), "w", encoding="utf-8") as f:
+                toml.dump(data, f)
+
+
+def prepare_output(path, force=False):
+    if os.path.lexists(path):
+        if not os.path.isdir(path) or os.path.islink(path):
+            raise FileExistsError(f"{path} exists and is not a directory")
+        if os.listdir(path) and not force and not os.path.isfile(os.path.join(path, GENERATED_MARKER)):
+            raise FileExistsError(f"{path} is not empty and was not made by this generator, pass --force to replace it")
+        shutil.rmtree(path)
+
+    os.makedirs(path)
+    with open(os.path.join(path, GENERATED_MARKER), "w", encoding="utf-8") as f:
+        f.write("generated by benchmarks/generate_project.py, replaced on the next run\n")
+
+
+def parse_size(text):
+    width, _, height = text.lower().partition("x")
+    return int(width), int(height or width)
+
+
+def add_generator_arguments(parser):
+    parser.add_argument("--images", type=int, default=100, help="number of images in assets/")
+    parser.add_argument("--image-size", type=parse_size, default=(256, 256), help="image size, e.g. 256x256")
+    parser.add_argument("--sheets", type=int, default=20, help="number of spritesheets")
+    parser.add_argument("--states", type=int, default=4, help="animation states per spritesheet")
+    parser.add_argument("--frames", type=int, default=8, help="frames per animation state")
+    parser.add_argument("--stages", type=int, default=5, help="number of stage TOMLs")
+    parser.add_argument("--stage-size", type=int, default=64, help="stage width and height in tiles")
+    parser.add_argument("--layers", type=int, default=0, help="tilemap layers per stage")
+    parser.add_argument("--actors", type=int, default=20, help="number of actor TOMLs")
+    parser.add_argument("--atlas", action="store_true", help="pack the spritesheets into atlas pages on export")
+    parser.add_argument("--transcode", choices=("", "qoi", "rgba"), default="", help="transcode sheet images on export")
+    parser.add_argument("--seed", type=int, default=0)
+
+
+def generator_kwargs(args):
+    return {
+        "images": args.images,
+        "image_size": args.image_size,
+        "sheets": args.sheets,
+        "states": args.states,
+        "frames": args.frames,
+        "stages": args.stages,
+        "stage_size": args.stage_size,
+        "layers": args.layers,
+        "actors": args.actors,
+        "atlas": args.atlas,
+        "transcode": args.transcode,
+        "seed": args.seed,
+    }
+
+
+if __name__ == "__main__":
+    parser = argparse.ArgumentParser(description="Generate a synthetic Arpg project for benchmarking.")
+    parser.add_argument("path", help="output directory, replaced if it was generated before")
+    parser.add_argument("--force", action="store_true", help="replace the output directory even if it was not generated")
+    add_generator_arguments(parser)
+    args = parser.parse_args()
+
+    try:
+        generate_project(args.path, force=args.force, **generator_kwargs(args))
+    except FileExistsError as e:
+        parser.error(str(e))
@@ -0,0 +1,288 @@
+import os
+import sys
+import json
+import time
+import argparse
+import platform
+import statistics
+import subprocess
+import struct
+import tempfile
+import tomllib
+import zipfile
+import toml
+
+sys.path.insert(0, os.path.join(os.path.dirname(os.path.abspath(__file__)), "..", "engine_editor"))
+os.environ.setdefault("QT_QPA_PLATFORM", "offscreen")
+
+import exporter
+import tilemapcompiler
+import spritesheetcompiler
+from generate_project import generate_project, add_generator_arguments, generator_kwargs
+
+RESULTS_VERSION = 1
+
+
+def measure(func, repeat):
+    samples = []
+    for _ in range(repeat):
+        start = time.perf_counter()
+        func()
+        samples.append(time.perf_counter() - start)
+    return {"min": min(samples), "median": statistics.median(samples), "samples": samples}
+
+
+def touch_one_sheet(project_path):
+    folder = os.path.join(project_path, "spritesheets")
+    names = sorted(os.listdir(folder))
+    if names:
+        with open(os.path.join(folder, names[0]), "a", encoding="utf-8") as f:
+            f.write("\n")
+
+
+def bench_spritesheet_load(project_path, repeat):
+    from PySide6.QtCore import QEventLoop
+    from PySide6.QtWidgets import QApplication
+    from spritesheeteditor import SpritesheetEditor
+
+    app = QApplication.instance() or QApplication([])
+
+    folder = os.path.join(project_path, "spritesheets")
+    paths = [os.path.join(folder, name) for name in sorted(os.listdir(folder))]
+    editor = SpritesheetEditor("", project_path)
+
+    def load_all():
+        # The image decodes in the background, wait for it so the load is measured end to end
+        for path in paths:
+            editor.toml_path = path
+            editor.load()
+            while editor.image_loader.is_loading():
+                app.processEvents(QEventLoop.AllEvents, 10)
+        app.processEvents()
+
+    return measure(load_all, repeat)
+
+
+def bench_tilemap_decode(project_path, repeat):
+    # Every chunk of every stage, from the TOML the editor saves and from the binary tilemaps in the archive
+    from tilechunks import decode_chunk
+
+    folder = os.path.join(project_path, "stages")
+    texts = []
+    for name in sorted(os.listdir(folder)):
+        with open(os.path.join(folder, name), "rb") as f:
+            texts.append(f.read())
+
+    with zipfile.ZipFile(os.path.join(project_path, exporter.ARCHIVE_NAME)) as archive:
+        blobs = [archive.read(name) for name in archive.namelist() if name.endswith(tilemapcompiler.BINARY_SUFFIX)]
+
+    def decode_toml():
+        for text in texts:
+            for layer in tomllib.loads(text.decode("utf-8")).get("layers", []):
+                for chunk in layer.get("chunks", {}).values():
+                    decode_chunk(chunk)
+
+    def decode_binary():
+        for blob in blobs:
+            tilemap = tilemapcompiler.read_tilemap(blob)
+            for layer in tilemap["layers"]:
+                for entry in layer["chunks"].values():
+                    tilemapcompiler.read_tile_chunk(blob, tilemap, entry)
+
+    timings = {"tiles_decode_toml": measure(decode_toml, repeat), "tiles_decode_binary": measure(decode_binary, repeat)}
+    sizes = {"tilemap_toml_bytes": sum(len(text) for text in texts if b"layers" in text), "tilemap_binary_bytes": sum(len(blob) for blob in blobs)}
+    return timings, sizes
+
+
+def archive_images(project_path):
+    # Entry names of the archive and the image each exported sheet or tilemap names (relative to assets/)
+    with zipfile.ZipFile(os.path.join(project_path, exporter.ARCHIVE_NAME)) as archive:
+        names = set(archive.namelist())
+        referenced = {}
+        for name in names:
+            if name.startswith("spritesheets/") and name.endswith(".toml"):
+                referenced[name] = tomllib.loads(archive.read(name).decode("utf-8")).get("image_path", "")
+            elif name.startswith("spritesheets/") and name.endswith(spritesheetcompiler.BINARY_SUFFIX):
+                data = archive.read(name)
+                (length,) = struct.unpack_from("<H", data, spritesheetcompiler.HEADER.size)
+                referenced[name] = data[spritesheetcompiler.HEADER.size + 2 : spritesheetcompiler.HEADER.size + 2 + length].decode("utf-8")
+            elif name.endswith(tilemapcompiler.BINARY_SUFFIX):
+                referenced[name] = tilemapcompiler.read_tilemap(archive.read(name))["tileset"]
+
+    return names, referenced
+
+
+def missing_images(project_path):
+    # Images named by the exported sheets and tilemaps that are not in the archive, e.g. lost to a rename
+    names, referenced = archive_images(project_path)
+    return sorted(f"{name} -> {image}" for name, image in referenced.items() if image and "assets/" + image not in names)
+
+
+def build_texture_loader(temp_dir):
+    # benchmarks/texture_load.c against the vendored zip and image decoders, None without a C compiler
+    root = os.path.join(os.path.dirname(os.path.abspath(__file__)), "..")
+    output = os.path.join(temp_dir, "texture_load")
+    command = [
+        os.environ.get("CC", "cc"), "-O2",
+        "-I", os.path.join(root, "vendor", "zip", "src"), "-I", os.path.join(root, "vendor", "raylib", "src", "external"),
+        os.path.join(root, "benchmarks", "texture_load.c"), os.path.join(root, "vendor", "zip", "src", "zip.c"),
+        "-lm", "-o", output,
+    ]
+    try:
+        subprocess.run(command, capture_output=True, check=True)
+    except (OSError, subprocess.CalledProcessError) as e:
+        print(f"texture load comparison skipped, cannot build texture_load: {e}", file=sys.stderr)
+        return None
+    return output
+
+
+def bench_texture_formats(project_path, repeat, jobs, temp_dir):
+    # Startup texture loading (archive open, read and decode of every image the sheets and tilemaps use) with the
+    # images shipped as png, qoi and raw rgba. The project is re-exported with each [transcode] format.
+    loader = build_texture_loader(temp_dir)
+    if not loader:
+        return {}, {}
+
+    project_file = os.path.join(project_path, "project.toml")
+    with open(project_file, "rb") as f:
+        original = f.read()
+
+    timings, sizes = {}, {}
+    try:
+        for fmt in ("", "qoi", "rgba"):
+            project = tomllib.loads(original.decode("utf-8"))
+            project["transcode"] = {"format": fmt}
+            with open(project_file, "w", encoding="utf-8") as f:
+                f.write(toml.dumps(project))
+            exporter.export_project(project_path, incremental=False, jobs=jobs)
+
+            _, referenced = archive_images(project_path)
+            entries = sorted({"assets/" + image for image in referenced.values() if image})
+            archive = os.path.join(project_path, exporter.ARCHIVE_NAME)
+
+            samples = []
+            for _ in range(repeat):
+                result = json.loads(subprocess.run([loader, archive, *entries], capture_output=True, text=True, check=True).stdout)
+                samples.append(result["open"] + result["read"] + result["decode"])
+
+            name = fmt or "png"
+            timings[f"texture_load_{name}"] = {"min": min(samples), "median": statistics.median(samples), "samples": samples}
+            sizes[f"texture_{name}_bytes"] = result["bytes"]
+    finally:
+        with open(project_file, "wb") as f:
+            f.write(original)
+
+    return timings, sizes
+
+
+def run_benchmarks(project_path, repeat, jobs):
+    results = {}
+
+    results["scan"] = measure(lambda: exporter.scan_project(project_path), repeat)
+    results["export_full"] = measure(lambda: exporter.export_project(project_path, incremental=False, jobs=jobs), repeat)
+    results["export_noop"] = measure(lambda: exporter.export_project(project_path, jobs=jobs), repeat)
+
+    def export_one_change():
+        touch_one_sheet(project_path)
+        exporter.export_project(project_path, jobs=jobs)
+
+    results["export_one_change"] = measure(export_one_change, repeat)
+    results["spritesheet_load"] = bench_spritesheet_load(project_path, repeat)
+
+    sizes = {"archive_bytes": os.path.getsize(os.path.join(project_path, exporter.ARCHIVE_NAME))}
+
+    tilemap_timings, tilemap_sizes = bench_tilemap_decode(project_path, repeat)
+    if tilemap_sizes["tilemap_binary_bytes"]:
+        results.update(tilemap_timings)
+        sizes.update(tilemap_sizes)
+    return results, sizes
+
+
+def git_commit():
+    try:
+        return subprocess.run(["git", "rev-parse", "HEAD"], capture_output=True, text=True, check=True).stdout.strip()
+    except (OSError, subprocess.CalledProcessError):
+        return ""
+
+
+def compare(current, baseline, tolerance):
+    # Returns the regressions, a timing regresses when its median grows past the tolerance
+    regressions = []
+    for name, result in current["timings"].items():
+        old = baseline.get("timings", {}).get(name)
+        if old and result["median"] > old["median"] * (1 + tolerance):
+            regressions.append(f"{name}: {old['median'] * 1000:.1f} ms -> {result['median'] * 1000:.1f} ms")
+
+    for name, value in current["sizes"].items():
+        old = baseline.get("sizes", {}).get(name)
+        if old and value > old * (1 + tolerance):
+            regressions.append(f"{name}: {old} -> {value}")
+
+    return regressions
+
+
+def main(argv=None):
+    parser = argparse.ArgumentParser(description="Benchmark project scan, export and spritesheet loading.")
+    add_generator_arguments(parser)
+    parser.add_argument("--repeat", type=int, default=3)
+    parser.add_argument("--jobs", type=int, default=os.cpu_count() or 1)
+    parser.add_argument("--project", help="benchmark an existing project instead of a generated one (it gets exported)")
+    parser.add_argument("--output", help="write the JSON results to this file")
+    parser.add_argument("--baseline", help="JSON results to compare against, exits non-zero on regression")
+    parser.add_argument("--tolerance", type=float, default=0.2, help="allowed slowdown against the baseline")
+    parser.add_argument("--textures", action="store_true", help="compare startup texture loading with png, qoi and rgba images")
+    args = parser.parse_args(argv)
+
+    with tempfile.TemporaryDirectory() as temp_dir:
+        project_path = args.project
+        if not project_path:
+            project_path = os.path.join(temp_dir, "project")
+            generate_project(project_path, **generator_kwargs(args))
+
+        timings, sizes = run_benchmarks(project_path, args.repeat, args.jobs)
+        missing = missing_images(project_path)
+
+        if args.textures:
+            if args.project:
+                print("texture load comparison skipped, it re-exports the project with other settings", file=sys.stderr)
+            else:
+                texture_timings, texture_sizes = bench_texture_formats(project_path, args.repeat, args.jobs, temp_dir)
+                timings.update(texture_timings)
+                sizes.update(texture_sizes)
+
+    current = {
+        "version": RESULTS_VERSION,
+        "commit": git_commit(),
+        "python": platform.python_version(),
+        "machine": platform.machine(),
+        "cpus": os.cpu_count(),
+        "params": {} if args.project else dict(generator_kwargs(args), image_size=list(args.image_size)),
+        "timings": timings,
+        "sizes": sizes,
+    }
+
+    for name, result in timings.items():
+        print(f"{name:20} min {result['min'] * 1000:9.1f} ms   median {result['median'] * 1000:9.1f} ms")
+    for name, value in sizes.items():
+        print(f"{name:20} {value} bytes")
+
+    for reference in missing:
+        print(f"MISSING {reference}", file=sys.stderr)
+
+    if args.output:
+        with open(args.output, "w", encoding="utf-8") as f:
+            json.dump(current, f, indent=2)
+
+    if args.baseline:
+        with open(args.baseline, "r", encoding="utf-8") as f:
+            regressions = compare(current, json.load(f), args.tolerance)
+
+        for regression in regressions:
+            print(f"REGRESSION {regression}", file=sys.stderr)
+        return 1 if regressions or missing else 0
+
+    return 1 if missing else 0
+
+
+if __name__ == "__main__":
+    sys.exit(main())
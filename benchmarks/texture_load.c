@@ -0,0 +1,96 @@
+// Loads images out of an exported data.arpg the way the runtime does on startup and prints the time spent:
+//   texture_load <archive> <entry>...
+// Reading goes through vendor/zip like engine_core/archive.h, decoding through the same libraries raylib uses
+// (stb_image for png, qoi.h for qoi), the raw "RGBA" format is copied as is. Uploading to the GPU costs the same
+// for every format and is left out.
+#include <stdio.h>
+#include <stdlib.h>
+#include <string.h>
+#include <time.h>
+#include <zip.h>
+
+#define STB_IMAGE_IMPLEMENTATION
+#define STBI_ONLY_PNG
+#include <stb_image.h>
+
+#define QOI_IMPLEMENTATION
+#include <qoi.h>
+
+static double now(void) {
+	struct timespec ts;
+	clock_gettime(CLOCK_MONOTONIC, &ts);
+	return ts.tv_sec + ts.tv_nsec / 1e9;
+}
+
+static int ends_with(const char* text, const char* suffix) {
+	size_t a = strlen(text), b = strlen(suffix);
+	return a >= b && strcmp(text + a - b, suffix) == 0;
+}
+
+static void* decode(const char* name, const unsigned char* data, size_t size) {
+	if (ends_with(name, ".rgba")) {
+		unsigned int header[2];
+		if (size < 12 || memcmp(data, "RGBA", 4) != 0) return NULL;
+		memcpy(header, data + 4, sizeof(header));
+		if (size - 12 < (size_t)header[0] * header[1] * 4) return NULL;
+
+		void* pixels = malloc((size_t)header[0] * header[1] * 4);
+		memcpy(pixels, data + 12, (size_t)header[0] * header[1] * 4);
+		return pixels;
+	}
+
+	if (ends_with(name, ".qoi")) {
+		qoi_desc desc;
+		return qoi_decode(data, (int)size, &desc, 4);
+	}
+
+	int width, height, channels;
+	return stbi_load_from_memory(data, (int)size, &width, &height, &channels, 4);
+}
+
+int main(int argc, char** argv) {
+	if (argc < 2) {
+		fprintf(stderr, "usage: texture_load <archive> <entry>...\n");
+		return 2;
+	}
+
+	double start	 = now();
+	struct zip_t* zip = zip_open(argv[1], 0, 'r');
+	if (!zip) {
+		fprintf(stderr, "cannot open %s\n", argv[1]);
+		return 1;
+	}
+	double open_time = now() - start;
+
+	double read_time = 0, decode_time = 0;
+	size_t bytes = 0;
+	for (int i = 2; i < argc; i++) {
+		void* data  = NULL;
+		size_t size = 0;
+
+		start = now();
+		if (zip_entry_open(zip, argv[i]) != 0 || zip_entry_read(zip, &data, &size) < 0) {
+			fprintf(stderr, "cannot read %s\n", argv[i]);
+			return 1;
+		}
+		zip_entry_close(zip);
+		read_time += now() - start;
+		bytes += size;
+
+		start	     = now();
+		void* pixels = decode(argv[i], data, size);
+		decode_time += now() - start;
+
+		if (!pixels) {
+			fprintf(stderr, "cannot decode %s\n", argv[i]);
+			return 1;
+		}
+		free(pixels);
+		free(data);
+	}
+
+	zip_close(zip);
+	printf("{\"images\": %d, \"bytes\": %zu, \"open\": %.9f, \"read\": %.9f, \"decode\": %.9f}\n", argc - 2, bytes, open_time, read_time,
+	       decode_time);
+	return 0;
+}
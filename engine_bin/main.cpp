@@ -4,103 +4,75 @@
 #include <rlgl.h>
 #include <string>
 #include <toml.hpp>
-#include <zip.h>
 
 int main(void) {
 
-	// Load game data
-	unsigned char* buf;
-	size_t bufsize;
-	bool zip_loaded = true;
+	// Load game data, assets stay in the archive until first used
+	std::vector<unsigned char> buf;
+	bool zip_loaded = game_archive.open("data.arpg");
 
-	struct zip_t* zip = zip_open("data.arpg", 0, 'r');
-	if (zip) {
+	if (zip_loaded) {
 
-		zip_entry_open(zip, "project.toml"); // read project data
-		{
-			bufsize = zip_entry_size(zip);
-			buf	= (unsigned char*)calloc(sizeof(unsigned char), bufsize);
-
-			zip_entry_noallocread(zip, (void*)buf, bufsize);
-
-			std::string_view string((const char*)buf, bufsize);
+		if (game_archive.read("project.toml", buf)) { // read project data
+			std::string_view string((const char*)buf.data(), buf.size());
 			toml::table tbl = toml::parse(string);
 
 			auto title   = tbl.get("window_title")->value<std::string>();
 			WINDOW_TITLE = *title;
+
+			if (auto budget = tbl["runtime"]["asset_cache_mb"].value<int64_t>()) {
+				game_archive.budget = (size_t)*budget * 1024 * 1024;
+			}
 		}
-		zip_entry_close(zip);
-
-		int i, n = (int)zip_entries_total(zip);
-		for (i = 0; i < n; ++i) {
-			zip_entry_openbyindex(zip, i);
-			{
-				if (!zip_entry_isdir(zip)) {
-
-					// load assets
-					if (std::string(zip_entry_name(zip)).find("assets/") != std::string::npos &&
-					    std::string(zip_entry_name(zip)).find("assets/") == 0) {
-						bufsize = zip_entry_size(zip);
-						buf	= (unsigned char*)calloc(sizeof(unsigned char), bufsize);
-
-						zip_entry_noallocread(zip, (void*)buf, bufsize);
-
-						assets_list[std::string(zip_entry_name(zip)).substr(strlen("assets/"))] = AssetData{buf, bufsize};
-					}
-
-					// load spritesheets
-
-					else if (std::string(zip_entry_name(zip)).find("spritesheets/") != std::string::npos &&
-						 std::string(zip_entry_name(zip)).find("spritesheets/") == 0) {
-						bufsize = zip_entry_size(zip);
-						buf	= (unsigned char*)calloc(sizeof(unsigned char), bufsize);
-
-						zip_entry_noallocread(zip, (void*)buf, bufsize);
-
-						std::string_view string((const char*)buf, bufsize);
-						toml::table tbl = toml::parse(string);
-
-						auto image  = tbl.get("image_path")->value<std::string>();
-						auto width  = tbl.get("width")->value<toml::int32_t>();
-						auto height = tbl.get("height")->value<toml::int32_t>();
-
-						SpriteSheet sheet;
-
-						sheet.image_path   = *image;
-						sheet.frame_width  = *width;
-						sheet.frame_height = *height;
-
-						if (auto states_tbl = tbl["states"].as_table()) {
-							for (const auto& [state_name, state_value] : *states_tbl) {
-								if (auto anim_tbl = state_value.as_table()) {
-									AnimationState anim;
-									anim.fps = anim_tbl->get("fps")->value_or(6);
-
-									if (auto frames_array = anim_tbl->get("frames")->as_array()) {
-										for (const auto& frame : *frames_array) {
-											if (auto xy = frame.as_array(); xy && xy->size() == 2) {
-												int x = (*xy)[0].value_or(0);
-												int y = (*xy)[1].value_or(0);
-												anim.frames.push_back({x, y});
-											}
-										}
-									}
-									sheet.states[state_name.data()] = anim;
-								}
-							}
-						}
-
-						spritesheets_list[std::string(zip_entry_name(zip)).substr(strlen("spritesheets/"))] = sheet;
-					}
+
+		// load spritesheets, compiled "<name>.toml.bin" entries win over "<name>.toml"
+		for (const auto& [entry_name, entry] : game_archive.list()) {
+			if (entry_name.find("spritesheets/") != 0) continue;
+
+			std::string name = entry_name.substr(strlen("spritesheets/"));
+			bool binary	 = IsFileExtension(name.c_str(), ".bin");
+
+			if (!game_archive.read(entry_name, buf)) continue;
+
+			SpriteSheet sheet;
+
+			if (binary) {
+				name = name.substr(0, name.size() - strlen(".bin"));
+				if (load_spritesheet_from_binary(buf.data(), buf.size(), sheet)) {
+					spritesheets_list[name] = std::move(sheet);
+				} else {
+					TraceLog(LOG_WARNING, "invalid binary spritesheet %s", name.c_str());
 				}
+			} else if (!spritesheets_list.count(name)) {
+				load_spritesheet_from_toml(std::string_view((const char*)buf.data(), buf.size()), sheet);
+				spritesheets_list[name] = std::move(sheet);
 			}
-			zip_entry_close(zip);
 		}
-		zip_close(zip);
 
-		free(buf);
-	} else {
-		zip_loaded = false;
+		// load actor definitions, stages refer to them by file name
+		for (const auto& [entry_name, entry] : game_archive.list()) {
+			if (entry_name.find("actors/") != 0 || !IsFileExtension(entry_name.c_str(), ".toml")) continue;
+			if (!game_archive.read(entry_name, buf)) continue;
+
+			ActorType actor;
+			load_actor_from_toml(std::string_view((const char*)buf.data(), buf.size()), actor);
+			actors_list[entry_name.substr(strlen("actors/"))] = std::move(actor);
+		}
+
+		// load stage tilemaps, only the chunk index is read, chunks are decoded when first used
+		for (const auto& [entry_name, entry] : game_archive.list()) {
+			if (entry_name.find("stages/") != 0 || !IsFileExtension(entry_name.c_str(), ".tiles")) continue;
+			if (!game_archive.read(entry_name, buf)) continue;
+
+			std::string name = entry_name.substr(strlen("stages/"), entry_name.size() - strlen("stages/") - strlen(".tiles"));
+			Tilemap tilemap;
+
+			if (tilemap.load(buf.data(), buf.size())) {
+				tilemaps_list[name] = std::move(tilemap);
+			} else {
+				TraceLog(LOG_WARNING, "invalid tilemap %s", name.c_str());
+			}
+		}
 	}
 
 	// Initialize window
@@ -112,21 +84,16 @@ int main(void) {
 
 	// Initialize game
 
-	for (auto& [name, spritesheet] : spritesheets_list) {
-		auto it		       = assets_list.find(spritesheet.image_path);
-		const AssetData& asset = it->second;
-
-		Image img = LoadImageFromMemory(GetFileExtension(spritesheet.image_path.c_str()), asset.data, (int)asset.size);
+	// Textures are created on first draw, see get_texture()
 
-		TraceLog(LOG_INFO, "before texture");
-		spritesheet.image = LoadTextureFromImage(img);
-		TraceLog(LOG_INFO, "after texture");
+	player_sprite_sheet_name = "sprite.toml";
+	player_sprite		 = make_sprite(player_sprite_sheet_name);
+	current_stage_name	 = "stage.toml";
 
-		UnloadImage(img);
+	if (zip_loaded && game_archive.read("stages/" + current_stage_name, buf)) {
+		load_stage_from_toml(std::string_view((const char*)buf.data(), buf.size()), current_stage);
 	}
 
-	player_sprite_sheet_name = "sprite.toml";
-
 	// Main game loop
 
 	RenderTexture2D target = LoadRenderTexture(WINDOW_WIDTH, WINDOW_HEIGHT);
@@ -142,6 +109,8 @@ int main(void) {
 		process();
 		camera.target = {(float)player_pos_x + player_width / 2, (float)player_pos_y + player_height / 2};
 
+		if (zip_loaded) prepare_render();
+
 		BeginTextureMode(target);
 		BeginMode2D(camera);
 		ClearBackground(BLUE);
@@ -179,13 +148,30 @@ int main(void) {
 			DrawText(("FPS : " + std::to_string(GetFPS())).c_str(), 5, 41, 20, PINK);
 			DrawText(("FrameTime (DeltaTime) : " + std::to_string(GetFrameTime())).c_str(), 5, 61, 20, PINK);
 			DrawText(("Monitor refresh rate : " + std::to_string(GetMonitorRefreshRate(GetCurrentMonitor()))).c_str(), 5, 81, 20, PINK);
+			DrawText(("Asset cache : " + std::to_string(game_archive.cached_count()) + " assets, " +
+				  std::to_string(game_archive.resident_bytes() / 1024) + " KiB")
+				     .c_str(),
+				 5, 101, 20, PINK);
+			DrawText(("Tilemap : " + std::to_string(tilemap_renderer.visible_chunks) + " chunks visible, " +
+				  std::to_string(tilemap_renderer.baked_chunks) + " baked, " + std::to_string(tilemap_renderer.cached_chunks()) + " cached, " +
+				  TextFormat("%.2f ms", tilemap_renderer.frame_ms))
+				     .c_str(),
+				 5, 121, 20, PINK);
+			DrawText(("Sprites : " + std::to_string(sprite_batch.sprite_count) + " sprites, " + std::to_string(sprite_batch.flushes) + " batches")
+				     .c_str(),
+				 5, 141, 20, PINK);
 		}
 
 		EndDrawing();
 	}
 
 	UnloadRenderTexture(target);
+	tilemap_renderer.clear();
+	for (auto& [path, texture] : textures_list) {
+		if (texture.id) UnloadTexture(texture);
+	}
 	CloseWindow();
+	game_archive.close();
 
 	return 0;
 }
@@ -0,0 +1,231 @@
+#pragma once
+#include "global.h"
+#include <cstdint>
+#include <list>
+#include <memory>
+#include <toml.hpp>
+#include <zip.h>
+
+// Table of contents written by the editor's exporter as the last entry of data.arpg, little endian:
+//   "AIDX", u16 version, u16 reserved, u32 count, then per entry:
+//   u16 name length, name, u32 zip index, u64 header offset, u64 size, u64 compressed size, u16 method, u32 crc, 20 byte sha1
+#define ARCHIVE_INDEX_NAME "arpg.index"
+#define ARCHIVE_INDEX_VERSION 1
+// Duplicate entries are stored once, [aliases] maps each copy to the entry holding the data
+#define ARCHIVE_ALIASES_NAME "arpg.aliases"
+#define ASSET_CACHE_BUDGET (64 * 1024 * 1024)
+
+struct ArchiveEntry {
+		unsigned int zip_index	 = 0;
+		uint64_t offset		 = 0;
+		uint64_t size		 = 0;
+		uint64_t compressed_size = 0;
+		uint16_t method		 = 0;
+		uint32_t crc		 = 0;
+		unsigned char hash[20]	 = {0};
+};
+
+class AssetArchive {
+	private:
+		struct zip_t* zip = nullptr;
+		std::unordered_map<std::string, ArchiveEntry> entries;
+		std::unordered_map<std::string, std::string> aliases;
+
+		// Assets loaded so far, most recently used first
+		std::unordered_map<std::string, std::shared_ptr<AssetData>> cache;
+		std::list<std::string> lru;
+		std::unordered_map<std::string, std::list<std::string>::iterator> lru_pos;
+		size_t resident = 0;
+
+		bool read_index() {
+			std::vector<unsigned char> data;
+			if (zip_entry_open(zip, ARCHIVE_INDEX_NAME) != 0) return false;
+			data.resize(zip_entry_size(zip));
+			zip_entry_noallocread(zip, data.data(), data.size());
+			zip_entry_close(zip);
+
+			size_t pos = 0;
+			auto read  = [&](void* out, size_t n) {
+				if (data.size() - pos < n) return false;
+				memcpy(out, data.data() + pos, n);
+				pos += n;
+				return true;
+			};
+
+			char magic[4];
+			uint16_t version, reserved;
+			uint32_t count;
+			if (!read(magic, 4) || memcmp(magic, "AIDX", 4) != 0) return false;
+			if (!read(&version, 2) || version != ARCHIVE_INDEX_VERSION || !read(&reserved, 2) || !read(&count, 4)) return false;
+
+			entries.reserve(count);
+			for (uint32_t i = 0; i < count; i++) {
+				uint16_t length;
+				ArchiveEntry entry;
+
+				if (!read(&length, 2) || data.size() - pos < length) return false;
+				std::string name((const char*)data.data() + pos, length);
+				pos += length;
+
+				if (!read(&entry.zip_index, 4) || !read(&entry.offset, 8) || !read(&entry.size, 8) || !read(&entry.compressed_size, 8) ||
+				    !read(&entry.method, 2) || !read(&entry.crc, 4) || !read(entry.hash, 20))
+					return false;
+
+				entries[name] = entry;
+			}
+
+			return true;
+		}
+
+		// Archives exported before the index existed, only entry headers are read
+		void build_index() {
+			entries.clear();
+
+			int n = (int)zip_entries_total(zip);
+			for (int i = 0; i < n; ++i) {
+				zip_entry_openbyindex(zip, i);
+				if (!zip_entry_isdir(zip)) {
+					ArchiveEntry entry;
+					entry.zip_index	      = i;
+					entry.offset	      = zip_entry_header_offset(zip);
+					entry.size	      = zip_entry_uncomp_size(zip);
+					entry.compressed_size = zip_entry_comp_size(zip);
+					entry.crc	      = zip_entry_crc32(zip);
+
+					entries[zip_entry_name(zip)] = entry;
+				}
+				zip_entry_close(zip);
+			}
+		}
+
+		// Aliases are listed like any other entry but share the cache slot of their target
+		void read_aliases() {
+			if (zip_entry_open(zip, ARCHIVE_ALIASES_NAME) != 0) return;
+			std::string data(zip_entry_size(zip), '\0');
+			zip_entry_noallocread(zip, data.data(), data.size());
+			zip_entry_close(zip);
+
+			toml::table tbl = toml::parse(data);
+			if (auto aliases_tbl = tbl["aliases"].as_table()) {
+				for (const auto& [alias, target] : *aliases_tbl) {
+					auto it = entries.find(target.value_or(std::string()));
+					if (it == entries.end()) continue;
+
+					entries[std::string(alias.str())] = it->second;
+					aliases[std::string(alias.str())] = it->first;
+				}
+			}
+		}
+
+		std::string resolve(const std::string& name) const {
+			auto it = aliases.find(name);
+			return it != aliases.end() ? it->second : name;
+		}
+
+		void touch(const std::string& name) {
+			auto it = lru_pos.find(name);
+			if (it != lru_pos.end()) lru.erase(it->second);
+			lru.push_front(name);
+			lru_pos[name] = lru.begin();
+		}
+
+		// Drops least recently used assets nobody holds anymore until the cache fits the budget
+		void evict() {
+			for (auto it = lru.end(); resident > budget && it != lru.begin();) {
+				--it;
+				auto cached = cache.find(*it);
+				if (cached->second.use_count() > 1) continue;
+
+				resident -= cached->second->size;
+				cache.erase(cached);
+				lru_pos.erase(*it);
+				it = lru.erase(it);
+			}
+		}
+
+	public:
+		size_t budget = ASSET_CACHE_BUDGET;
+
+		AssetArchive() {}
+		~AssetArchive() { close(); }
+
+		bool open(const char* path) {
+			zip = zip_open(path, 0, 'r');
+			if (!zip) return false;
+
+			if (!read_index()) {
+				TraceLog(LOG_INFO, "ARCHIVE: no index in %s, scanning entries", path);
+				build_index();
+			}
+			read_aliases();
+
+			return true;
+		}
+
+		void close() {
+			cache.clear();
+			lru.clear();
+			lru_pos.clear();
+			entries.clear();
+			aliases.clear();
+			resident = 0;
+
+			if (zip) {
+				zip_close(zip);
+				zip = nullptr;
+			}
+		}
+
+		bool is_open() const { return zip != nullptr; }
+		const std::unordered_map<std::string, ArchiveEntry>& list() const { return entries; }
+		size_t resident_bytes() const { return resident; }
+		size_t cached_count() const { return cache.size(); }
+		size_t alias_count() const { return aliases.size(); }
+
+		// Uncached read of any entry, for data that is parsed once (project and sheet files)
+		bool read(const std::string& name, std::vector<unsigned char>& out) {
+			auto it = entries.find(name);
+			if (!zip || it == entries.end()) return false;
+
+			if (zip_entry_openbyindex(zip, it->second.zip_index) != 0) return false;
+			out.resize(zip_entry_size(zip));
+			bool ok = zip_entry_noallocread(zip, out.data(), out.size()) >= 0;
+			zip_entry_close(zip);
+
+			return ok;
+		}
+
+		// Assets are looked up by their path inside assets/ and loaded on first use
+		std::shared_ptr<AssetData> get_asset(const std::string& path) {
+			std::string name = resolve("assets/" + path);
+
+			auto cached = cache.find(name);
+			if (cached != cache.end()) {
+				touch(name);
+				return cached->second;
+			}
+
+			auto it = entries.find(name);
+			if (!zip || it == entries.end()) return nullptr;
+
+			if (zip_entry_openbyindex(zip, it->second.zip_index) != 0) return nullptr;
+			size_t size	   = zip_entry_size(zip);
+			unsigned char* buf = (unsigned char*)calloc(sizeof(unsigned char), size > 0 ? size : 1);
+			zip_entry_noallocread(zip, (void*)buf, size);
+			zip_entry_close(zip);
+
+			std::shared_ptr<AssetData> asset(new AssetData{buf, size}, [](AssetData* a) {
+				free((void*)a->data);
+				delete a;
+			});
+
+			cache[name] = asset;
+			resident += size;
+			touch(name);
+			evict();
+
+			return asset;
+		}
+};
+
+AssetArchive game_archive;
@@ -1,10 +1,22 @@
 #pragma once
+#include "archive.h"
 #include "game.h"
 #include "global.h"
 #include "player.h"
+#include "spritebatch.h"
 #include "spritesheet.h"
 #include "stage.h"
 #include "tilemap.h"
 
-void process() { process_player(); }
-void render() { render_player(); }
\ No newline at end of file
+void process() {
+	process_player();
+	current_stage.process(GetFrameTime());
+}
+// Runs before the frame's render target is bound, for work that draws into textures of its own
+void prepare_render() { prepare_tilemap(WINDOW_WIDTH, WINDOW_HEIGHT); }
+void render() {
+	render_tilemap();
+	current_stage.render(camera, WINDOW_WIDTH, WINDOW_HEIGHT);
+	render_player();
+	sprite_batch.flush();
+}
\ No newline at end of file
@@ -1,4 +1,6 @@
 #pragma once
+#include <algorithm>
+#include <cstring>
 #include <iostream>
 #include <map>
 #include <raygui.h>
@@ -14,7 +16,28 @@ struct AssetData {
 		size_t size;
 };
 
-std::unordered_map<std::string, AssetData> assets_list;
+// Raw RGBA8 images written by the exporter: "RGBA", width, height (little endian u32), pixels
+Image load_image_from_asset(const std::string& path, const AssetData& asset) {
+	if (IsFileExtension(path.c_str(), ".rgba")) {
+		Image img = {};
+		unsigned int header[2];
+
+		if (asset.size < 12 || memcmp(asset.data, "RGBA", 4) != 0) return img;
+		memcpy(header, asset.data + 4, sizeof(header));
+		if (asset.size - 12 < (size_t)header[0] * header[1] * 4) return img;
+
+		img.width   = (int)header[0];
+		img.height  = (int)header[1];
+		img.mipmaps = 1;
+		img.format  = PIXELFORMAT_UNCOMPRESSED_R8G8B8A8;
+		img.data    = MemAlloc(header[0] * header[1] * 4);
+		memcpy(img.data, asset.data + 12, header[0] * header[1] * 4);
+		return img;
+	}
+
+	// png, qoi and the other formats raylib decodes itself
+	return LoadImageFromMemory(GetFileExtension(path.c_str()), asset.data, (int)asset.size);
+}
 
 enum DIRECTION { UP, UP_RIGHT, RIGHT, DOWN_RIGHT, DOWN, DOWN_LEFT, LEFT, UP_LEFT };
 
@@ -38,4 +61,21 @@ DIRECTION rotate_ccw_45(DIRECTION dir) {
 	return (DIRECTION)result;
 }
 
-Camera2D camera = {0};
\ No newline at end of file
+Camera2D camera = {0};
+
+// World rectangle seen through a camera on a screen of the given size, from the four corners so rotation is covered
+Rectangle camera_view(const Camera2D& view_camera, int screen_width, int screen_height) {
+	Vector2 corners[4] = {GetScreenToWorld2D({0, 0}, view_camera), GetScreenToWorld2D({(float)screen_width, 0}, view_camera),
+			      GetScreenToWorld2D({0, (float)screen_height}, view_camera),
+			      GetScreenToWorld2D({(float)screen_width, (float)screen_height}, view_camera)};
+
+	float min_x = corners[0].x, min_y = corners[0].y, max_x = corners[0].x, max_y = corners[0].y;
+	for (const Vector2& corner : corners) {
+		min_x = std::min(min_x, corner.x);
+		min_y = std::min(min_y, corner.y);
+		max_x = std::max(max_x, corner.x);
+		max_y = std::max(max_y, corner.y);
+	}
+
+	return {min_x, min_y, max_x - min_x, max_y - min_y};
+}
@@ -1,6 +1,7 @@
 #pragma once
 #include "game.h"
 #include "global.h"
+#include "spritebatch.h"
 #include "spritesheet.h"
 
 int player_pos_x = 50, player_pos_y = 50;
@@ -9,6 +10,8 @@ int player_speed = 5;
 
 std::string player_sprite_sheet_name;
 SpriteSheet player_spritsheet;
+// Resolved from player_sprite_sheet_name once the sheets are loaded
+Sprite player_sprite;
 void process_player() {
 	// Movement logic
 	if ((IsKeyDown(RIGHT_BUTTON) || IsKeyDown(LEFT_BUTTON)) && (IsKeyDown(DOWN_BUTTON) || IsKeyDown(UP_BUTTON))) {
@@ -21,31 +24,12 @@ void process_player() {
 }
 
 void render_player() {
-	auto it = spritesheets_list.find(player_sprite_sheet_name);
-	if (it != spritesheets_list.end()) {
-		SpriteSheet& sheet = it->second;
-
-		player_height = sheet.frame_height;
-		player_width  = sheet.frame_width;
-
-		if (!sheet.states.empty()) {
-			auto anim_it		   = sheet.states.begin();
-			const AnimationState& anim = anim_it->second;
-
-			if (!anim.frames.empty()) {
-				const SpriteFrame& frame = anim.frames[0];
-
-				Rectangle source = {(float)frame.x, (float)frame.y, (float)sheet.frame_width, (float)sheet.frame_height};
-
-				Rectangle dest = {(float)player_pos_x, (float)player_pos_y, (float)sheet.frame_width, (float)sheet.frame_height};
-
-				Vector2 origin = {0, 0};
-
-				DrawTexturePro(sheet.image, source, dest, origin, 0.0f, WHITE);
-				return;
-			}
-		}
+	if (player_sprite.sheet) {
+		player_height = player_sprite.sheet->frame_height;
+		player_width  = player_sprite.sheet->frame_width;
 	}
 
-	DrawRectangle(player_pos_x, player_pos_y, 50, 50, RED);
+	if (!submit_sprite(player_sprite, 0, (float)player_pos_x, (float)player_pos_y)) {
+		sprite_batch.submit_rectangle({(float)player_pos_x, (float)player_pos_y, 50, 50}, player_sprite.layer, RED);
+	}
 }
@@ -0,0 +1,149 @@
+#pragma once
+#include "global.h"
+#include "spritesheet.h"
+#include <algorithm>
+#include <cstdint>
+#include <rlgl.h>
+
+// Sprites are collected during render() and drawn in one pass at the end of it, ordered by layer and then by
+// texture so every run of quads sharing a texture goes out with a single bind. Within a layer and texture the
+// submission order is kept. Untextured rectangles use raylib's shapes texture and sort like any other sprite.
+struct SpriteQuad {
+		Texture2D texture;
+		Rectangle source;
+		Rectangle dest;
+		Color tint;
+};
+
+// What an entity keeps to draw itself, resolved once when it is created instead of looked up every frame
+struct Sprite {
+		SpriteSheet* sheet	    = nullptr;
+		const AnimationState* state = nullptr;
+		int layer		    = 0;
+};
+
+class SpriteBatch {
+	private:
+		std::vector<SpriteQuad> quads;
+		// (layer and texture, submission index), sorting these small pairs keeps the order stable without moving quads
+		std::vector<std::pair<uint64_t, uint32_t>> order;
+
+		static uint64_t sort_key(int layer, unsigned int texture) { return ((uint64_t)((uint32_t)layer ^ 0x80000000u) << 32) | texture; }
+
+	public:
+		// Stats of the last flush for the debug overlay. flushes counts the rlgl batches sent to the GPU: one when
+		// the vertex buffer fills up or every draw call slot is taken, and one for the rest.
+		int sprite_count = 0;
+		int flushes	 = 0;
+
+		void submit(const Texture2D& texture, Rectangle source, Rectangle dest, int layer = 0, Color tint = WHITE) {
+			if (!texture.id) return;
+			order.push_back({sort_key(layer, texture.id), (uint32_t)quads.size()});
+			quads.push_back({texture, source, dest, tint});
+		}
+
+		// Same as DrawRectangle, in layer order with the sprites
+		void submit_rectangle(Rectangle dest, int layer = 0, Color color = WHITE) {
+			submit(GetShapesTexture(), GetShapesTextureRectangle(), dest, layer, color);
+		}
+
+		void flush() {
+			std::sort(order.begin(), order.end());
+
+			sprite_count = (int)quads.size();
+			flushes	     = 0;
+			if (quads.empty()) return;
+
+			// What was drawn before goes out on its own, the rlgl batch starts empty and every flush below is counted
+			rlDrawRenderBatchActive();
+			int draw_slots = 0;
+
+			for (size_t start = 0; start < order.size();) {
+				const Texture2D& texture = quads[order[start].second].texture;
+				float width		 = (float)texture.width;
+				float height		 = (float)texture.height;
+
+				// Every run takes a draw call slot, rlgl would flush by itself when the last one is taken
+				if (draw_slots == RL_DEFAULT_BATCH_DRAWCALLS - 1) {
+					rlDrawRenderBatchActive();
+					flushes++;
+					draw_slots = 0;
+				}
+				draw_slots++;
+
+				// Same quads as DrawTexturePro without rotation
+				rlSetTexture(texture.id);
+				rlBegin(RL_QUADS);
+				rlNormal3f(0.0f, 0.0f, 1.0f);
+
+				size_t end = start;
+				for (; end < order.size() && quads[order[end].second].texture.id == texture.id; end++) {
+					const SpriteQuad& quad = quads[order[end].second];
+					// Flushes when the quad does not fit the vertex buffer, the run continues in the first slot
+					if (rlCheckRenderBatchLimit(4)) {
+						flushes++;
+						draw_slots = 1;
+					}
+
+					float u0 = quad.source.x / width;
+					float v0 = quad.source.y / height;
+					float u1 = (quad.source.x + quad.source.width) / width;
+					float v1 = (quad.source.y + quad.source.height) / height;
+
+					rlColor4ub(quad.tint.r, quad.tint.g, quad.tint.b, quad.tint.a);
+					rlTexCoord2f(u0, v0);
+					rlVertex2f(quad.dest.x, quad.dest.y);
+					rlTexCoord2f(u0, v1);
+					rlVertex2f(quad.dest.x, quad.dest.y + quad.dest.height);
+					rlTexCoord2f(u1, v1);
+					rlVertex2f(quad.dest.x + quad.dest.width, quad.dest.y + quad.dest.height);
+					rlTexCoord2f(u1, v0);
+					rlVertex2f(quad.dest.x + quad.dest.width, quad.dest.y);
+				}
+
+				rlEnd();
+				rlSetTexture(0);
+				start = end;
+			}
+
+			rlDrawRenderBatchActive();
+			flushes++;
+
+			quads.clear();
+			order.clear();
+		}
+};
+
+SpriteBatch sprite_batch;
+
+// nullptr when the sheet does not exist, the pointer stays valid while spritesheets_list is only added to
+SpriteSheet* find_spritesheet(const std::string& name) {
+	auto it = spritesheets_list.find(name);
+	return it == spritesheets_list.end() ? nullptr : &it->second;
+}
+
+// The state defaults to the sheet's first one
+Sprite make_sprite(const std::string& sheet_name, const std::string& state_name = "", int layer = 0) {
+	Sprite sprite;
+	sprite.layer = layer;
+	sprite.sheet = find_spritesheet(sheet_name);
+
+	if (sprite.sheet && !sprite.sheet->states.empty()) {
+		auto it	     = sprite.sheet->states.find(state_name);
+		sprite.state = it != sprite.sheet->states.end() ? &it->second : &sprite.sheet->states.begin()->second;
+	}
+
+	return sprite;
+}
+
+// False when the sprite has nothing to draw, e.g. its sheet or image is missing
+bool submit_sprite(const Sprite& sprite, size_t frame, float x, float y) {
+	if (!sprite.state || sprite.state->frames.empty() || !ensure_spritesheet_texture(*sprite.sheet)) return false;
+
+	const SpriteSheet& sheet = *sprite.sheet;
+	const SpriteFrame& cell	 = sprite.state->frames[frame % sprite.state->frames.size()];
+
+	sprite_batch.submit(sheet.image, {(float)cell.x, (float)cell.y, (float)sheet.frame_width, (float)sheet.frame_height},
+			    {x, y, (float)sheet.frame_width, (float)sheet.frame_height}, sprite.layer);
+	return true;
+}
@@ -1,5 +1,7 @@
 #pragma once
+#include "archive.h"
 #include "global.h"
+#include <toml.hpp>
 
 enum SPRITE_SHEET_TYPES { NONE, EIGHT_DIR, FOUR_DIR };
 
@@ -8,6 +10,8 @@ struct SpriteFrame {
 		int y = 0;
 };
 
+static_assert(sizeof(SpriteFrame) == 2 * sizeof(int32_t), "SpriteFrame must match the binary frame layout");
+
 struct AnimationState {
 		std::vector<SpriteFrame> frames;
 		int fps;
@@ -22,7 +26,7 @@ class SpriteSheet {
 		SPRITE_SHEET_TYPES sheet_type = NONE;
 
 		std::string image_path;
-		Texture2D image;
+		Texture2D image = {};
 
 		int frame_width	 = TILE_SIZE;
 		int frame_height = TILE_SIZE;
@@ -30,4 +34,136 @@ class SpriteSheet {
 		std::unordered_map<std::string, AnimationState> states;
 };
 
-std::unordered_map<std::string, SpriteSheet> spritesheets_list;
\ No newline at end of file
+std::unordered_map<std::string, SpriteSheet> spritesheets_list;
+
+bool load_spritesheet_from_toml(std::string_view string, SpriteSheet& sheet) {
+	toml::table tbl = toml::parse(string);
+
+	auto image  = tbl.get("image_path")->value<std::string>();
+	auto width  = tbl.get("width")->value<toml::int32_t>();
+	auto height = tbl.get("height")->value<toml::int32_t>();
+
+	sheet.image_path   = *image;
+	sheet.frame_width  = *width;
+	sheet.frame_height = *height;
+
+	if (auto states_tbl = tbl["states"].as_table()) {
+		for (const auto& [state_name, state_value] : *states_tbl) {
+			if (auto anim_tbl = state_value.as_table()) {
+				AnimationState anim;
+				anim.fps = anim_tbl->get("fps")->value_or(6);
+
+				if (auto frames_array = anim_tbl->get("frames")->as_array()) {
+					anim.frames.reserve(frames_array->size());
+					for (const auto& frame : *frames_array) {
+						if (auto xy = frame.as_array(); xy && xy->size() == 2) {
+							int x = (*xy)[0].value_or(0);
+							int y = (*xy)[1].value_or(0);
+							anim.frames.push_back({x, y});
+						}
+					}
+				}
+				sheet.states[state_name.data()] = anim;
+			}
+		}
+	}
+
+	return true;
+}
+
+// Reads the little endian binary sheets compiled by the editor's exporter (spritesheetcompiler.py)
+#define SPRITESHEET_BINARY_VERSION 1
+
+struct BinaryReader {
+		const unsigned char* data;
+		size_t size;
+		size_t pos = 0;
+
+		bool read(void* out, size_t n) {
+			if (size - pos < n) return false;
+			memcpy(out, data + pos, n);
+			pos += n;
+			return true;
+		}
+
+		bool read_string(std::string& out) {
+			uint16_t length;
+			if (!read(&length, sizeof(length)) || size - pos < length) return false;
+			out.assign((const char*)data + pos, length);
+			pos += length;
+			return true;
+		}
+};
+
+bool load_spritesheet_from_binary(const unsigned char* data, size_t size, SpriteSheet& sheet) {
+	BinaryReader reader{data, size};
+
+	char magic[4];
+	uint16_t version, reserved;
+	int32_t width, height;
+	uint32_t state_count;
+
+	if (!reader.read(magic, 4) || memcmp(magic, "ASPR", 4) != 0) return false;
+	if (!reader.read(&version, 2) || version != SPRITESHEET_BINARY_VERSION) return false;
+	if (!reader.read(&reserved, 2) || !reader.read(&width, 4) || !reader.read(&height, 4)) return false;
+	if (!reader.read_string(sheet.image_path) || !reader.read(&state_count, 4)) return false;
+
+	sheet.frame_width  = width;
+	sheet.frame_height = height;
+
+	for (uint32_t i = 0; i < state_count; i++) {
+		std::string name;
+		int32_t fps;
+		uint32_t frame_count;
+
+		if (!reader.read_string(name) || !reader.read(&fps, 4) || !reader.read(&frame_count, 4)) return false;
+		if ((reader.size - reader.pos) / sizeof(SpriteFrame) < frame_count) return false;
+
+		AnimationState anim;
+		anim.fps = fps;
+		anim.frames.resize(frame_count);
+		reader.read(anim.frames.data(), frame_count * sizeof(SpriteFrame));
+
+		sheet.states[name] = std::move(anim);
+	}
+
+	return true;
+}
+
+// Textures by asset path, sheets packed into the same atlas page share one texture
+std::unordered_map<std::string, Texture2D> textures_list;
+
+// Decodes an image asset into a texture on first use, the asset bytes go back to the archive cache
+Texture2D* get_texture(const std::string& image_path) {
+	auto it = textures_list.find(image_path);
+	if (it == textures_list.end()) {
+		Texture2D texture = {};
+		double start	  = GetTime();
+
+		if (auto asset = game_archive.get_asset(image_path)) {
+			Image img = load_image_from_asset(image_path, *asset);
+			texture	  = LoadTextureFromImage(img);
+			UnloadImage(img);
+
+			TraceLog(LOG_INFO, "Loaded texture %s in %.2f ms", image_path.c_str(), (GetTime() - start) * 1000.0);
+		} else {
+			TraceLog(LOG_WARNING, "missing image %s", image_path.c_str());
+		}
+
+		// Missing images are remembered too so they are not looked up every frame
+		it = textures_list.emplace(image_path, texture).first;
+	}
+
+	return it->second.id ? &it->second : nullptr;
+}
+
+bool ensure_spritesheet_texture(SpriteSheet& sheet) {
+	if (sheet.image.id) return true;
+
+	if (Texture2D* texture = get_texture(sheet.image_path)) {
+		sheet.image = *texture;
+		return true;
+	}
+
+	return false;
+}
\ No newline at end of file
@@ -1,10 +1,315 @@
 #pragma once
+#include "global.h"
+#include "spritebatch.h"
+#include "spritesheet.h"
+#include <cmath>
+#include <cstdint>
+#include <toml.hpp>
 
+// Actor definitions from actors/<name>.toml, keyed by file name like the sheets
+struct ActorType {
+		std::string name;
+		std::string spritesheet;
+		int speed  = 0;
+		int width  = TILE_SIZE;
+		int height = TILE_SIZE;
+};
+
+std::unordered_map<std::string, ActorType> actors_list;
+
+bool load_actor_from_toml(std::string_view string, ActorType& actor) {
+	toml::table tbl = toml::parse(string);
+
+	actor.name	  = tbl["name"].value_or(std::string());
+	actor.spritesheet = tbl["spritesheet"].value_or(std::string());
+	actor.speed	  = tbl["speed"].value_or(0);
+	actor.width	  = tbl["width"].value_or(TILE_SIZE);
+	actor.height	  = tbl["height"].value_or(TILE_SIZE);
+
+	return true;
+}
+
+// World units per grid cell, a few actors wide so most queries touch a handful of cells
+#define SPATIAL_CELL_SIZE 64.0f
+
+// Uniform grid over an unbounded world: cells hash into a power of two bucket table and every bucket is an
+// intrusive list through next/prev, so inserting, removing and moving an id are O(1). An id is filed under the
+// cell of its top-left corner, queries widen their range by the largest size filed to still find it.
+class SpatialHash {
+	private:
+		std::vector<int32_t> heads;
+		std::vector<int32_t> next, prev;
+		std::vector<int64_t> cells;
+		size_t count = 0;
+
+		static int64_t cell_key(int cx, int cy) { return ((int64_t)cy << 32) | (uint32_t)cx; }
+		static int cell_x(int64_t key) { return (int)(int32_t)(uint32_t)key; }
+		static int cell_y(int64_t key) { return (int)(key >> 32); }
+		static int cell_of(float position) { return (int)std::floor(position / SPATIAL_CELL_SIZE); }
+
+		size_t bucket(int64_t key) const { return (((uint32_t)cell_x(key) * 73856093u) ^ ((uint32_t)cell_y(key) * 19349663u)) & (heads.size() - 1); }
+
+		void link(uint32_t id) {
+			int32_t& head = heads[bucket(cells[id])];
+			prev[id]      = -1;
+			next[id]      = head;
+			if (head >= 0) prev[head] = (int32_t)id;
+			head = (int32_t)id;
+		}
+
+		void unlink(uint32_t id) {
+			if (prev[id] >= 0) {
+				next[prev[id]] = next[id];
+			} else {
+				heads[bucket(cells[id])] = next[id];
+			}
+			if (next[id] >= 0) prev[next[id]] = prev[id];
+		}
+
+		// Keeps about one id per bucket, relinking is linear and happens only when the count doubles
+		void grow(size_t ids) {
+			size_t buckets = std::max<size_t>(heads.size(), 64);
+			while (buckets < count)
+				buckets *= 2;
+
+			if (buckets != heads.size()) {
+				heads.assign(buckets, -1);
+				for (size_t id = 0; id < ids; id++) {
+					if (cells[id] != EMPTY) link((uint32_t)id);
+				}
+			}
+		}
+
+	public:
+		static constexpr int64_t EMPTY = INT64_MIN;
+
+		float max_width	 = 0;
+		float max_height = 0;
+
+		void clear() {
+			heads.clear();
+			next.clear();
+			prev.clear();
+			cells.clear();
+			count	  = 0;
+			max_width = max_height = 0;
+		}
+
+		void insert(uint32_t id, Rectangle bounds) {
+			if (id >= cells.size()) {
+				next.resize(id + 1, -1);
+				prev.resize(id + 1, -1);
+				cells.resize(id + 1, EMPTY);
+			}
+
+			count++;
+			grow(cells.size());
+			cells[id]  = cell_key(cell_of(bounds.x), cell_of(bounds.y));
+			max_width  = std::max(max_width, bounds.width);
+			max_height = std::max(max_height, bounds.height);
+			link(id);
+		}
+
+		void remove(uint32_t id) {
+			if (id >= cells.size() || cells[id] == EMPTY) return;
+
+			unlink(id);
+			cells[id] = EMPTY;
+			count--;
+		}
+
+		// Only touches the lists when the id crossed into another cell
+		void move(uint32_t id, float x, float y) {
+			int64_t key = cell_key(cell_of(x), cell_of(y));
+			if (key == cells[id]) return;
+
+			unlink(id);
+			cells[id] = key;
+			link(id);
+		}
+
+		// Calls visit(id) once for every id filed in a cell that may hold something overlapping the area.
+		// visit() checks the actual bounds.
+		template <typename Visit> void visit_area(Rectangle area, Visit visit) const {
+			if (!count) return;
+
+			int first_x = cell_of(area.x - max_width), first_y = cell_of(area.y - max_height);
+			int end_x = cell_of(area.x + area.width), end_y = cell_of(area.y + area.height);
+
+			// Past this many cells walking every id is cheaper than walking the cells
+			if ((double)(end_x - first_x + 1) * (end_y - first_y + 1) > (double)count) {
+				for (size_t id = 0; id < cells.size(); id++) {
+					if (cells[id] != EMPTY) visit((uint32_t)id);
+				}
+				return;
+			}
+
+			for (int cy = first_y; cy <= end_y; cy++) {
+				for (int cx = first_x; cx <= end_x; cx++) {
+					int64_t key = cell_key(cx, cy);
+					// Other cells hashing to the same bucket are skipped, each id is visited from its own cell only
+					for (int32_t id = heads[bucket(key)]; id >= 0; id = next[id]) {
+						if (cells[id] == key) visit((uint32_t)id);
+					}
+				}
+			}
+		}
+};
+
+bool rectangles_overlap(const Rectangle& a, const Rectangle& b) {
+	return a.x < b.x + b.width && b.x < a.x + a.width && a.y < b.y + b.height && b.y < a.y + a.height;
+}
+
+// Actors of the running stage as parallel arrays, one index per actor. Systems walk the arrays they need
+// front to back, removal swaps the last actor into the hole so the arrays stay dense.
 class Stage {
 	private:
+		// Reused by render() so drawing does not allocate
+		std::vector<uint32_t> visible;
+
 	public:
 		Stage() {}
 		~Stage() {}
 
-		void process() {}
-};
\ No newline at end of file
+		std::vector<float> position_x, position_y;
+		std::vector<float> velocity_x, velocity_y;
+		std::vector<float> width, height;
+		std::vector<Sprite> sprite;
+		std::vector<float> animation_time;
+
+		SpatialHash grid;
+
+		size_t size() const { return position_x.size(); }
+
+		Rectangle bounds(uint32_t actor) const { return {position_x[actor], position_y[actor], width[actor], height[actor]}; }
+
+		uint32_t add_actor(const ActorType& type, float x, float y) {
+			uint32_t actor = (uint32_t)size();
+
+			position_x.push_back(x);
+			position_y.push_back(y);
+			velocity_x.push_back(0);
+			velocity_y.push_back(0);
+			width.push_back((float)type.width);
+			height.push_back((float)type.height);
+			sprite.push_back(make_sprite(type.spritesheet));
+			animation_time.push_back(0);
+
+			grid.insert(actor, bounds(actor));
+			return actor;
+		}
+
+		// The last actor takes the removed one's index
+		void remove_actor(uint32_t actor) {
+			uint32_t last = (uint32_t)size() - 1;
+			grid.remove(actor);
+
+			if (actor != last) {
+				grid.remove(last);
+				position_x[actor]     = position_x[last];
+				position_y[actor]     = position_y[last];
+				velocity_x[actor]     = velocity_x[last];
+				velocity_y[actor]     = velocity_y[last];
+				width[actor]	      = width[last];
+				height[actor]	      = height[last];
+				sprite[actor]	      = sprite[last];
+				animation_time[actor] = animation_time[last];
+				grid.insert(actor, bounds(actor));
+			}
+
+			position_x.pop_back();
+			position_y.pop_back();
+			velocity_x.pop_back();
+			velocity_y.pop_back();
+			width.pop_back();
+			height.pop_back();
+			sprite.pop_back();
+			animation_time.pop_back();
+		}
+
+		void clear() {
+			position_x.clear();
+			position_y.clear();
+			velocity_x.clear();
+			velocity_y.clear();
+			width.clear();
+			height.clear();
+			sprite.clear();
+			animation_time.clear();
+			grid.clear();
+		}
+
+		void process(float delta) {
+			size_t count = size();
+
+			for (size_t i = 0; i < count; i++) {
+				position_x[i] += velocity_x[i] * delta;
+				position_y[i] += velocity_y[i] * delta;
+			}
+
+			for (size_t i = 0; i < count; i++) {
+				if (velocity_x[i] != 0 || velocity_y[i] != 0) grid.move((uint32_t)i, position_x[i], position_y[i]);
+			}
+
+			for (size_t i = 0; i < count; i++) {
+				animation_time[i] += delta;
+			}
+		}
+
+		// Actors whose bounds overlap the area, in no particular order
+		void query_range(Rectangle area, std::vector<uint32_t>& out) const {
+			out.clear();
+			grid.visit_area(area, [&](uint32_t actor) {
+				if (rectangles_overlap(bounds(actor), area)) out.push_back(actor);
+			});
+		}
+
+		// Every pair of actors whose bounds overlap, the lower index first
+		void query_overlaps(std::vector<std::pair<uint32_t, uint32_t>>& out) const {
+			out.clear();
+			for (uint32_t actor = 0; actor < size(); actor++) {
+				Rectangle area = bounds(actor);
+				grid.visit_area(area, [&](uint32_t other) {
+					if (other > actor && rectangles_overlap(bounds(other), area)) out.push_back({actor, other});
+				});
+			}
+		}
+
+		// Submits the actors on screen to the sprite batch
+		void render(const Camera2D& view_camera, int screen_width, int screen_height) {
+			query_range(camera_view(view_camera, screen_width, screen_height), visible);
+
+			for (uint32_t actor : visible) {
+				const Sprite& actor_sprite = sprite[actor];
+				size_t frame		   = actor_sprite.state ? (size_t)(animation_time[actor] * actor_sprite.state->fps) : 0;
+				submit_sprite(actor_sprite, frame, position_x[actor], position_y[actor]);
+			}
+		}
+
+		size_t visible_count() const { return visible.size(); }
+};
+
+Stage current_stage;
+
+// Actors listed in a stage TOML as [[actors]] tables of actor (a key of actors_list), x and y
+bool load_stage_from_toml(std::string_view string, Stage& stage) {
+	toml::table tbl = toml::parse(string);
+	stage.clear();
+
+	if (auto actors = tbl["actors"].as_array()) {
+		for (const auto& entry : *actors) {
+			auto actor_tbl = entry.as_table();
+			if (!actor_tbl) continue;
+
+			auto type = actors_list.find((*actor_tbl)["actor"].value_or(std::string()));
+			if (type == actors_list.end()) {
+				TraceLog(LOG_WARNING, "STAGE: unknown actor %s", (*actor_tbl)["actor"].value_or(std::string()).c_str());
+				continue;
+			}
+
+			stage.add_actor(type->second, (*actor_tbl)["x"].value_or(0.0f), (*actor_tbl)["y"].value_or(0.0f));
+		}
+	}
+
+	return true;
+}
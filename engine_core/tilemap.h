@@ -1,18 +1,394 @@
 #pragma once
 #include "global.h"
+#include "spritesheet.h"
+#include <algorithm>
+#include <cmath>
+#include <cstdint>
+
+// Declarations only, the implementation is compiled with vendor/zip
+#ifndef MINIZ_HEADER_FILE_ONLY
+#define MINIZ_HEADER_FILE_ONLY
+#endif
+#include <miniz.h>
+
+// Binary tilemap written by the editor's exporter (tilemapcompiler.py) as "stages/<name>.toml.tiles", little endian:
+//   "ATIL", u16 version, u16 chunk size, u32 width, u32 height, u32 tile size, u32 layer count, u16 length + tileset path
+//   per layer: u16 length + name, u16 flags (1 = visible), u32 chunk count, then per chunk:
+//     u16 cx, u16 cy, u8 codec, u8 reserved, u16 reserved, u32 offset, u32 size
+//   chunk blobs, offsets count from the start of the file
+// A chunk decodes to chunk size * chunk size tile ids in row-major order, 0 is no tile.
+#define TILEMAP_BINARY_VERSION 1
+#define TILEMAP_LAYER_VISIBLE 1
+
+enum TILEMAP_CHUNK_CODEC { CHUNK_RAW, CHUNK_RLE, CHUNK_DEFLATE };
+
+struct TilemapChunk {
+		uint8_t codec	= CHUNK_RAW;
+		uint32_t offset = 0;
+		uint32_t size	= 0;
+		// Index of the decoded ids in Tilemap::tilemap_buffer, in chunks, -1 until first used
+		int slot = -1;
+};
+
+struct TilemapLayer {
+		std::string name;
+		bool visible = true;
+		std::unordered_map<uint32_t, TilemapChunk> chunks;
+};
+
+uint32_t tilemap_chunk_key(int cx, int cy) { return ((uint32_t)cy << 16) | (uint32_t)cx; }
 
 class Tileset {
 	private:
 	public:
 		Tileset() {}
 		~Tileset() {}
+
+		std::string image_path;
 };
 
 class Tilemap {
 	private:
+		// Decoded chunks, chunk_size * chunk_size ids each, in the order they were first used
 		std::vector<unsigned int> tilemap_buffer;
+		// The file as exported, chunks are decoded from it on demand
+		std::vector<unsigned char> data;
+
+		// Only chunk positions changed by set() have an entry
+		std::unordered_map<uint32_t, uint32_t> revisions;
+
+		unsigned int* chunk_ids(size_t layer, int cx, int cy, bool create) {
+			if (layer >= layers.size() || cx < 0 || cy < 0 || !chunk_size) return nullptr;
+
+			auto& chunks = layers[layer].chunks;
+			auto it	     = chunks.find(tilemap_chunk_key(cx, cy));
+			if (it == chunks.end()) {
+				if (!create) return nullptr;
+
+				// A new chunk has no blob, its ids only live in the buffer
+				it		= chunks.emplace(tilemap_chunk_key(cx, cy), TilemapChunk{}).first;
+				it->second.slot = (int)decoded_chunks();
+				tilemap_buffer.resize(tilemap_buffer.size() + (size_t)chunk_size * chunk_size, 0u);
+			}
+
+			size_t count	    = (size_t)chunk_size * chunk_size;
+			TilemapChunk& entry = it->second;
+			if (entry.slot < 0) {
+				entry.slot = (int)(tilemap_buffer.size() / count);
+				tilemap_buffer.resize(tilemap_buffer.size() + count);
+
+				if (!decode(entry, tilemap_buffer.data() + (size_t)entry.slot * count)) {
+					TraceLog(LOG_WARNING, "TILEMAP: invalid chunk %d,%d in layer %s", cx, cy, layers[layer].name.c_str());
+					std::fill(tilemap_buffer.end() - count, tilemap_buffer.end(), 0u);
+				}
+			}
+
+			return tilemap_buffer.data() + (size_t)entry.slot * count;
+		}
+
+		bool decode(const TilemapChunk& chunk, unsigned int* out) {
+			size_t count = (size_t)chunk_size * chunk_size;
+			if (chunk.offset > data.size() || data.size() - chunk.offset < chunk.size) return false;
+			const unsigned char* src = data.data() + chunk.offset;
+
+			switch (chunk.codec) {
+			case CHUNK_RAW:
+				if (chunk.size != count * sizeof(unsigned int)) return false;
+				memcpy(out, src, chunk.size);
+				return true;
+
+			case CHUNK_RLE: {
+				// (u32 run length, u32 id) pairs
+				size_t filled = 0;
+				for (uint32_t pos = 0; pos + 8 <= chunk.size; pos += 8) {
+					uint32_t run, id;
+					memcpy(&run, src + pos, 4);
+					memcpy(&id, src + pos + 4, 4);
+					if (run > count - filled) return false;
+					std::fill(out + filled, out + filled + run, id);
+					filled += run;
+				}
+				return filled == count;
+			}
+
+			case CHUNK_DEFLATE:
+				return tinfl_decompress_mem_to_mem(out, count * sizeof(unsigned int), src, chunk.size, TINFL_FLAG_PARSE_ZLIB_HEADER) ==
+				       count * sizeof(unsigned int);
+			}
+
+			return false;
+		}
 
 	public:
 		Tilemap() {}
 		~Tilemap() {}
-};
\ No newline at end of file
+
+		int width      = 0;
+		int height     = 0;
+		int tile_size  = TILE_SIZE;
+		int chunk_size = 0;
+
+		Tileset tileset;
+		std::vector<TilemapLayer> layers;
+
+		// Reads the header and chunk index, no chunk is decoded yet
+		bool load(const unsigned char* bytes, size_t size) {
+			data.assign(bytes, bytes + size);
+			tilemap_buffer.clear();
+			revisions.clear();
+			layers.clear();
+
+			size_t pos = 0;
+			auto read  = [&](void* out, size_t n) {
+				if (data.size() - pos < n) return false;
+				memcpy(out, data.data() + pos, n);
+				pos += n;
+				return true;
+			};
+			auto read_string = [&](std::string& out) {
+				uint16_t length;
+				if (!read(&length, 2) || data.size() - pos < length) return false;
+				out.assign((const char*)data.data() + pos, length);
+				pos += length;
+				return true;
+			};
+
+			char magic[4];
+			uint16_t version, chunk;
+			uint32_t w, h, tile, layer_count;
+			if (!read(magic, 4) || memcmp(magic, "ATIL", 4) != 0) return false;
+			if (!read(&version, 2) || version != TILEMAP_BINARY_VERSION || !read(&chunk, 2) || chunk == 0) return false;
+			if (!read(&w, 4) || !read(&h, 4) || !read(&tile, 4) || !read(&layer_count, 4) || !read_string(tileset.image_path)) return false;
+
+			width	   = (int)w;
+			height	   = (int)h;
+			tile_size  = (int)tile;
+			chunk_size = chunk;
+
+			layers.resize(layer_count);
+			for (auto& layer : layers) {
+				uint16_t flags;
+				uint32_t chunk_count;
+				if (!read_string(layer.name) || !read(&flags, 2) || !read(&chunk_count, 4)) return false;
+				layer.visible = flags & TILEMAP_LAYER_VISIBLE;
+
+				layer.chunks.reserve(chunk_count);
+				for (uint32_t i = 0; i < chunk_count; i++) {
+					uint16_t cx, cy, reserved16;
+					uint8_t reserved8;
+					TilemapChunk entry;
+					if (!read(&cx, 2) || !read(&cy, 2) || !read(&entry.codec, 1) || !read(&reserved8, 1) || !read(&reserved16, 2) ||
+					    !read(&entry.offset, 4) || !read(&entry.size, 4))
+						return false;
+					layer.chunks[tilemap_chunk_key(cx, cy)] = entry;
+				}
+			}
+
+			return true;
+		}
+
+		// Tile ids of one chunk, decoded on first use. nullptr for chunks without tiles.
+		// The pointer stays valid until another chunk is decoded.
+		const unsigned int* chunk(size_t layer, int cx, int cy) { return chunk_ids(layer, cx, cy, false); }
+
+		// Bumped by set(), a chunk position drawn with an older revision has to be drawn again
+		uint32_t revision(int cx, int cy) const {
+			auto it = revisions.find(tilemap_chunk_key(cx, cy));
+			return it == revisions.end() ? 0 : it->second;
+		}
+
+		bool has_chunk(int cx, int cy) const {
+			for (const auto& layer : layers) {
+				if (layer.chunks.count(tilemap_chunk_key(cx, cy))) return true;
+			}
+			return false;
+		}
+
+		unsigned int get(size_t layer, int x, int y) {
+			if (x < 0 || y < 0 || x >= width || y >= height) return 0;
+
+			const unsigned int* ids = chunk(layer, x / chunk_size, y / chunk_size);
+			return ids ? ids[(y % chunk_size) * chunk_size + x % chunk_size] : 0;
+		}
+
+		void set(size_t layer, int x, int y, unsigned int id) {
+			if (x < 0 || y < 0 || x >= width || y >= height) return;
+
+			unsigned int* ids = chunk_ids(layer, x / chunk_size, y / chunk_size, id != 0);
+			if (!ids) return;
+
+			ids[(y % chunk_size) * chunk_size + x % chunk_size] = id;
+			revisions[tilemap_chunk_key(x / chunk_size, y / chunk_size)]++;
+		}
+
+		size_t decoded_chunks() const { return chunk_size ? tilemap_buffer.size() / ((size_t)chunk_size * chunk_size) : 0; }
+};
+
+// Tilemaps by stage file name, e.g. "level1.toml"
+std::unordered_map<std::string, Tilemap> tilemaps_list;
+
+// File name of the running stage, e.g. "level1.toml", its tilemap is the one drawn
+std::string current_stage_name;
+
+// GPU memory for baked chunks, the least recently drawn ones are unloaded past it
+#define TILEMAP_BAKE_BUDGET (64 * 1024 * 1024)
+
+struct TilemapBake {
+		RenderTexture2D texture = {};
+		uint32_t revision	= 0;
+		uint64_t last_used	= 0;
+};
+
+// Draws the visible layers of each chunk into one texture, a frame then draws one quad per chunk on screen.
+// Only the chunks around the camera are looked at, so the cost depends on the screen size, not the map size.
+class TilemapRenderer {
+	private:
+		const Tilemap* baked_map = nullptr;
+		std::unordered_map<uint32_t, TilemapBake> bakes;
+		std::vector<uint32_t> visible_keys;
+		uint64_t frame = 0;
+
+		void bake(Tilemap& map, const Texture2D& tileset, int cx, int cy, TilemapBake& target) {
+			int chunk_pixels = map.chunk_size * map.tile_size;
+			if (!target.texture.id) target.texture = LoadRenderTexture(chunk_pixels, chunk_pixels);
+
+			int columns = std::max(1, tileset.width / map.tile_size);
+			BeginTextureMode(target.texture);
+			ClearBackground(BLANK);
+
+			for (size_t layer = 0; layer < map.layers.size(); layer++) {
+				if (!map.layers[layer].visible) continue;
+
+				const unsigned int* ids = map.chunk(layer, cx, cy);
+				if (!ids) continue;
+
+				for (int y = 0; y < map.chunk_size; y++) {
+					for (int x = 0; x < map.chunk_size; x++) {
+						unsigned int tile = ids[y * map.chunk_size + x];
+						if (!tile) continue;
+
+						// Tile n is cell n - 1 of the tileset in reading order
+						Rectangle source = {(float)(((tile - 1) % columns) * map.tile_size),
+								    (float)(((tile - 1) / columns) * map.tile_size), (float)map.tile_size,
+								    (float)map.tile_size};
+						DrawTextureRec(tileset, source, {(float)(x * map.tile_size), (float)(y * map.tile_size)}, WHITE);
+					}
+				}
+			}
+
+			EndTextureMode();
+			target.revision = map.revision(cx, cy);
+			baked_chunks++;
+		}
+
+		void evict(size_t keep) {
+			if (bakes.size() <= keep) return;
+
+			std::vector<std::pair<uint64_t, uint32_t>> unused;
+			for (const auto& [key, bake] : bakes) {
+				if (bake.last_used != frame) unused.push_back({bake.last_used, key});
+			}
+			std::sort(unused.begin(), unused.end());
+
+			for (size_t i = 0; i < unused.size() && bakes.size() > keep; i++) {
+				UnloadRenderTexture(bakes[unused[i].second].texture);
+				bakes.erase(unused[i].second);
+			}
+		}
+
+	public:
+		// Stats of the last frame for the debug overlay
+		int visible_chunks = 0;
+		int baked_chunks   = 0;
+		double frame_ms	   = 0.0;
+
+		size_t cached_chunks() const { return bakes.size(); }
+
+		// Bakes the chunks on screen that are new or changed. Runs before the frame's render target is bound,
+		// raylib can not nest texture modes.
+		void prepare(Tilemap& map, const Camera2D& camera, int screen_width, int screen_height) {
+			double start = GetTime();
+			frame++;
+			visible_chunks = baked_chunks = 0;
+			visible_keys.clear();
+
+			if (baked_map != &map) clear();
+			baked_map = &map;
+
+			Texture2D* tileset = get_texture(map.tileset.image_path);
+			if (!tileset || !map.chunk_size || map.tile_size <= 0) {
+				frame_ms = (GetTime() - start) * 1000.0;
+				return;
+			}
+
+			Rectangle view = camera_view(camera, screen_width, screen_height);
+
+			float chunk_pixels = (float)(map.chunk_size * map.tile_size);
+			int last_cx	   = (map.width - 1) / map.chunk_size;
+			int last_cy	   = (map.height - 1) / map.chunk_size;
+			int first_x	   = std::max(0, (int)std::floor(view.x / chunk_pixels));
+			int first_y	   = std::max(0, (int)std::floor(view.y / chunk_pixels));
+			int end_x	   = std::min(last_cx, (int)std::floor((view.x + view.width) / chunk_pixels));
+			int end_y	   = std::min(last_cy, (int)std::floor((view.y + view.height) / chunk_pixels));
+
+			for (int cy = first_y; cy <= end_y; cy++) {
+				for (int cx = first_x; cx <= end_x; cx++) {
+					if (!map.has_chunk(cx, cy)) continue;
+
+					uint32_t key	   = tilemap_chunk_key(cx, cy);
+					auto it		   = bakes.find(key);
+					bool stale	   = it == bakes.end() || it->second.revision != map.revision(cx, cy);
+					TilemapBake& entry = it == bakes.end() ? bakes[key] : it->second;
+
+					if (stale) bake(map, *tileset, cx, cy, entry);
+					entry.last_used = frame;
+					visible_keys.push_back(key);
+				}
+			}
+			visible_chunks = (int)visible_keys.size();
+
+			// Never unloads what is on screen, a zoomed out camera may go past the budget
+			size_t chunk_bytes = (size_t)chunk_pixels * (size_t)chunk_pixels * 4;
+			evict(std::max(visible_keys.size(), (size_t)TILEMAP_BAKE_BUDGET / chunk_bytes));
+
+			frame_ms = (GetTime() - start) * 1000.0;
+		}
+
+		// Draws the chunks found by prepare(), inside BeginMode2D
+		void draw(const Tilemap& map) {
+			if (baked_map != &map) return;
+
+			double start	   = GetTime();
+			float chunk_pixels = (float)(map.chunk_size * map.tile_size);
+
+			for (uint32_t key : visible_keys) {
+				const RenderTexture2D& texture = bakes[key].texture;
+				// Render textures are stored upside down
+				Rectangle source = {0, 0, chunk_pixels, -chunk_pixels};
+				DrawTextureRec(texture.texture, source, {(float)(key & 0xffff) * chunk_pixels, (float)(key >> 16) * chunk_pixels}, WHITE);
+			}
+
+			frame_ms += (GetTime() - start) * 1000.0;
+		}
+
+		void clear() {
+			for (auto& [key, bake] : bakes) {
+				UnloadRenderTexture(bake.texture);
+			}
+			bakes.clear();
+			visible_keys.clear();
+			baked_map = nullptr;
+		}
+};
+
+TilemapRenderer tilemap_renderer;
+
+void prepare_tilemap(int screen_width, int screen_height) {
+	auto it = tilemaps_list.find(current_stage_name);
+	if (it != tilemaps_list.end()) tilemap_renderer.prepare(it->second, camera, screen_width, screen_height);
+}
+
+void render_tilemap() {
+	auto it = tilemaps_list.find(current_stage_name);
+	if (it != tilemaps_list.end()) tilemap_renderer.draw(it->second);
+}
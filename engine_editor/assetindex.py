@@ -0,0 +1,491 @@
+import os
+import bisect
+import sqlite3
+from PySide6.QtCore import *
+from PySide6.QtGui import *
+from PySide6.QtWidgets import *
+
+import exporter
+from thumbnails import ThumbnailLoader
+
+INDEX_DB_NAME = "assets.db"
+SCHEMA_VERSION = 1
+IMAGE_EXTENSIONS = (".png", ".jpg", ".jpeg", ".bmp", ".gif")
+
+# Never listed in the tree, the index itself lives in the cache folder
+IGNORED_NAMES = {exporter.CACHE_DIR_NAME, ".git"}
+
+# Changes reported by the watcher are gathered for this long before the index is updated
+WATCH_DELAY_MS = 200
+
+SCHEMA = """
+CREATE TABLE IF NOT EXISTS assets (
+    path TEXT PRIMARY KEY,
+    parent TEXT NOT NULL,
+    name TEXT NOT NULL,
+    is_dir INTEGER NOT NULL,
+    kind TEXT NOT NULL,
+    size INTEGER,
+    mtime_ns INTEGER,
+    hash TEXT,
+    width INTEGER,
+    height INTEGER
+);
+CREATE INDEX IF NOT EXISTS assets_parent ON assets (parent);
+"""
+
+
+def classify(path, is_dir):
+    # Paths are relative to the project with "/" separators
+    if is_dir:
+        return "folder"
+
+    folder, _, name = path.rpartition("/")
+    lower = name.lower()
+
+    if path == "project.toml":
+        return "project"
+    if folder == "spritesheets" and lower.endswith(".toml"):
+        return "spritesheet"
+    if folder == "stages" and lower.endswith(".toml"):
+        return "stage"
+    if folder == "actors" and lower.endswith(".toml"):
+        return "actor"
+    if (folder == "assets" or folder.startswith("assets/")) and lower.endswith(IMAGE_EXTENSIONS):
+        return "image"
+    return "file"
+
+
+def join_path(parent, name):
+    return parent + "/" + name if parent else name
+
+
+def image_size(path):
+    # Only the header is read
+    size = QImageReader(path).size()
+    if not size.isValid():
+        return None, None
+    return size.width(), size.height()
+
+
+class AssetDatabase:
+    def __init__(self, project_path):
+        self.project_path = project_path
+
+        cache_dir = os.path.join(project_path, exporter.CACHE_DIR_NAME)
+        os.makedirs(cache_dir, exist_ok=True)
+
+        # One connection per thread, WAL lets the tree read while the indexer writes
+        self.db = sqlite3.connect(os.path.join(cache_dir, INDEX_DB_NAME), timeout=10)
+        self.db.row_factory = sqlite3.Row
+        self.db.execute("PRAGMA journal_mode=WAL")
+
+        if self.db.execute("PRAGMA user_version").fetchone()[0] != SCHEMA_VERSION:
+            self.db.execute("DROP TABLE IF EXISTS assets")
+            self.db.executescript(SCHEMA)
+            self.db.execute(f"PRAGMA user_version={SCHEMA_VERSION}")
+            self.db.commit()
+
+    def close(self):
+        self.db.close()
+
+    def children(self, parent):
+        return self.db.execute("SELECT * FROM assets WHERE parent = ?", (parent,)).fetchall()
+
+    def get(self, path):
+        return self.db.execute("SELECT * FROM assets WHERE path = ?", (path,)).fetchone()
+
+    def folders(self):
+        return [row[0] for row in self.db.execute("SELECT path FROM assets WHERE is_dir = 1")]
+
+    def sync(self, folders=None, cancelled=None):
+        # Brings the rows of the given folders (the whole project by default) in line with the disk,
+        # returns the folders whose children changed
+        changed = set()
+        if folders is None:
+            self.sync_folder("", True, changed, cancelled)
+        else:
+            for folder in folders:
+                self.sync_folder(folder, False, changed, cancelled)
+        self.db.commit()
+        return changed
+
+    def sync_folder(self, folder, recursive, changed, cancelled):
+        if cancelled and cancelled():
+            return
+
+        known = {row["name"]: row for row in self.children(folder)}
+        try:
+            entries = list(os.scandir(os.path.join(self.project_path, folder)))
+        except OSError:
+            entries = []
+
+        seen = set()
+        for entry in entries:
+            if entry.name in IGNORED_NAMES or entry.is_symlink():
+                continue
+
+            seen.add(entry.name)
+            path = join_path(folder, entry.name)
+            row = known.get(entry.name)
+
+            if entry.is_dir():
+                if not row or not row["is_dir"]:
+                    self.db.execute("DELETE FROM assets WHERE path = ?", (path,))
+                    self.insert(path, folder, entry.name, True)
+                    changed.add(folder)
+                    self.sync_folder(path, True, changed, cancelled)
+                elif recursive:
+                    self.sync_folder(path, True, changed, cancelled)
+                continue
+
+            try:
+                st = entry.stat()
+            except OSError:
+                continue
+
+            if row and not row["is_dir"] and row["size"] == st.st_size and row["mtime_ns"] == st.st_mtime_ns:
+                continue
+
+            if row and row["is_dir"]:
+                self.remove(path)
+            self.insert(path, folder, entry.name, False, st)
+            changed.add(folder)
+
+        for name in known.keys() - seen:
+            self.remove(join_path(folder, name))
+            changed.add(folder)
+
+    def insert(self, path, parent, name, is_dir, st=None):
+        size = mtime_ns = digest = width = height = None
+        kind = classify(path, is_dir)
+
+        if st:
+            full_path = os.path.join(self.project_path, path)
+            size, mtime_ns = st.st_size, st.st_mtime_ns
+            try:
+                digest = exporter.hash_file(full_path)
+            except OSError:
+                pass
+            if name.lower().endswith(IMAGE_EXTENSIONS):
+                width, height = image_size(full_path)
+
+        self.db.execute(
+            "INSERT OR REPLACE INTO assets VALUES (?, ?, ?, ?, ?, ?, ?, ?, ?, ?)",
+            (path, parent, name, int(is_dir), kind, size, mtime_ns, digest, width, height),
+        )
+
+    def remove(self, path):
+        self.db.execute("DELETE FROM assets WHERE path = ? OR path LIKE ? ESCAPE '\\'", (path, like_prefix(path)))
+
+
+def like_prefix(path):
+    return path.replace("\\", "\\\\").replace("%", "\\%").replace("_", "\\_") + "/%"
+
+
+class AssetIndexWorker(QThread):
+    synced = Signal(list)
+
+    def __init__(self, project_path, folders=None, parent=None):
+        super().__init__(parent)
+        self.project_path = project_path
+        self.folders = folders
+
+    def run(self):
+        db = AssetDatabase(self.project_path)
+        try:
+            changed = db.sync(self.folders, self.isInterruptionRequested)
+        finally:
+            db.close()
+        self.synced.emit(sorted(changed))
+
+
+class AssetNode:
+    def __init__(self, row=None, parent=None):
+        self.parent = parent
+        self.children = []
+        self.by_name = {}
+        self.loaded = False
+
+        self.path = row["path"] if row else ""
+        self.name = row["name"] if row else ""
+        self.is_dir = bool(row["is_dir"]) if row else True
+        self.update(row)
+
+    def update(self, row):
+        self.kind = row["kind"] if row else "folder"
+        self.size = row["size"] if row else None
+        self.mtime_ns = row["mtime_ns"] if row else None
+        self.width = row["width"] if row else None
+        self.height = row["height"] if row else None
+
+    def sort_key(self):
+        return (not self.is_dir, self.name.lower())
+
+
+class AssetTreeModel(QAbstractItemModel):
+    COLUMNS = ("Name", "Size", "Kind", "Dimensions")
+
+    def __init__(self, parent=None):
+        super().__init__(parent)
+        self.db = None
+        self.thumbnails = None
+        self.root = AssetNode()
+        self.icons = QFileIconProvider()
+
+    def set_database(self, db, thumbnails=None):
+        self.beginResetModel()
+        self.db = db
+        self.thumbnails = thumbnails
+        self.root = AssetNode()
+        self.endResetModel()
+
+        if thumbnails:
+            thumbnails.ready.connect(self.on_thumbnail_ready)
+
+    def on_thumbnail_ready(self, path):
+        node = self.find(path)
+        if node:
+            index = self.node_index(node)
+            self.dataChanged.emit(index, index, [Qt.DecorationRole])
+
+    def node(self, index):
+        return index.internalPointer() if index.isValid() else self.root
+
+    def file_path(self, index):
+        return os.path.join(self.db.project_path, self.node(index).path) if self.db else ""
+
+    def node_index(self, node):
+        if node is self.root:
+            return QModelIndex()
+        return self.createIndex(node.parent.children.index(node), 0, node)
+
+    def find(self, path):
+        node = self.root
+        for name in path.split("/") if path else []:
+            node = node.by_name.get(name)
+            if not node:
+                return None
+        return node
+
+    def index(self, row, column, parent=QModelIndex()):
+        node = self.node(parent)
+        if 0 <= row < len(node.children) and 0 <= column < len(self.COLUMNS):
+            return self.createIndex(row, column, node.children[row])
+        return QModelIndex()
+
+    def parent(self, index):
+        if not index.isValid():
+            return QModelIndex()
+        return self.node_index(index.internalPointer().parent)
+
+    def rowCount(self, parent=QModelIndex()):
+        if parent.column() > 0:
+            return 0
+        return len(self.node(parent).children)
+
+    def columnCount(self, parent=QModelIndex()):
+        return len(self.COLUMNS)
+
+    def hasChildren(self, parent=QModelIndex()):
+        node = self.node(parent)
+        return node.is_dir and (not node.loaded or bool(node.children))
+
+    # Folders are read from the index when they are first expanded
+    def canFetchMore(self, parent):
+        node = self.node(parent)
+        return self.db is not None and node.is_dir and not node.loaded
+
+    def fetchMore(self, parent):
+        node = self.node(parent)
+        node.loaded = True
+
+        children = sorted((AssetNode(row, node) for row in self.db.children(node.path)), key=AssetNode.sort_key)
+        if not children:
+            return
+
+        self.beginInsertRows(parent, 0, len(children) - 1)
+        node.children = children
+        node.by_name = {child.name: child for child in children}
+        self.endInsertRows()
+
+    def update_folder(self, path):
+        # Applies the index rows of one folder to the tree, folders never expanded are left for fetchMore
+        node = self.find(path)
+        if not node or not node.loaded:
+            return
+
+        parent = self.node_index(node)
+        rows = {row["name"]: row for row in self.db.children(path)}
+
+        for row_number in range(len(node.children) - 1, -1, -1):
+            child = node.children[row_number]
+            row = rows.get(child.name)
+            if row and bool(row["is_dir"]) == child.is_dir:
+                child.update(row)
+                continue
+
+            self.beginRemoveRows(parent, row_number, row_number)
+            del node.children[row_number]
+            del node.by_name[child.name]
+            self.endRemoveRows()
+
+        for name, row in rows.items():
+            if name in node.by_name:
+                continue
+
+            child = AssetNode(row, node)
+            row_number = bisect.bisect([c.sort_key() for c in node.children], child.sort_key())
+            self.beginInsertRows(parent, row_number, row_number)
+            node.children.insert(row_number, child)
+            node.by_name[name] = child
+            self.endInsertRows()
+
+        if node.children:
+            self.dataChanged.emit(self.index(0, 0, parent), self.index(len(node.children) - 1, len(self.COLUMNS) - 1, parent))
+
+    def data(self, index, role=Qt.DisplayRole):
+        if not index.isValid():
+            return None
+
+        node = index.internalPointer()
+        column = index.column()
+
+        if role == Qt.DisplayRole:
+            if column == 0:
+                return node.name
+            if column == 1 and node.size is not None:
+                return QLocale().formattedDataSize(node.size)
+            if column == 2:
+                return node.kind
+            if column == 3 and node.width is not None:
+                return f"{node.width} x {node.height}"
+        elif role == Qt.DecorationRole and column == 0:
+            if node.kind == "image" and self.thumbnails:
+                icon = self.thumbnails.icon(node.path, node.mtime_ns, node.size)
+                if icon and not icon.isNull():
+                    return icon
+            return self.icons.icon(QFileIconProvider.Folder if node.is_dir else QFileIconProvider.File)
+        elif role == Qt.ToolTipRole:
+            return node.path
+
+        return None
+
+    def headerData(self, section, orientation, role=Qt.DisplayRole):
+        if orientation == Qt.Horizontal and role == Qt.DisplayRole:
+            return self.COLUMNS[section]
+        return None
+
+
+class AssetIndex(QObject):
+    # Owns the project's asset database, keeps it current with a watcher and a background indexer
+    def __init__(self, parent=None):
+        super().__init__(parent)
+        self.db = None
+        self.thumbnails = None
+        self.model = AssetTreeModel(self)
+        self.worker = None
+        self.pending = set()
+        self.full_sync_pending = False
+
+        self.watcher = QFileSystemWatcher(self)
+        self.watcher.directoryChanged.connect(self.on_directory_changed)
+
+        self.watch_timer = QTimer(self)
+        self.watch_timer.setSingleShot(True)
+        self.watch_timer.setInterval(WATCH_DELAY_MS)
+        self.watch_timer.timeout.connect(self.start_worker)
+
+    def open(self, project_path):
+        self.close()
+
+        # The tree shows the last known state right away, the indexer then catches up with the disk
+        self.db = AssetDatabase(project_path)
+        self.thumbnails = ThumbnailLoader(project_path, self)
+        self.model.set_database(self.db, self.thumbnails)
+        self.watch_folders()
+
+        self.full_sync_pending = True
+        self.start_worker()
+
+    def close(self):
+        self.watch_timer.stop()
+        self.pending.clear()
+        self.full_sync_pending = False
+
+        if self.worker:
+            # Queued results of the old project must not reach the next one
+            self.worker.synced.disconnect(self.on_synced)
+            self.worker.finished.disconnect(self.on_worker_finished)
+            self.worker.requestInterruption()
+            self.worker.wait()
+            self.worker.deleteLater()
+            self.worker = None
+
+        if self.watcher.directories():
+            self.watcher.removePaths(self.watcher.directories())
+
+        self.model.set_database(None)
+        if self.thumbnails:
+            self.thumbnails.close()
+            self.thumbnails.deleteLater()
+            self.thumbnails = None
+        if self.db:
+            self.db.close()
+            self.db = None
+
+    def refresh(self):
+        # The watcher only reports added, removed and renamed entries, a full pass catches files edited in place
+        if self.db:
+            self.full_sync_pending = True
+            self.start_worker()
+
+    def lookup(self, index):
+        return self.db.get(self.model.node(index).path) if self.db else None
+
+    def watch_folders(self):
+        paths = [self.db.project_path] + [os.path.join(self.db.project_path, folder) for folder in self.db.folders()]
+        watched = set(self.watcher.directories())
+
+        stale = [path for path in watched if path not in paths]
+        if stale:
+            self.watcher.removePaths(stale)
+
+        new = [path for path in paths if path not in watched and os.path.isdir(path)]
+        if new:
+            self.watcher.addPaths(new)
+
+    def on_directory_changed(self, path):
+        if not self.db:
+            return
+
+        folder = os.path.relpath(path, self.db.project_path).replace(os.sep, "/")
+        self.pending.add("" if folder == "." else folder)
+        self.watch_timer.start()
+
+    def start_worker(self):
+        if self.worker or not self.db or not (self.full_sync_pending or self.pending):
+            return
+
+        folders = None if self.full_sync_pending else sorted(self.pending)
+        self.full_sync_pending = False
+        self.pending.clear()
+
+        self.worker = AssetIndexWorker(self.db.project_path, folders, self)
+        self.worker.synced.connect(self.on_synced)
+        self.worker.finished.connect(self.on_worker_finished)
+        self.worker.start()
+
+    def on_synced(self, folders):
+        if not self.db:
+            return
+
+        for folder in folders:
+            self.model.update_folder(folder)
+        if folders:
+            self.watch_folders()
+
+    def on_worker_finished(self):
+        self.worker.deleteLater()
+        self.worker = None
+        self.start_worker()
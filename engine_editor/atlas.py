@@ -0,0 +1,280 @@
+import os
+import json
+import shutil
+import hashlib
+import toml
+
+ATLAS_FOLDER = "__atlas__"
+ATLAS_PAGE_SIZE = 2048
+ATLAS_PADDING = 1
+
+
+class MaxRectsPacker:
+    # MaxRects bin packing with the best short side fit heuristic
+    def __init__(self, width, height):
+        self.width = width
+        self.height = height
+        self.free = [(0, 0, width, height)]
+
+    def insert(self, w, h):
+        best = None
+        best_score = None
+
+        for fx, fy, fw, fh in self.free:
+            if w <= fw and h <= fh:
+                score = (min(fw - w, fh - h), max(fw - w, fh - h))
+                if best_score is None or score < best_score:
+                    best = (fx, fy, w, h)
+                    best_score = score
+
+        if best is None:
+            return None
+
+        self.split(best)
+        return best[0], best[1]
+
+    def split(self, used):
+        ux, uy, uw, uh = used
+        result = []
+
+        for free in self.free:
+            fx, fy, fw, fh = free
+            if ux >= fx + fw or ux + uw <= fx or uy >= fy + fh or uy + uh <= fy:
+                result.append(free)
+                continue
+
+            # Keep the maximal free rectangles around the used area
+            if ux > fx:
+                result.append((fx, fy, ux - fx, fh))
+            if ux + uw < fx + fw:
+                result.append((ux + uw, fy, fx + fw - ux - uw, fh))
+            if uy > fy:
+                result.append((fx, fy, fw, uy - fy))
+            if uy + uh < fy + fh:
+                result.append((fx, uy + uh, fw, fy + fh - uy - uh))
+
+        self.free = [r for i, r in enumerate(result) if not any(j != i and contains(other, r) for j, other in enumerate(result))]
+
+    def snapshot(self):
+        return list(self.free)
+
+    def restore(self, free):
+        self.free = free
+
+
+def contains(a, b):
+    return a[0] <= b[0] and a[1] <= b[1] and a[0] + a[2] >= b[0] + b[2] and a[1] + a[3] >= b[1] + b[3]
+
+
+def load_atlas_settings(project_data):
+    cfg = project_data.get("atlas", {})
+    return {
+        "enabled": cfg.get("enabled", False),
+        "page_size": cfg.get("page_size", ATLAS_PAGE_SIZE),
+        "padding": cfg.get("padding", ATLAS_PADDING),
+    }
+
+
+def collect_sheets(project_path):
+    sheets = []
+    folder = os.path.join(project_path, "spritesheets")
+    if not os.path.isdir(folder):
+        return sheets
+
+    for name in sorted(os.listdir(folder)):
+        if not name.lower().endswith(".toml"):
+            continue
+
+        with open(os.path.join(folder, name), "r", encoding="utf-8") as f:
+            data = toml.load(f)
+
+        image_path = os.path.join(project_path, "assets", data.get("image_path", ""))
+        if not data.get("image_path") or not os.path.isfile(image_path):
+            continue
+
+        frames = {}
+        for state in data.get("states", {}).values():
+            for frame in state.get("frames", []):
+                if isinstance(frame, list) and len(frame) == 2:
+                    frames[tuple(frame)] = True
+        frames = list(frames)
+
+        if frames:
+            sheets.append((name, data, image_path, frames))
+
+    return sheets
+
+
+def atlas_key(sheets, settings):
+    h = hashlib.sha1(json.dumps(settings, sort_keys=True).encode())
+    for name, data, image_path, _ in sheets:
+        h.update(name.encode())
+        h.update(toml.dumps(data).encode())
+        with open(image_path, "rb") as f:
+            h.update(hashlib.sha1(f.read()).digest())
+    return h.hexdigest()
+
+
+def pack_sheets(sheets, page_size, padding, check=None):
+    # All frames of a sheet share one image_path, so a sheet always lands on a single page
+    pages = []
+    placements = {}
+
+    order = sorted(sheets, key=lambda s: len(s[3]) * s[1].get("width", 16) * s[1].get("height", 16), reverse=True)
+
+    for name, data, _, frames in order:
+        if check:
+            check()
+        w = data.get("width", 16) + padding
+        h = data.get("height", 16) + padding
+        if w > page_size or h > page_size:
+            continue
+
+        for page_index, packer in enumerate(pages + [None]):
+            if packer is None:
+                packer = MaxRectsPacker(page_size, page_size)
+
+            free = packer.snapshot()
+            spots = []
+            for _ in frames:
+                spot = packer.insert(w, h)
+                if spot is None:
+                    break
+                spots.append(spot)
+
+            if len(spots) == len(frames):
+                if page_index == len(pages):
+                    pages.append(packer)
+                placements[name] = (page_index, dict(zip(frames, spots)))
+                break
+
+            packer.restore(free)
+            if page_index == len(pages):
+                # Does not fit even on an empty page
+                break
+
+    return len(pages), placements
+
+
+def render_pages(sheets, page_count, placements, check=None):
+    from PySide6.QtCore import QBuffer, QByteArray, QIODevice
+    from PySide6.QtGui import QImage, QPainter
+
+    # Pages are trimmed to the area actually used by frames
+    extents = [[1, 1] for _ in range(page_count)]
+    for name, data, _, _ in sheets:
+        if name in placements:
+            page_index, spots = placements[name]
+            for px, py in spots.values():
+                extents[page_index][0] = max(extents[page_index][0], px + data.get("width", 16))
+                extents[page_index][1] = max(extents[page_index][1], py + data.get("height", 16))
+
+    pages = []
+    for width, height in extents:
+        page = QImage(width, height, QImage.Format.Format_ARGB32)
+        page.fill(0)
+        pages.append(page)
+
+    painters = [QPainter(page) for page in pages]
+    for painter in painters:
+        painter.setCompositionMode(QPainter.CompositionMode.CompositionMode_Source)
+
+    try:
+        for name, data, image_path, frames in sheets:
+            if name not in placements:
+                continue
+            if check:
+                check()
+
+            page_index, spots = placements[name]
+            image = QImage(image_path)
+            w, h = data.get("width", 16), data.get("height", 16)
+
+            for (x, y), (px, py) in spots.items():
+                painters[page_index].drawImage(px, py, image, x, y, w, h)
+    finally:
+        for painter in painters:
+            painter.end()
+
+    encoded = []
+    for page in pages:
+        if check:
+            check()
+        data = QByteArray()
+        buffer = QBuffer(data)
+        buffer.open(QIODevice.OpenModeFlag.WriteOnly)
+        page.save(buffer, "PNG")
+        buffer.close()
+        encoded.append(bytes(data))
+
+    return encoded
+
+
+def load_cached_entries(cache_path):
+    try:
+        with open(os.path.join(cache_path, "entries.json"), "r", encoding="utf-8") as f:
+            names = json.load(f)
+
+        entries = {}
+        for arcname, file in names.items():
+            with open(os.path.join(cache_path, file), "rb") as f:
+                entries[arcname] = f.read()
+        return entries
+    except (OSError, ValueError):
+        return None
+
+
+def save_cached_entries(cache_path, entries):
+    os.makedirs(cache_path, exist_ok=True)
+
+    names = {}
+    for index, (arcname, data) in enumerate(entries.items()):
+        names[arcname] = str(index)
+        with open(os.path.join(cache_path, str(index)), "wb") as f:
+            f.write(data)
+
+    with open(os.path.join(cache_path, "entries.json"), "w", encoding="utf-8") as f:
+        json.dump(names, f)
+
+
+def build_atlas(project_path, settings, cache_dir, check=None):
+    # Returns archive entries (arcname -> bytes) that replace or add to the scanned files
+    sheets = collect_sheets(project_path)
+    if not sheets:
+        return {}
+
+    key = atlas_key(sheets, settings)
+
+    cache_root = os.path.join(cache_dir, "atlas")
+    cache_path = os.path.join(cache_root, key)
+    cached = load_cached_entries(cache_path)
+    if cached is not None:
+        return cached
+
+    page_count, placements = pack_sheets(sheets, settings["page_size"], settings["padding"], check)
+    entries = {}
+
+    for index, png in enumerate(render_pages(sheets, page_count, placements, check)):
+        entries[f"assets/{ATLAS_FOLDER}/{index}.png"] = png
+
+    for name, data, _, _ in sheets:
+        if name not in placements:
+            continue
+
+        page_index, spots = placements[name]
+        sheet = dict(data)
+        sheet["image_path"] = f"{ATLAS_FOLDER}/{page_index}.png"
+        sheet["states"] = {}
+
+        for state_name, state in data.get("states", {}).items():
+            state = dict(state)
+            state["frames"] = [list(spots[tuple(frame)]) for frame in state.get("frames", []) if tuple(frame) in spots]
+            sheet["states"][state_name] = state
+
+        entries["spritesheets/" + name] = toml.dumps(sheet).encode("utf-8")
+
+    # Only the latest atlas is kept, older builds are never reused once inputs change
+    shutil.rmtree(cache_root, ignore_errors=True)
+    save_cached_entries(cache_path, entries)
+
+    return entries
@@ -0,0 +1,120 @@
+import numpy as np
+from PySide6.QtGui import QImage
+
+
+def alpha_channel(image: QImage):
+    # (height, width) uint8 copy of the alpha channel, the array must not outlive the converted image's buffer
+    alpha = image.convertToFormat(QImage.Format_Alpha8)
+    data = np.frombuffer(alpha.constBits(), dtype=np.uint8, count=alpha.sizeInBytes())
+    return data.reshape(alpha.height(), alpha.bytesPerLine())[:, : alpha.width()].copy()
+
+
+def grid_frames(alpha, frame_width, frame_height, skip_empty=True):
+    # Top-left corners of the grid cells in reading order, cells without an opaque pixel are skipped
+    rows = alpha.shape[0] // frame_height
+    columns = alpha.shape[1] // frame_width
+    if rows == 0 or columns == 0:
+        return []
+
+    cells = alpha[: rows * frame_height, : columns * frame_width].reshape(rows, frame_height, columns, frame_width)
+    used = cells.any(axis=(1, 3)) if skip_empty else np.ones((rows, columns), dtype=bool)
+
+    ys, xs = np.nonzero(used)
+    return list(zip((xs * frame_width).tolist(), (ys * frame_height).tolist()))
+
+
+def opaque_runs(mask):
+    # Horizontal runs of opaque pixels as (row, start, end) arrays, end exclusive, sorted row-major.
+    # Every row gets a transparent pixel appended, so the flattened mask alternates start and end transitions.
+    height, width = mask.shape
+    padded = np.zeros((height, width + 1), dtype=bool)
+    padded[:, :width] = mask
+    flat = padded.ravel()
+
+    changes = np.flatnonzero(flat[1:] != flat[:-1]) + 1
+    if flat[0]:
+        changes = np.r_[0, changes]
+
+    rows, starts = np.divmod(changes[0::2], width + 1)
+    ends = changes[1::2] - rows * (width + 1)
+    return rows, starts, ends
+
+
+def touching_runs(rows, starts, ends, width):
+    # Pairs of runs on consecutive rows that touch, diagonals included. Runs are disjoint and sorted,
+    # so the runs of the next row touching one run form a contiguous range found with searchsorted.
+    key = width + 2
+    start_keys = rows * key + starts
+    end_keys = rows * key + ends
+
+    next_row = (rows + 1) * key
+    lo = np.searchsorted(end_keys, next_row + starts, side="left")
+    hi = np.searchsorted(start_keys, next_row + ends, side="right")
+    counts = np.maximum(hi - lo, 0)
+
+    src = np.repeat(np.arange(len(rows)), counts)
+    offsets = np.arange(counts.sum()) - np.repeat(np.cumsum(counts) - counts, counts)
+    dst = np.repeat(lo, counts) + offsets
+    return src, dst
+
+
+def component_labels(count, src, dst):
+    # Hook and compress: every run points at the smallest run of its component when this returns
+    labels = np.arange(count)
+    while True:
+        while True:
+            jumped = labels[labels]
+            if np.array_equal(jumped, labels):
+                break
+            labels = jumped
+
+        a, b = labels[src], labels[dst]
+        differ = a != b
+        if not differ.any():
+            return labels
+
+        labels[np.maximum(a, b)[differ]] = np.minimum(a, b)[differ]
+
+
+def opaque_regions(alpha, threshold=0):
+    # Bounding boxes (x0, y0, x1, y1), exclusive ends, of the 8-connected regions with alpha above threshold
+    rows, starts, ends = opaque_runs(alpha > threshold)
+    if len(rows) == 0:
+        return []
+
+    src, dst = touching_runs(rows, starts, ends, alpha.shape[1])
+    labels = component_labels(len(rows), src, dst)
+
+    # Roots label themselves, numbering them gives each run its component
+    roots = labels == np.arange(len(labels))
+    component = (np.cumsum(roots) - 1)[labels]
+    count = int(roots.sum())
+
+    x0 = np.full(count, alpha.shape[1])
+    y0 = np.full(count, alpha.shape[0])
+    x1 = np.zeros(count, dtype=x0.dtype)
+    y1 = np.zeros(count, dtype=y0.dtype)
+    np.minimum.at(x0, component, starts)
+    np.maximum.at(x1, component, ends)
+    np.minimum.at(y0, component, rows)
+    np.maximum.at(y1, component, rows + 1)
+
+    # Reading order: regions overlapping vertically share a line, lines go top to bottom, regions left to right
+    by_top = np.argsort(y0, kind="stable")
+    bottoms = np.maximum.accumulate(y1[by_top])
+    new_line = np.r_[True, y0[by_top][1:] >= bottoms[:-1]]
+    line = np.empty_like(y0)
+    line[by_top] = np.cumsum(new_line)
+
+    reading = np.lexsort((x0, line))
+    return np.stack((x0, y0, x1, y1), axis=1)[reading].tolist()
+
+
+def region_frames(regions, frame_width, frame_height):
+    # Frames share one size, each region is centered horizontally and bottom aligned so feet stay in place
+    frames = []
+    for x0, y0, x1, y1 in regions:
+        x = (x0 + x1 - frame_width) // 2
+        y = y1 - frame_height
+        frames.append((max(0, x), max(0, y)))
+    return frames
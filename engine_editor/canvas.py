@@ -0,0 +1,220 @@
+import math
+import threading
+from collections import OrderedDict
+from PySide6.QtCore import *
+from PySide6.QtGui import *
+from PySide6.QtWidgets import *
+
+TILE_SIZE = 256
+# Pixmap tiles of every canvas and mip level together
+TILE_CACHE_BYTES = 256 * 1024 * 1024
+CHECKER_SIZE = 8
+
+checker_brushes = {}
+shared_tiles = None
+
+
+def checkerboard_brush(tile_size=CHECKER_SIZE):
+    # One 2x2 pattern repeated by the brush instead of an image sized checkerboard
+    brush = checker_brushes.get(tile_size)
+    if brush is None:
+        pixmap = QPixmap(tile_size * 2, tile_size * 2)
+        pixmap.fill(QColor(200, 200, 200))
+        painter = QPainter(pixmap)
+        painter.fillRect(tile_size, 0, tile_size, tile_size, QColor(150, 150, 150))
+        painter.fillRect(0, tile_size, tile_size, tile_size, QColor(150, 150, 150))
+        painter.end()
+        brush = checker_brushes[tile_size] = QBrush(pixmap)
+    return brush
+
+
+def mip_level(level_of_detail, max_level):
+    if level_of_detail >= 1:
+        return 0
+    return max(0, min(max_level, int(math.log2(1 / level_of_detail))))
+
+
+class MipChain:
+    # The image at 1/2^n scale for every level n, each halved from the level below it, so building every level
+    # reads about 4/3 of the image once and a tile never touches more than its own 256 px. The levels cost
+    # a third of the image's memory on top of it. Built on demand by the pool threads.
+    def __init__(self, image):
+        self.levels = [image]
+        self.lock = threading.Lock()
+
+    def level(self, level):
+        # Built levels are read without the lock, level 0 tiles on the GUI thread never wait for a build
+        if level < len(self.levels):
+            return self.levels[level]
+
+        with self.lock:
+            while len(self.levels) <= level:
+                image = self.levels[-1]
+                size = QSize(math.ceil(image.width() / 2), math.ceil(image.height() / 2))
+                self.levels.append(image.scaled(size, Qt.IgnoreAspectRatio, Qt.SmoothTransformation))
+            return self.levels[level]
+
+
+def build_tile(mips, level, tx, ty):
+    image = mips.level(level)
+    return image.copy(QRect(tx * TILE_SIZE, ty * TILE_SIZE, TILE_SIZE, TILE_SIZE).intersected(image.rect()))
+
+
+class TileCache:
+    # Keyed by QImage.cacheKey(), canvases showing the same shared image reuse each other's tiles
+    def __init__(self, budget=TILE_CACHE_BYTES):
+        self.budget = budget
+        self.tiles = OrderedDict()
+        self.total = 0
+
+    def get(self, key):
+        pixmap = self.tiles.get(key)
+        if pixmap is not None:
+            self.tiles.move_to_end(key)
+        return pixmap
+
+    def put(self, key, image):
+        pixmap = QPixmap.fromImage(image)
+        old = self.tiles.pop(key, None)
+        if old is not None:
+            self.total -= old.width() * old.height() * 4
+
+        self.tiles[key] = pixmap
+        self.total += pixmap.width() * pixmap.height() * 4
+
+        while self.total > self.budget and len(self.tiles) > 1:
+            _, old = self.tiles.popitem(last=False)
+            self.total -= old.width() * old.height() * 4
+        return pixmap
+
+    def discard(self, key):
+        old = self.tiles.pop(key, None)
+        if old is not None:
+            self.total -= old.width() * old.height() * 4
+
+    def __contains__(self, key):
+        return key in self.tiles
+
+
+def tile_cache():
+    global shared_tiles
+    if shared_tiles is None:
+        shared_tiles = TileCache()
+    return shared_tiles
+
+
+class TileSignals(QObject):
+    built = Signal(int, tuple, QImage)
+
+
+class TileTask(QRunnable):
+    def __init__(self, signals, generation, mips, key):
+        super().__init__()
+        self.signals = signals
+        self.generation = generation
+        self.mips = mips
+        self.key = key
+
+    def run(self):
+        self.signals.built.emit(self.generation, self.key, build_tile(self.mips, *self.key))
+
+
+class TiledImageItem(QGraphicsObject):
+    # Paints an image from 256 px tiles at the mip level matching the zoom, only the exposed tiles are drawn.
+    # Full resolution tiles are cut on demand, downscaled ones are built on the thread pool and a coarser
+    # cached level stands in until they arrive.
+    def __init__(self, image=None, parent=None):
+        super().__init__(parent)
+        self.setFlag(QGraphicsItem.ItemUsesExtendedStyleOption, True)
+
+        self.image = QImage()
+        self.mips = MipChain(self.image)
+        self.max_level = 0
+        self.generation = 0
+        self.pending = set()
+
+        self.signals = TileSignals()
+        self.signals.built.connect(self.on_tile_built)
+        self.set_image(image if image is not None else QImage())
+
+    def set_image(self, image: QImage):
+        self.prepareGeometryChange()
+        self.image = image
+        self.mips = MipChain(image)
+        self.generation += 1
+        self.pending.clear()
+
+        longest = max(self.image.width(), self.image.height())
+        self.max_level = max(0, math.ceil(math.log2(longest / TILE_SIZE))) if longest > TILE_SIZE else 0
+        self.update()
+
+    def width(self):
+        return self.image.width()
+
+    def height(self):
+        return self.image.height()
+
+    def boundingRect(self):
+        return QRectF(0, 0, self.image.width(), self.image.height())
+
+    def cache_key(self, key):
+        return (self.image.cacheKey(),) + key
+
+    def tile(self, level, tx, ty):
+        # Returns the key of the best tile available now for this spot, or None
+        key = (level, tx, ty)
+        if tile_cache().get(self.cache_key(key)) is not None:
+            return key
+
+        if level == 0:
+            tile_cache().put(self.cache_key(key), build_tile(self.mips, 0, tx, ty))
+            return key
+
+        if key not in self.pending:
+            self.pending.add(key)
+            QThreadPool.globalInstance().start(TileTask(self.signals, self.generation, self.mips, key))
+
+        for coarser in range(level + 1, self.max_level + 1):
+            shift = coarser - level
+            coarse_key = (coarser, tx >> shift, ty >> shift)
+            if self.cache_key(coarse_key) in tile_cache():
+                return coarse_key
+        return None
+
+    def on_tile_built(self, generation, key, image):
+        if generation != self.generation:
+            return
+
+        self.pending.discard(key)
+        tile_cache().put(self.cache_key(key), image)
+        level, tx, ty = key
+        span = TILE_SIZE << level
+        self.update(QRectF(tx * span, ty * span, span, span))
+
+    def paint(self, painter: QPainter, option: QStyleOptionGraphicsItem, widget=None):
+        exposed = option.exposedRect.intersected(self.boundingRect())
+        if exposed.isEmpty():
+            return
+
+        painter.fillRect(exposed, checkerboard_brush())
+
+        level = mip_level(option.levelOfDetailFromTransform(painter.worldTransform()), self.max_level)
+        span = TILE_SIZE << level
+
+        keys = []
+        for ty in range(int(exposed.top()) // span, math.ceil(exposed.bottom() / span)):
+            for tx in range(int(exposed.left()) // span, math.ceil(exposed.right() / span)):
+                key = self.tile(level, tx, ty)
+                if key and key not in keys:
+                    keys.append(key)
+
+        # Coarser stand-ins first so finer tiles end up on top
+        for key in sorted(keys, reverse=True):
+            pixmap = tile_cache().get(self.cache_key(key))
+            if pixmap is None:
+                continue
+
+            tile_level, tx, ty = key
+            tile_span = TILE_SIZE << tile_level
+            target = QRectF(tx * tile_span, ty * tile_span, pixmap.width() << tile_level, pixmap.height() << tile_level)
+            painter.drawPixmap(target, pixmap, QRectF(pixmap.rect()))
@@ -0,0 +1,64 @@
+import os
+import re
+import time
+import tempfile
+import toml
+from PySide6.QtCore import *
+
+# Long strings without quotes or escapes (e.g. encoded tile chunks) are written as literal strings,
+# tomllib reads those with one search instead of character by character
+LITERAL_STRING_MIN = 64
+LITERAL_SAFE = re.compile(r"[A-Za-z0-9+/=_.,:;@# -]*")
+
+
+def write_atomic(path, text):
+    # Written next to the target and renamed over it, a crash leaves either the old or the new file
+    folder, name = os.path.split(os.path.abspath(path))
+    fd, temp_path = tempfile.mkstemp(prefix=f".{name}.", suffix=".tmp", dir=folder)
+    try:
+        with os.fdopen(fd, "w", encoding="utf-8") as f:
+            f.write(text)
+            f.flush()
+            os.fsync(f.fileno())
+        os.replace(temp_path, path)
+    except BaseException:
+        if os.path.exists(temp_path):
+            os.remove(temp_path)
+        raise
+
+
+def dump_string(value):
+    if len(value) >= LITERAL_STRING_MIN and LITERAL_SAFE.fullmatch(value):
+        return f"'{value}'"
+    # Quoted and escaped by the default encoder, as the value of a one key table
+    return toml.dumps({"s": value})[len("s = ") : -1]
+
+
+class DocumentEncoder(toml.TomlEncoder):
+    def __init__(self, _dict=dict, preserve=False):
+        super().__init__(_dict, preserve)
+        self.dump_funcs[str] = dump_string
+
+
+def save_document(path, data):
+    write_atomic(path, toml.dumps(data, encoder=DocumentEncoder()))
+
+
+class SaveWorker(QThread):
+    # documents are (path, data) snapshots taken on the GUI thread, results are (path, error or "") in order
+    saved = Signal(list, float)
+
+    def __init__(self, documents, parent=None):
+        super().__init__(parent)
+        self.documents = documents
+
+    def run(self):
+        start = time.perf_counter()
+        results = []
+        for path, data in self.documents:
+            try:
+                save_document(path, data)
+                results.append((path, ""))
+            except Exception as e:
+                results.append((path, f"{type(e).__name__}: {e}"))
+        self.saved.emit(results, time.perf_counter() - start)
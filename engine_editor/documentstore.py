@@ -0,0 +1,61 @@
+import os
+import time
+import tomllib
+
+shared_store = None
+
+
+def document_store():
+    # One store for the whole editor, every tab opening a file gets the model parsed once
+    global shared_store
+    if shared_store is None:
+        shared_store = DocumentStore()
+    return shared_store
+
+
+def file_key(path):
+    path = os.path.normcase(os.path.abspath(path))
+    st = os.stat(path)
+    return path, (st.st_mtime_ns, st.st_size)
+
+
+class DocumentStore:
+    # Parsed TOML documents keyed by path, an entry is reused while the file's mtime and size are unchanged.
+    # Models are shared between callers and must be treated as read only, editors copy what they change.
+    # Only used from the GUI thread.
+    def __init__(self):
+        self.documents = {}
+        self.hits = 0
+        self.misses = 0
+        self.parse_time = 0.0
+
+    def load(self, path):
+        # Raises OSError or tomllib.TOMLDecodeError like reading the file directly would
+        path, stamp = file_key(path)
+        entry = self.documents.get(path)
+        if entry and entry[0] == stamp:
+            self.hits += 1
+            return entry[1]
+
+        self.misses += 1
+        start = time.perf_counter()
+        try:
+            with open(path, "rb") as f:
+                data = tomllib.load(f)
+        except Exception:
+            self.documents.pop(path, None)
+            raise
+        finally:
+            self.parse_time += time.perf_counter() - start
+
+        self.documents[path] = (stamp, data)
+        return data
+
+    def invalidate(self, path):
+        self.documents.pop(os.path.normcase(os.path.abspath(path)), None)
+
+    def clear(self):
+        self.documents.clear()
+
+    def stats(self):
+        return len(self.documents), self.hits, self.misses, self.parse_time
@@ -8,6 +8,19 @@ class EditorWidget:
 
     def save(self):
         pass
+
+    # (path, data) snapshot of the document for a background save, None when there is nothing to write.
+    # Raises ValueError when the document cannot be saved, the caller reports it.
+    def document(self):
+        return None
+
+    # True once document() was taken for a save, False again when writing it failed
+    def set_saved(self, saved):
+        self.modified = not saved
+
+    # Called when the tab is closed, stops background work
+    def close_editor(self):
+        pass
     
 # Custom QGraphicsView that emits a signal when the mouse moves
 class GraphicsView(QGraphicsView):
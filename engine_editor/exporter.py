@@ -0,0 +1,590 @@
+import os
+import glob
+import json
+import struct
+import hashlib
+import zipfile
+import zlib
+import fnmatch
+import sys
+import time
+import argparse
+import toml
+
+import atlas
+import transcode
+import spritesheetcompiler
+import tilemapcompiler
+from workerpool import worker_pool
+
+ARCHIVE_NAME = "data.arpg"
+MANIFEST_NAME = "data.arpg.manifest"
+CACHE_DIR_NAME = ".arpg_cache"
+MANIFEST_VERSION = 2
+COMPRESS_LEVEL = 6
+AUTO_THRESHOLD = 0.05
+
+# Formats that are already compressed, deflate rarely pays for the inflate cost at runtime
+DEFAULT_COMPRESSION_RULES = {
+    "*.png": "auto",
+    "*.jpg": "auto",
+    "*.jpeg": "auto",
+    "*.gif": "auto",
+    "*.mp3": "auto",
+    "*.ogg": "auto",
+    "*.tiles": "auto",
+}
+
+# Rough inflate throughput of miniz, used to estimate decode time in the report
+INFLATE_BYTES_PER_SECOND = 250 * 1024 * 1024
+
+# Folders shipped in the archive and the files picked from each of them
+EXPORT_FOLDERS = [
+    ("global", "*.toml"),
+    ("stages", "*.toml"),
+    ("actors", "*.toml"),
+    ("spritesheets", "*.toml"),
+    ("assets", "**/*"),
+]
+
+LOCAL_HEADER_SIZE = 30
+
+# Table of contents read by the runtime (engine_core/archive.h), stored uncompressed as the last entry
+INDEX_NAME = "arpg.index"
+INDEX_MAGIC = b"AIDX"
+INDEX_VERSION = 1
+INDEX_HEADER = struct.Struct("<4sHHI")
+INDEX_ENTRY = struct.Struct("<IQQQHI20s")
+
+# Entries whose content is identical to an earlier one are not stored again, this TOML maps them to it
+ALIASES_NAME = "arpg.aliases"
+
+
+class ChoiceStats:
+    def __init__(self, stored):
+        self.stored = stored
+        self.entries = 0
+        self.size = 0
+        self.compress_size = 0
+        self.deflated_size = 0
+
+    def inflate_ms(self):
+        return self.size / INFLATE_BYTES_PER_SECOND * 1000
+
+    def describe(self):
+        if self.stored:
+            text = f"{self.entries} entries, {self.size} bytes stored, ~{self.inflate_ms():.1f} ms of inflate skipped"
+            if self.deflated_size:
+                text += f", deflate would have saved {self.size - self.deflated_size} bytes"
+            return text
+
+        saved = self.size - self.compress_size
+        return f"{self.entries} entries, {self.size} -> {self.compress_size} bytes ({saved} saved), ~{self.inflate_ms():.1f} ms to inflate"
+
+
+class ExportStats:
+    def __init__(self):
+        self.written = 0
+        self.reused = 0
+        self.written_bytes = 0
+        self.reused_bytes = 0
+        self.deduplicated = 0
+        self.deduplicated_bytes = 0
+        self.choices: dict[str, ChoiceStats] = {}
+        # Seconds per stage, compress only counts the time spent waiting on compressed data
+        self.timings = {"scan": 0.0, "stages": 0.0, "compress": 0.0, "write": 0.0}
+
+    def add_choice(self, choice, compress_type, size, compress_size, deflated_size):
+        stats = self.choices.setdefault(choice, ChoiceStats(compress_type == zipfile.ZIP_STORED))
+        stats.entries += 1
+        stats.size += size
+        stats.compress_size += compress_size
+        stats.deflated_size += deflated_size
+
+    def timings_text(self):
+        return ", ".join(f"{name} {seconds:.2f}s" for name, seconds in self.timings.items())
+
+    def report(self):
+        lines = [f"{choice}: {c.describe()}" for choice, c in sorted(self.choices.items())]
+        if self.deduplicated:
+            lines.append(f"duplicates: {self.deduplicated} entries aliased, {self.deduplicated_bytes} bytes saved")
+        return "\n".join(lines)
+
+
+def hash_bytes(data):
+    return hashlib.sha1(data).hexdigest()
+
+
+def hash_file(path):
+    h = hashlib.sha1()
+    with open(path, "rb") as f:
+        for block in iter(lambda: f.read(1 << 20), b""):
+            h.update(block)
+    return h.hexdigest()
+
+
+def parse_compression(value, level, threshold):
+    # Returns the canonical policy string: "stored", "deflate:<level>" or "auto:<level>:<threshold>"
+    if isinstance(value, bool):
+        raise ValueError(f"Invalid compression policy: {value}")
+    if isinstance(value, int):
+        if not 0 <= value <= 9:
+            raise ValueError(f"Invalid deflate level: {value}")
+        return "stored" if value == 0 else f"deflate:{value}"
+    if value == "stored":
+        return "stored"
+    if value == "deflate":
+        return f"deflate:{level}"
+    if value == "auto":
+        return f"auto:{level}:{threshold}"
+    raise ValueError(f"Invalid compression policy: {value}")
+
+
+class CompressionPolicy:
+    def __init__(self, level=COMPRESS_LEVEL, threshold=AUTO_THRESHOLD, rules=None):
+        # Checked up front, the policy strings are parsed again by the compression workers
+        if isinstance(level, bool) or not isinstance(level, int) or not 0 <= level <= 9:
+            raise ValueError(f"Invalid compression level: {level!r}, expected an integer from 0 to 9")
+        if isinstance(threshold, bool) or not isinstance(threshold, (int, float)) or not 0 <= threshold < 1:
+            raise ValueError(f"Invalid compression auto_threshold: {threshold!r}, expected a number from 0 up to 1")
+
+        self.default = parse_compression(level, level, threshold)
+        self.rules = []
+
+        merged = dict(rules or {})
+        for pattern, value in DEFAULT_COMPRESSION_RULES.items():
+            merged.setdefault(pattern, value)
+
+        # First matching rule wins, project rules come before the defaults
+        for pattern, value in merged.items():
+            self.rules.append((pattern, parse_compression(value, level, threshold)))
+
+    def resolve(self, arcname):
+        basename = arcname.rsplit("/", 1)[-1]
+        for pattern, policy in self.rules:
+            # Patterns without a folder match the file name anywhere
+            target = arcname if "/" in pattern else basename
+            if fnmatch.fnmatchcase(target.lower(), pattern.lower()):
+                return policy
+        return self.default
+
+
+def load_project_config(project_path):
+    with open(os.path.join(project_path, "project.toml"), "r", encoding="utf-8") as f:
+        return toml.load(f)
+
+
+def load_compression_policy(project_data):
+    cfg = project_data.get("compression", {})
+    return CompressionPolicy(
+        level=cfg.get("level", COMPRESS_LEVEL),
+        threshold=cfg.get("auto_threshold", AUTO_THRESHOLD),
+        rules=cfg.get("rules", {}),
+    )
+
+
+def scan_project(project_path):
+    # arcname -> source path, in archive order
+    entries = {"project.toml": os.path.join(project_path, "project.toml")}
+
+    for folder, pattern in EXPORT_FOLDERS:
+        # Folder entries have no source path
+        entries[folder + "/"] = None
+
+        root = os.path.join(project_path, folder)
+        for file in sorted(glob.glob(os.path.join(root, pattern), recursive=True)):
+            if os.path.isfile(file):
+                arcname = folder + "/" + os.path.relpath(file, root).replace("\\", "/")
+                entries[arcname] = file
+
+    return entries
+
+
+def merge_entries(sources, generated):
+    # Generated entries replace scanned files in place, new ones go at the end
+    generated = dict(generated)
+    merged = {arcname: generated.pop(arcname, source) for arcname, source in sources.items()}
+    merged.update(sorted(generated.items()))
+    return merged
+
+
+def run_stages(project_path, project_data, sources, jobs=None, check=None):
+    # Optional export stages, each one maps sources (arcname -> path or bytes) to new sources.
+    # check() is called between the items of every stage and raises to stop the export.
+    cache_dir = os.path.join(project_path, CACHE_DIR_NAME)
+    # Read first, a config error stops the export before any stage runs
+    compile_settings = spritesheetcompiler.load_compile_settings(project_data)
+
+    atlas_settings = atlas.load_atlas_settings(project_data)
+    if atlas_settings["enabled"]:
+        sources = merge_entries(sources, atlas.build_atlas(project_path, atlas_settings, cache_dir, check))
+
+    renames = {}
+    transcode_settings = transcode.load_transcode_settings(project_data)
+    if transcode_settings["format"]:
+        sources, renames = transcode.transcode_images(sources, transcode_settings, cache_dir, jobs, check)
+
+    sources = tilemapcompiler.compile_tilemaps(sources, cache_dir, renames, check)
+
+    # After every stage that rewrites image references, originals still referred to are kept
+    if renames:
+        sources = transcode.drop_replaced_images(sources, renames)
+
+    # Runs last so it compiles the sheets as rewritten by the stages above
+    if compile_settings["spritesheets"]:
+        sources = spritesheetcompiler.compile_spritesheets(sources)
+
+    return sources
+
+
+def load_manifest(project_path):
+    try:
+        with open(os.path.join(project_path, MANIFEST_NAME), "r", encoding="utf-8") as f:
+            manifest = json.load(f)
+    except (OSError, ValueError):
+        return None
+
+    if manifest.get("version") != MANIFEST_VERSION:
+        return None
+
+    # The manifest is only trusted for the archive it was written with
+    try:
+        st = os.stat(os.path.join(project_path, ARCHIVE_NAME))
+    except OSError:
+        return None
+
+    archive = manifest.get("archive", {})
+    if archive.get("size") != st.st_size or archive.get("mtime_ns") != st.st_mtime_ns:
+        return None
+
+    return manifest
+
+
+def save_manifest(project_path, entries):
+    st = os.stat(os.path.join(project_path, ARCHIVE_NAME))
+    manifest = {
+        "version": MANIFEST_VERSION,
+        "archive": {"size": st.st_size, "mtime_ns": st.st_mtime_ns},
+        "entries": entries,
+    }
+
+    with open(os.path.join(project_path, MANIFEST_NAME), "w", encoding="utf-8") as f:
+        json.dump(manifest, f, indent=1, sort_keys=True)
+
+
+def read_raw_entry(f, info: zipfile.ZipInfo):
+    # Returns the stored (still compressed) bytes of an entry
+    f.seek(info.header_offset)
+    header = f.read(LOCAL_HEADER_SIZE)
+    name_length, extra_length = struct.unpack("<HH", header[26:30])
+    f.seek(name_length + extra_length, os.SEEK_CUR)
+    return f.read(info.compress_size)
+
+
+def write_raw_entry(zip: zipfile.ZipFile, info: zipfile.ZipInfo, raw):
+    # Appends an entry whose data is already compressed, CRC and sizes must be set on info
+    zip64 = info.file_size > zipfile.ZIP64_LIMIT or info.compress_size > zipfile.ZIP64_LIMIT
+
+    info.flag_bits &= ~0x08
+    info.header_offset = zip.fp.tell()
+    zip.fp.write(info.FileHeader(zip64))
+    zip.fp.write(raw)
+
+    zip.start_dir = zip.fp.tell()
+    zip.filelist.append(info)
+    zip.NameToInfo[info.filename] = info
+
+
+def compress_file(source, policy):
+    # Runs in a worker process, only the compressed stream is sent back
+    if isinstance(source, bytes):
+        data = source
+    else:
+        with open(source, "rb") as f:
+            data = f.read()
+
+    crc = zlib.crc32(data)
+    digest = hash_bytes(data)
+
+    if policy == "stored":
+        return data, zipfile.ZIP_STORED, 0, crc, len(data), digest
+
+    parts = policy.split(":")
+    compressor = zlib.compressobj(int(parts[1]), zlib.DEFLATED, -zlib.MAX_WBITS)
+    raw = compressor.compress(data) + compressor.flush()
+
+    # "auto" keeps the entry stored when deflate saves too little to be worth inflating
+    if parts[0] == "auto" and len(data) - len(raw) < len(data) * float(parts[2]):
+        return data, zipfile.ZIP_STORED, len(raw), crc, len(data), digest
+
+    return raw, zipfile.ZIP_DEFLATED, len(raw), crc, len(data), digest
+
+
+def choice_name(policy, compress_type):
+    kind = policy.split(":")[0]
+    if kind == "auto":
+        return "auto (stored)" if compress_type == zipfile.ZIP_STORED else "auto (deflated)"
+    return kind
+
+
+def build_index(zip: zipfile.ZipFile, entries):
+    records = []
+    for zip_index, info in enumerate(zip.filelist):
+        if info.is_dir() or info.filename not in entries:
+            continue
+
+        name = info.filename.encode("utf-8")
+        records.append(struct.pack("<H", len(name)) + name)
+        records.append(
+            INDEX_ENTRY.pack(
+                zip_index,
+                info.header_offset,
+                info.file_size,
+                info.compress_size,
+                info.compress_type,
+                info.CRC,
+                bytes.fromhex(entries[info.filename]["hash"]),
+            )
+        )
+
+    return INDEX_HEADER.pack(INDEX_MAGIC, INDEX_VERSION, 0, len(records) // 2) + b"".join(records)
+
+
+def copy_info(info: zipfile.ZipInfo, arcname):
+    new_info = zipfile.ZipInfo(arcname, info.date_time)
+    new_info.compress_type = info.compress_type
+    new_info.external_attr = info.external_attr
+    new_info.CRC = info.CRC
+    new_info.file_size = info.file_size
+    new_info.compress_size = info.compress_size
+    return new_info
+
+
+def is_unchanged(old, st, source):
+    if isinstance(source, bytes):
+        digest = hash_bytes(source)
+        return digest == old["hash"], digest
+
+    if old["size"] != st.st_size:
+        return False, None
+
+    if old["mtime_ns"] == st.st_mtime_ns:
+        return True, old["hash"]
+
+    # Touched but maybe not edited, fall back to the content hash
+    digest = hash_file(source)
+    return digest == old["hash"], digest
+
+
+class ExportCancelled(Exception):
+    # Stops an export once cancelled() returns True, the previous archive stays as it was
+    pass
+
+
+def export_project(project_path, incremental=True, jobs=None, progress=None, cancelled=None):
+    archive_path = os.path.join(project_path, ARCHIVE_NAME)
+    temp_path = archive_path + ".tmp"
+
+    stats = ExportStats()
+    start = time.perf_counter()
+
+    def check():
+        if cancelled and cancelled():
+            raise ExportCancelled()
+
+    manifest = load_manifest(project_path) if incremental else None
+    old_entries = manifest["entries"] if manifest else {}
+
+    project_data = load_project_config(project_path)
+    policy = load_compression_policy(project_data)
+
+    sources = scan_project(project_path)
+    stats.timings["scan"] += time.perf_counter() - start
+
+    start = time.perf_counter()
+    sources = run_stages(project_path, project_data, sources, jobs, check)
+    stats.timings["stages"] = time.perf_counter() - start
+
+    start = time.perf_counter()
+    previous = None
+    previous_file = None
+    new_entries = {}
+    executor = None
+
+    try:
+        if old_entries:
+            # A previous archive that cannot be read means a full rebuild
+            try:
+                previous_file = open(archive_path, "rb")
+                previous = zipfile.ZipFile(previous_file)
+            except (OSError, zipfile.BadZipFile):
+                previous = None
+
+        # Decide which entries can be copied from the previous archive
+        plan = []
+        for arcname, source in sources.items():
+            if source is None:
+                plan.append((arcname, None, None, None, None))
+                continue
+
+            st = None if isinstance(source, bytes) else os.stat(source)
+            old = old_entries.get(arcname)
+            entry_policy = policy.resolve(arcname)
+
+            # Entries are only reused when the policy that produced them did not change
+            if old and previous and old.get("policy") == entry_policy:
+                unchanged, digest = is_unchanged(old, st, source)
+                # An alias has no data of its own, the entry it pointed to holds the same bytes
+                old_info = previous.NameToInfo.get(old.get("alias", arcname))
+
+                if unchanged and old_info and old_info.CRC == old["crc"]:
+                    plan.append((arcname, source, st, entry_policy, old_info))
+                    continue
+
+            plan.append((arcname, source, st, entry_policy, None))
+
+        stats.timings["scan"] += time.perf_counter() - start
+
+        to_compress = [(source, entry_policy) for _, source, _, entry_policy, old_info in plan if source is not None and not old_info]
+        compress_sources = [source for source, _ in to_compress]
+        policies = [entry_policy for _, entry_policy in to_compress]
+
+        if jobs == 1 or len(compress_sources) < 2:
+            results = map(compress_file, compress_sources, policies)
+        else:
+            executor = worker_pool(jobs)
+            results = executor.map(compress_file, compress_sources, policies)
+
+        total = len(plan)
+        stored = {}
+        aliases = {}
+        start = time.perf_counter()
+        with zipfile.ZipFile(temp_path, "w", compression=zipfile.ZIP_DEFLATED, compresslevel=COMPRESS_LEVEL) as zip:
+            # Entries are written in scan order while the pool keeps compressing ahead
+            for done, (arcname, source, st, entry_policy, old_info) in enumerate(plan, 1):
+                if source is None:
+                    zip.writestr(arcname, "")
+                else:
+                    if old_info:
+                        old = old_entries[arcname]
+                        entry = {key: value for key, value in old.items() if key != "alias"}
+                        entry["mtime_ns"] = st.st_mtime_ns if st else None
+                        raw = None
+                    else:
+                        wait = time.perf_counter()
+                        raw, compress_type, deflated_size, crc, size, digest = next(results)
+                        stats.timings["compress"] += time.perf_counter() - wait
+
+                        entry = {
+                            "size": size,
+                            "mtime_ns": st.st_mtime_ns if st else None,
+                            "hash": digest,
+                            "crc": crc,
+                            "policy": entry_policy,
+                            "deflated_size": deflated_size,
+                        }
+
+                    new_entries[arcname] = entry
+
+                    # Identical content is stored once, later copies only get an alias to it
+                    if entry["hash"] in stored:
+                        entry["alias"] = aliases[arcname] = stored[entry["hash"]]
+                        stats.deduplicated += 1
+                        stats.deduplicated_bytes += old_info.compress_size if old_info else len(raw)
+                    elif old_info:
+                        info = copy_info(old_info, arcname)
+                        write_raw_entry(zip, info, read_raw_entry(previous_file, old_info))
+
+                        stats.reused += 1
+                        stats.reused_bytes += info.compress_size
+                        stats.add_choice(
+                            choice_name(entry_policy, info.compress_type), info.compress_type, info.file_size, info.compress_size, old["deflated_size"]
+                        )
+                    else:
+                        if st:
+                            info = zipfile.ZipInfo.from_file(source, arcname)
+                        else:
+                            info = zipfile.ZipInfo(arcname, time.localtime()[:6])
+                            info.external_attr = 0o644 << 16
+                        info.compress_type = compress_type
+                        info.CRC = crc
+                        info.file_size = size
+                        info.compress_size = len(raw)
+                        write_raw_entry(zip, info, raw)
+
+                        stats.written += 1
+                        stats.written_bytes += info.compress_size
+                        stats.add_choice(choice_name(entry_policy, compress_type), compress_type, size, info.compress_size, deflated_size)
+
+                    stored.setdefault(entry["hash"], arcname)
+
+                check()
+                if progress:
+                    progress(done, total)
+
+            if aliases:
+                zip.writestr(ALIASES_NAME, toml.dumps({"aliases": aliases}))
+            zip.writestr(INDEX_NAME, build_index(zip, new_entries), compress_type=zipfile.ZIP_STORED)
+    except BaseException:
+        if os.path.exists(temp_path):
+            os.remove(temp_path)
+        raise
+    finally:
+        if executor:
+            executor.shutdown(cancel_futures=True)
+        if previous:
+            previous.close()
+        if previous_file:
+            previous_file.close()
+
+    os.replace(temp_path, archive_path)
+    save_manifest(project_path, new_entries)
+    stats.timings["write"] = time.perf_counter() - start - stats.timings["compress"]
+
+    return stats
+
+
+def export_one(project_path, incremental, jobs):
+    try:
+        return project_path, export_project(project_path, incremental=incremental, jobs=jobs), None
+    except Exception as e:
+        return project_path, None, f"{type(e).__name__}: {e}"
+
+
+def main(argv=None):
+    parser = argparse.ArgumentParser(description="Export Arpg projects to data.arpg without the editor.")
+    parser.add_argument("projects", nargs="+", help="project directories containing project.toml")
+    parser.add_argument("-j", "--jobs", type=int, default=os.cpu_count() or 1, help="number of worker processes")
+    parser.add_argument("--full", action="store_true", help="ignore the manifest and recompress every entry")
+    parser.add_argument("--report", action="store_true", help="print the compression report of each project")
+    args = parser.parse_args(argv)
+
+    incremental = not args.full
+    failed = 0
+
+    def show(project_path, stats, error):
+        nonlocal failed
+        if error:
+            failed += 1
+            print(f"{project_path}: FAILED {error}", file=sys.stderr)
+            return
+
+        print(f"{project_path}: {stats.written} compressed, {stats.reused} reused, {stats.deduplicated} deduplicated ({stats.timings_text()})")
+        if args.report:
+            print(stats.report())
+
+    if len(args.projects) == 1 or args.jobs == 1:
+        # One project at a time, each one compresses with the whole pool
+        for project_path in args.projects:
+            show(*export_one(project_path, incremental, args.jobs))
+    else:
+        # Several projects at once, each compressing in its own process
+        with worker_pool(args.jobs) as executor:
+            for result in executor.map(export_one, args.projects, [incremental] * len(args.projects), [1] * len(args.projects)):
+                show(*result)
+
+    return 1 if failed else 0
+
+
+if __name__ == "__main__":
+    sys.exit(main())
@@ -0,0 +1,146 @@
+import os
+from collections import OrderedDict
+from PySide6.QtCore import *
+from PySide6.QtGui import *
+
+IMAGE_CACHE_BYTES = 512 * 1024 * 1024
+
+# Decodes get their own pool so large images never hold up canvas tiles on the global one
+decode_pool = None
+shared_cache = None
+
+
+def image_pool():
+    global decode_pool
+    if decode_pool is None:
+        decode_pool = QThreadPool()
+        decode_pool.setMaxThreadCount(max(2, QThread.idealThreadCount()))
+    return decode_pool
+
+
+def image_cache():
+    # One cache for the whole editor, every tab showing a file shares its decoded image
+    global shared_cache
+    if shared_cache is None:
+        shared_cache = ImageCache()
+    return shared_cache
+
+
+def image_key(path):
+    # A file edited on disk gets a new key, tabs still showing the old version keep their copy
+    path = os.path.normcase(os.path.abspath(path))
+    try:
+        st = os.stat(path)
+    except OSError:
+        return (path, None, None)
+    return (path, st.st_mtime_ns, st.st_size)
+
+
+class CachedImage:
+    def __init__(self, image):
+        self.image = image
+        self.refs = 0
+        self.size = image.sizeInBytes()
+
+
+class ImageDecodeSignals(QObject):
+    finished = Signal(tuple, QImage, str)
+
+
+class ImageDecodeTask(QRunnable):
+    def __init__(self, signals, key):
+        super().__init__()
+        self.signals = signals
+        self.key = key
+
+    def run(self):
+        reader = QImageReader(self.key[0])
+        image = reader.read()
+        self.signals.finished.emit(self.key, image, reader.errorString() if image.isNull() else "")
+
+
+class ImageCache(QObject):
+    changed = Signal()
+
+    def __init__(self, budget=IMAGE_CACHE_BYTES, parent=None):
+        super().__init__(parent)
+        self.budget = budget
+        # Least recently used first, only images no tab holds are evicted
+        self.entries: OrderedDict[tuple, CachedImage] = OrderedDict()
+        self.total = 0
+        self.decoding = {}
+
+        self.signals = ImageDecodeSignals()
+        self.signals.finished.connect(self.on_decoded)
+
+    def set_budget(self, budget):
+        self.budget = budget
+        self.evict()
+
+    def acquire(self, key):
+        entry = self.entries.get(key)
+        if entry is None:
+            return None
+
+        entry.refs += 1
+        self.entries.move_to_end(key)
+        self.changed.emit()
+        return entry.image
+
+    def release(self, key):
+        entry = self.entries.get(key)
+        if entry is None:
+            return
+
+        entry.refs -= 1
+        self.evict()
+        self.changed.emit()
+
+    def decode(self, key, waiter):
+        # Every waiter of a key shares one decode, waiter.on_decoded(key, image, error) is called when it ends
+        job = self.decoding.get(key)
+        if job:
+            job[1].add(waiter)
+            return
+
+        task = ImageDecodeTask(self.signals, key)
+        self.decoding[key] = (task, {waiter})
+        image_pool().start(task)
+
+    def cancel(self, key, waiter):
+        job = self.decoding.get(key)
+        if not job:
+            return
+
+        job[1].discard(waiter)
+        if not job[1] and image_pool().tryTake(job[0]):
+            del self.decoding[key]
+
+    def on_decoded(self, key, image, error):
+        job = self.decoding.pop(key, None)
+        if not job:
+            return
+
+        # Kept even when every waiter left, reopening the tab is then instant until it is evicted
+        if not image.isNull() and key not in self.entries:
+            entry = self.entries[key] = CachedImage(image)
+            self.total += entry.size
+            self.evict()
+
+        for waiter in job[1]:
+            waiter.on_decoded(key, image, error)
+        self.changed.emit()
+
+    def evict(self):
+        for key in list(self.entries):
+            if self.total <= self.budget:
+                break
+
+            entry = self.entries[key]
+            if entry.refs <= 0:
+                self.total -= entry.size
+                del self.entries[key]
+
+    def stats(self):
+        in_use = sum(entry.size for entry in self.entries.values() if entry.refs > 0)
+        return len(self.entries), self.total, in_use
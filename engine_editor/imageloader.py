@@ -0,0 +1,70 @@
+import os
+from PySide6.QtCore import *
+from PySide6.QtGui import *
+from PySide6.QtWidgets import *
+
+from imagecache import image_cache, image_key
+
+
+class ImageLoader(QObject):
+    # A tab's handle on one image of the shared cache, decoded off the GUI thread when it is not cached yet.
+    # A new load or cancel() drops the previous image or pending result.
+    loaded = Signal(QImage)
+    failed = Signal(str)
+
+    def __init__(self, parent=None):
+        super().__init__(parent)
+        self.key = None
+        self.waiting = False
+
+    def load(self, path):
+        self.cancel()
+        self.key = image_key(path)
+
+        image = image_cache().acquire(self.key)
+        if image is not None:
+            self.loaded.emit(image)
+            return
+
+        self.waiting = True
+        image_cache().decode(self.key, self)
+
+    def cancel(self):
+        if self.key is None:
+            return
+
+        if self.waiting:
+            image_cache().cancel(self.key, self)
+        else:
+            image_cache().release(self.key)
+        self.key = None
+        self.waiting = False
+
+    def is_loading(self):
+        return self.waiting
+
+    def on_decoded(self, key, image, error):
+        if key != self.key or not self.waiting:
+            return
+
+        self.waiting = False
+        if image.isNull():
+            self.key = None
+            self.failed.emit(error)
+            return
+
+        image_cache().acquire(key)
+        self.loaded.emit(image)
+
+
+class LoadingBar(QProgressBar):
+    # Placeholder shown above a view while its image decodes
+    def __init__(self, parent=None):
+        super().__init__(parent)
+        self.setRange(0, 0)
+        self.setTextVisible(True)
+        self.hide()
+
+    def start(self, path):
+        self.setFormat(f"Loading {os.path.basename(path)}...")
+        self.show()
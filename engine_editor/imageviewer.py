@@ -2,6 +2,8 @@ from PySide6.QtCore import *
 from PySide6.QtGui import *
 from PySide6.QtWidgets import *
 from editorwidget import EditorWidget, GraphicsView
+from canvas import TiledImageItem
+from imageloader import ImageLoader, LoadingBar
 
 
 class ImageViewer(QWidget, EditorWidget):
@@ -31,19 +33,11 @@ class ImageViewer(QWidget, EditorWidget):
 
         self.view.cursorMoved.connect(self.update_coordinates)
 
-        self.pixmap = QPixmap(self.image_path)
-        if self.pixmap.isNull():
-            QMessageBox.critical(self, "Error", "Failed to load image.")
-            return
-
-        self.checker_item = QGraphicsPixmapItem(self.generate_checkerboard_pixmap(self.pixmap.width(), self.pixmap.height()))
-        self.checker_item.setZValue(-1)
-        self.scene.addItem(self.checker_item)
-
-        self.pixmap_item = QGraphicsPixmapItem(self.pixmap)
-        self.pixmap_item.setTransformationMode(Qt.TransformationMode.FastTransformation)
-        self.scene.addItem(self.pixmap_item)
+        self.canvas = TiledImageItem()
+        self.scene.addItem(self.canvas)
 
+        self.loading_bar = LoadingBar()
+        layout.addWidget(self.loading_bar)
         layout.addWidget(self.view)
 
         self.coord_label = QLabel("Mouse: ")
@@ -51,26 +45,29 @@ class ImageViewer(QWidget, EditorWidget):
 
         self.setLayout(layout)
 
-    def generate_checkerboard_pixmap(self, width, height, tile_size=8):
-        pixmap = QPixmap(width, height)
-        pixmap.fill(Qt.transparent)
+        # Decoded on a worker thread, the tab is usable right away
+        self.image_loader = ImageLoader(self)
+        self.image_loader.loaded.connect(self.on_image_loaded)
+        self.image_loader.failed.connect(self.on_image_failed)
+        self.loading_bar.start(self.image_path)
+        self.image_loader.load(self.image_path)
+
+    def on_image_loaded(self, image: QImage):
+        self.loading_bar.hide()
+        self.canvas.set_image(image)
 
-        light = QColor(200, 200, 200)
-        dark = QColor(150, 150, 150)
+    def on_image_failed(self, error):
+        self.loading_bar.hide()
+        QMessageBox.critical(self, "Error", f"Failed to load image.\n{error}")
 
-        painter = QPainter(pixmap)
-        for y in range(0, height, tile_size):
-            for x in range(0, width, tile_size):
-                color = light if ((x // tile_size + y // tile_size) % 2 == 0) else dark
-                painter.fillRect(x, y, tile_size, tile_size, color)
-        painter.end()
-        return pixmap
+    def close_editor(self):
+        self.image_loader.cancel()
 
     def update_coordinates(self, scene_pos: QPointF):
-        image_pos = self.pixmap_item.mapFromScene(scene_pos)
+        image_pos = self.canvas.mapFromScene(scene_pos)
         x, y = int(image_pos.x()), int(image_pos.y())
 
-        if 0 <= x < self.pixmap.width() and 0 <= y < self.pixmap.height():
+        if 0 <= x < self.canvas.width() and 0 <= y < self.canvas.height():
             self.coord_label.setText(f"Mouse: ({x}, {y})")
         else:
             self.coord_label.setText("Mouse: Out of bounds")
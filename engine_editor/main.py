@@ -2,19 +2,52 @@ from PySide6.QtCore import *
 from PySide6.QtGui import *
 from PySide6.QtWidgets import *
 from sympy import im
-import toml
 import sys
 import os
-import zipfile
-import glob
+import multiprocessing
 
 from project import *
+import exporter
+from assetindex import AssetIndex
+from imagecache import image_cache, IMAGE_CACHE_BYTES
+from canvas import tile_cache
+from documentsaver import SaveWorker, save_document
+from documentstore import document_store
 from projecteditor import ProjectEditor
 from imageviewer import ImageViewer
 from spritesheeteditor import SpritesheetEditor
+from stageeditor import StageEditor
 
 import qdarkstyle
 
+class ExportWorker(QThread):
+    progress = Signal(int, int)
+    exported = Signal(object)
+    failed = Signal(str)
+
+    def __init__(self, project_path, incremental, parent=None):
+        super().__init__(parent)
+        self.project_path = project_path
+        self.incremental = incremental
+        self.cancelled = False
+
+    def cancel(self):
+        # Takes effect at the next item of the running stage, the export cleans up and the thread finishes
+        self.cancelled = True
+
+    def run(self):
+        try:
+            stats = exporter.export_project(
+                self.project_path, incremental=self.incremental, progress=self.progress.emit, cancelled=lambda: self.cancelled
+            )
+        except exporter.ExportCancelled:
+            return
+        except Exception as e:
+            self.failed.emit(str(e))
+            return
+
+        self.exported.emit(stats)
+
 class MainWindow(QMainWindow):
     def __init__(self):
         super().__init__()
@@ -48,15 +81,19 @@ class MainWindow(QMainWindow):
         self.export_action.clicked.connect(self.export_project)
         self.toolbar.addWidget(self.export_action)
 
+        self.incremental_export_check = QCheckBox("Incremental", self)
+        self.incremental_export_check.setChecked(True)
+        self.incremental_export_check.setToolTip("Reuse unchanged entries of the previous data.arpg")
+        self.toolbar.addWidget(self.incremental_export_check)
+
 
-        # Assets tree
-        self.model = QFileSystemModel()
-        self.model.setFilter(QDir.NoDotAndDotDot | QDir.AllEntries)
-        self.model.setRootPath("")
+        # Assets tree, backed by the project's asset index so nothing outside the project is read
+        self.asset_index = AssetIndex(self)
+        self.model = self.asset_index.model
 
         self.tree_view = QTreeView()
         self.tree_view.setModel(self.model)
-        self.tree_view.setRootIndex(QModelIndex())
+        self.tree_view.setIconSize(QSize(32, 32))
         self.tree_view.clicked.connect(self.on_tree_item_clicked)
 
         # Main content area as tab widget
@@ -71,7 +108,25 @@ class MainWindow(QMainWindow):
         self.assets_dock_widget.setWidget(self.tree_view)
         self.addDockWidget(Qt.LeftDockWidgetArea, self.assets_dock_widget)
 
+        # Memory held by the image and tile caches shared by all tabs
+        self.cache_label = QLabel()
+        self.statusBar().addPermanentWidget(self.cache_label)
+        self.cache_stats_timer = QTimer(self)
+        self.cache_stats_timer.timeout.connect(self.update_cache_stats)
+        self.cache_stats_timer.start(1000)
+        image_cache().changed.connect(self.update_cache_stats)
+        self.update_cache_stats()
+
         self.current_project_path = ""
+        self.export_worker = None
+        self.save_worker = None
+        self.save_requested = False
+        self.saving_widgets = {}
+        # Snapshots of tabs closed with "save", written by the next save
+        self.pending_documents = []
+
+        # Files edited in other programs are picked up when the editor gets the focus back
+        QApplication.instance().applicationStateChanged.connect(self.on_application_state_changed)
 
     def open_project_directory_dialog(self):   
         
@@ -84,17 +139,18 @@ class MainWindow(QMainWindow):
         
         project_cfg_path = os.path.join(directory, "project.toml")
 
+        document_store().clear()
         if os.path.isfile(project_cfg_path) and self.is_valid_project_config(project_cfg_path):
-            self.model.setRootPath(directory)
-            self.tree_view.setRootIndex(self.model.index(directory))
+            self.asset_index.open(directory)
             self.current_project_path = directory
+            self.apply_editor_settings(project_cfg_path)
         else:
             QMessageBox.warning(
                 self,
                 "Invalid Project",
                 "The selected folder does not contain a valid 'project.toml' file."
             )
-            self.tree_view.setRootIndex(QModelIndex())
+            self.asset_index.close()
 
     def new_project_directory_dialog(self):
         directory = QFileDialog.getExistingDirectory(self, "Select Project Folder", "")
@@ -108,40 +164,53 @@ class MainWindow(QMainWindow):
                 "Directory is not empty",
                 "The selected folder is not empty."
             )
-            self.tree_view.setRootIndex(QModelIndex())          
             return
 
         create_project(directory)
 
-        self.model.setRootPath(directory)
-        self.tree_view.setRootIndex(self.model.index(directory))
+        document_store().clear()
+        self.asset_index.open(directory)
         self.current_project_path = directory
+        self.apply_editor_settings(os.path.join(directory, "project.toml"))
         
             
     def is_valid_project_config(self, path):
         try:
-            with open(path, "r", encoding="utf-8") as f:
-                data = toml.load(f)
+            data = document_store().load(path)
             return "name" in data and "version" in data
         except Exception as e:
             return False
 
-    def on_tree_item_clicked(self, index: QModelIndex):
-        file_path = self.model.filePath(index)
+    def apply_editor_settings(self, path):
+        # [editor] image_cache_mb in project.toml sets the memory budget of the shared image cache
+        data = document_store().load(path)
+        budget_mb = data.get("editor", {}).get("image_cache_mb")
+        image_cache().set_budget(budget_mb * 1024 * 1024 if budget_mb else IMAGE_CACHE_BYTES)
+        self.update_cache_stats()
+
+    def update_cache_stats(self):
+        count, total, in_use = image_cache().stats()
+        _, hits, misses, parse_time = document_store().stats()
+        mb = 1024 * 1024
+        self.cache_label.setText(
+            f"Images: {count} cached, {total / mb:.1f} MB ({in_use / mb:.1f} MB in use) of {image_cache().budget // mb} MB"
+            f" | Tiles: {tile_cache().total / mb:.1f} MB"
+            f" | Documents: {hits} hits, {misses} parsed in {parse_time * 1000:.0f} ms"
+        )
 
-        if not os.path.isfile(file_path):
-            return
+    def on_tree_item_clicked(self, index: QModelIndex):
+        # Files are classified once by the asset index, see assetindex.classify
+        kind = self.model.node(index).kind
+        file_path = self.model.file_path(index)
 
-        if os.path.basename(file_path) == "project.toml":
+        if kind == "project":
             self.open_project_toml_tab(file_path)
-        elif (self.current_project_path + "/assets") in file_path and self.is_image_file(file_path):
+        elif kind == "image":
             self.open_image_tab(file_path)
-        elif (self.current_project_path + "/spritesheets") in file_path and file_path.lower().endswith(".toml"):
+        elif kind == "spritesheet":
             self.open_spritesheeteditor_tab(file_path)
-
-    def is_image_file(self, file_path):
-        image_extensions = (".png", ".jpg", ".jpeg", ".bmp", ".gif")
-        return file_path.lower().endswith(image_extensions)
+        elif kind == "stage":
+            self.open_stage_tab(file_path)
 
     def open_spritesheeteditor_tab(self, path):
         for i in range(self.tab_widget.count()):
@@ -151,9 +220,21 @@ class MainWindow(QMainWindow):
                 return
 
         viewer = SpritesheetEditor(path,self.current_project_path)
+        viewer.modifiedChanged.connect(self.on_tab_modified_changed)
         self.tab_widget.addTab(viewer, os.path.basename(path))
         self.tab_widget.setCurrentWidget(viewer)
 
+    def open_stage_tab(self, path):
+        for i in range(self.tab_widget.count()):
+            widget = self.tab_widget.widget(i)
+            if isinstance(widget, StageEditor) and widget.toml_path == path:
+                self.tab_widget.setCurrentIndex(i)
+                return
+
+        editor = StageEditor(path, self.current_project_path)
+        self.tab_widget.addTab(editor, os.path.basename(path))
+        self.tab_widget.setCurrentWidget(editor)
+
     def open_image_tab(self, path):
         for i in range(self.tab_widget.count()):
             widget = self.tab_widget.widget(i)
@@ -175,6 +256,12 @@ class MainWindow(QMainWindow):
         self.tab_widget.addTab(editor, "project.toml")
         self.tab_widget.setCurrentWidget(editor)
 
+    def on_tab_modified_changed(self, modified):
+        widget = self.sender()
+        index = self.tab_widget.indexOf(widget)
+        if index >= 0:
+            self.tab_widget.setTabText(index, os.path.basename(widget.toml_path) + (" *" if modified else ""))
+
     def close_tab(self, index):
         widget = self.tab_widget.widget(index)
 
@@ -189,53 +276,179 @@ class MainWindow(QMainWindow):
             if reply == QMessageBox.Cancel:
                 return
 
-            elif reply == QMessageBox.Yes and hasattr(widget, "save"):
-                widget.save()
+            elif reply == QMessageBox.Yes:
+                errors = []
+                document = self.take_document(index, errors)
+                if errors:
+                    self.show_save_errors(errors)
+                    return
+
+                if document:
+                    # The snapshot is saved in the background, the tab closes right away
+                    self.pending_documents.append(document)
+                    self.save_project()
 
             elif reply == QMessageBox.No:
                 pass 
 
+        if hasattr(widget, "close_editor"):
+            widget.close_editor()
+        self.saving_widgets = {path: saving for path, saving in self.saving_widgets.items() if saving is not widget}
+
         self.tab_widget.removeTab(index)
+        widget.deleteLater()
 
 
     def save_project(self):
+        # Another save while one runs is done once it finishes, with whatever is dirty by then
+        if self.save_worker:
+            self.save_requested = True
+            return
+
+        documents, self.pending_documents = self.pending_documents, []
+        errors = []
+        self.saving_widgets = {}
         for i in range(self.tab_widget.count()):
             widget = self.tab_widget.widget(i)
-            if hasattr(widget, "save") and callable(getattr(widget, "save")):
-                widget.save()
-            else:
-                pass
-        
-        QMessageBox.information(self, "Saved", "project saved successfully.")
+            if not (hasattr(widget, "is_modified") and widget.is_modified() and hasattr(widget, "document")):
+                continue
+
+            document = self.take_document(i, errors)
+            if document:
+                # Marked now so edits made during the save leave the tab modified
+                widget.set_saved(True)
+                documents.append(document)
+                self.saving_widgets[document[0]] = widget
+
+        # Reported once, after every snapshot was taken
+        if errors:
+            self.show_save_errors(errors)
+
+        if not documents:
+            if not errors:
+                self.statusBar().showMessage("Nothing to save.", 3000)
+            return
+
+        self.save_worker = SaveWorker(documents, self)
+        self.save_worker.saved.connect(self.on_project_saved)
+        self.save_worker.finished.connect(self.on_save_worker_finished)
+        self.save_worker.start()
+        self.statusBar().showMessage(f"Saving {len(documents)} file(s)...")
+
+    def on_project_saved(self, results, seconds):
+        failed = [(path, error) for path, error in results if error]
+        for path, _ in failed:
+            widget = self.saving_widgets.get(path)
+            if widget is not None:
+                widget.set_saved(False)
+
+        saved = len(results) - len(failed)
+        self.statusBar().showMessage(f"Saved {saved} file(s) in {seconds:.2f}s" + (f", {len(failed)} failed." if failed else "."), 5000)
+
+        if failed:
+            self.show_save_errors(failed)
+
+    def take_document(self, index, errors):
+        try:
+            return self.tab_widget.widget(index).document()
+        except ValueError as e:
+            errors.append((self.tab_widget.tabText(index).removesuffix(" *"), str(e)))
+            return None
+
+    def show_save_errors(self, errors):
+        message = QMessageBox(QMessageBox.Warning, "Save", f"{len(errors)} file(s) could not be saved.", QMessageBox.Ok, self)
+        message.setDetailedText("\n".join(f"{path}: {error}" for path, error in errors))
+        message.setModal(False)
+        message.setAttribute(Qt.WA_DeleteOnClose)
+        message.show()
+
+    def on_save_worker_finished(self):
+        self.save_worker.deleteLater()
+        self.save_worker = None
+        self.saving_widgets = {}
+
+        if self.save_requested:
+            self.save_requested = False
+            self.save_project()
 
     def export_project(self):
-        with zipfile.ZipFile(self.current_project_path + "/data.arpg","w",compression=zipfile.ZIP_DEFLATED,compresslevel=6) as zip:
-            zip.write(self.current_project_path + "/project.toml","project.toml")
-            
-            zip.writestr("global/","")
-            for file in glob.iglob(self.current_project_path + "/global/*.toml"):
-                zip.write(file,file[len(self.current_project_path):])
-
-            zip.writestr("stages/","")
-            for file in glob.iglob(self.current_project_path + "/stages/*.toml"):
-                zip.write(file,file[len(self.current_project_path):])
-                
-            zip.writestr("actors/","")
-            for file in glob.iglob(self.current_project_path + "/actors/*.toml"):
-                zip.write(file,file[len(self.current_project_path):])
-
-            zip.writestr("spritesheets/","")
-            for file in glob.iglob(self.current_project_path + "/spritesheets/*.toml"):
-                zip.write(file,file[len(self.current_project_path):])
-              
-            zip.writestr("assets/","")  
-            for file in glob.iglob(self.current_project_path + "/assets/*"):
-                zip.write(file,file[len(self.current_project_path):])
-        
-        QMessageBox.information(self, "Export", "project exported successfully.")
+        if self.export_worker:
+            return
+
+        self.export_action.setEnabled(False)
+
+        self.export_progress = QProgressDialog("Exporting project...", "Cancel", 0, 0, self)
+        self.export_progress.setWindowTitle("Export")
+        self.export_progress.setMinimumDuration(0)
+        self.export_progress.setAutoClose(False)
+
+        # Compression runs in worker processes driven from this thread, the UI stays responsive
+        self.export_worker = ExportWorker(self.current_project_path, self.incremental_export_check.isChecked(), self)
+        self.export_worker.progress.connect(self.on_export_progress)
+        self.export_worker.exported.connect(self.on_export_finished)
+        self.export_worker.failed.connect(self.on_export_failed)
+        self.export_worker.finished.connect(self.on_export_worker_finished)
+        self.export_progress.canceled.connect(self.on_export_canceled)
+        self.export_worker.start()
+
+    def on_export_canceled(self):
+        # Also emitted when the dialog closes after the export, cancelling a finished worker does nothing
+        if self.export_worker:
+            self.export_progress.setLabelText("Cancelling export...")
+            self.export_worker.cancel()
+
+    def on_export_progress(self, done, total):
+        self.export_progress.setMaximum(total)
+        self.export_progress.setValue(done)
+
+    def on_export_finished(self, stats):
+        self.export_progress.close()
+
+        message = QMessageBox(
+            QMessageBox.Information,
+            "Export",
+            f"project exported successfully.\n{stats.written} entries compressed, {stats.reused} reused, "
+            f"{stats.deduplicated} duplicates ({stats.deduplicated_bytes} bytes saved).",
+            QMessageBox.Ok,
+            self
+        )
+        message.setDetailedText(stats.report())
+        message.exec()
+
+    def on_export_failed(self, error):
+        self.export_progress.close()
+        QMessageBox.critical(self, "Error", f"Failed to export project:\n{error}")
+
+    def on_application_state_changed(self, state):
+        if state == Qt.ApplicationActive:
+            self.asset_index.refresh()
+
+    def closeEvent(self, event):
+        if self.save_worker:
+            self.save_worker.wait()
+        # Tabs closed with "save" while that one ran
+        for path, data in self.pending_documents:
+            try:
+                save_document(path, data)
+            except Exception as e:
+                QMessageBox.warning(self, "Save", f"{path} could not be saved.\n{e}")
+        if self.export_worker:
+            self.export_worker.cancel()
+            self.export_worker.wait()
+        self.asset_index.close()
+        super().closeEvent(event)
+
+    def on_export_worker_finished(self):
+        self.export_progress.close()
+        self.export_worker.deleteLater()
+        self.export_worker = None
+        self.export_action.setEnabled(True)
 
 
 if __name__ == "__main__":
+    # Needed by the export process pool in frozen (pyinstaller) builds
+    multiprocessing.freeze_support()
+
     app = QApplication(sys.argv)
     window = MainWindow()
     window.show()
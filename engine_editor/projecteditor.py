@@ -1,14 +1,17 @@
 from PySide6.QtCore import *
 from PySide6.QtGui import *
 from PySide6.QtWidgets import *
-import toml
+import copy
 from editorwidget import EditorWidget
+from documentsaver import save_document
+from documentstore import document_store
 
 class ProjectEditor(QWidget,EditorWidget):
     def __init__(self, path, parent=None):
         super().__init__(parent)
         self.path = path
         self.modified = False
+        self.data = {}
 
         self.layout = QFormLayout(self)
 
@@ -31,8 +34,11 @@ class ProjectEditor(QWidget,EditorWidget):
 
     def load_from_file(self):
         try:
-            with open(self.path, "r", encoding="utf-8") as f:
-                data = toml.load(f)
+            data = document_store().load(self.path)
+
+            # Keep sections this editor does not show (e.g. [compression]) so save() does not drop them.
+            # Shared with the document store, document() copies it before filling in the fields.
+            self.data = data
 
             # Block signals to avoid setting modified during initial load
             self.name_input.blockSignals(True)
@@ -58,20 +64,19 @@ class ProjectEditor(QWidget,EditorWidget):
     def is_modified(self):
         return self.modified
 
+    def document(self):
+        data = copy.deepcopy(self.data)
+        data.update({
+            "name": self.name_input.text(),
+            "version": self.version_input.text(),
+            "window_title": self.window_title_input.text()
+        })
+        return self.path, data
+
     def save(self):
         try:
-            data = {
-                "name": self.name_input.text(),
-                "version": self.version_input.text(),
-                "window_title": self.window_title_input.text()
-
-            }
-
-            with open(self.path, "w", encoding="utf-8") as f:
-                toml.dump(data, f)
-
+            save_document(*self.document())
             self.modified = False  # Reset after saving
-            
 
         except Exception as e:
             QMessageBox.critical(self, "Error", f"Failed to save:\n{e}")
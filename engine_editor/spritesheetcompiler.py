@@ -0,0 +1,60 @@
+import struct
+import toml
+
+# Binary spritesheet read by the runtime (engine_core/spritesheet.h), all fields little endian:
+#   header   "ASPR", u16 version, u16 reserved, i32 frame_width, i32 frame_height
+#   string   u16 length + utf-8 bytes (image_path)
+#   u32 state count, then per state: string name, i32 fps, u32 frame count, frame count * (i32 x, i32 y)
+# Frames are laid out like SpriteFrame so the runtime copies each state's frames in one go.
+SPRITESHEET_MAGIC = b"ASPR"
+SPRITESHEET_VERSION = 1
+BINARY_SUFFIX = ".bin"
+
+HEADER = struct.Struct("<4sHHii")
+
+
+def pack_string(text):
+    data = text.encode("utf-8")
+    return struct.pack("<H", len(data)) + data
+
+
+def compile_spritesheet(data):
+    out = bytearray(HEADER.pack(SPRITESHEET_MAGIC, SPRITESHEET_VERSION, 0, data.get("width", 16), data.get("height", 16)))
+    out += pack_string(data.get("image_path", ""))
+
+    states = data.get("states", {})
+    out += struct.pack("<I", len(states))
+
+    for name, state in states.items():
+        frames = [frame for frame in state.get("frames", []) if isinstance(frame, list) and len(frame) == 2]
+
+        out += pack_string(name)
+        out += struct.pack("<iI", state.get("fps", 6), len(frames))
+        out += struct.pack(f"<{len(frames) * 2}i", *(int(v) for frame in frames for v in frame))
+
+    return bytes(out)
+
+
+def load_compile_settings(project_data):
+    cfg = project_data.get("compile", {})
+    # Stage layers are always compiled, the runtime only reads them from stages/<name>.toml.tiles
+    if cfg.get("tilemaps", True) is not True:
+        raise ValueError("[compile] tilemaps must be true, the runtime cannot load stage layers from TOML")
+    return {"spritesheets": cfg.get("spritesheets", False)}
+
+
+def compile_spritesheets(sources):
+    # Replaces spritesheets/<name>.toml with spritesheets/<name>.toml.bin, the runtime keys both by <name>.toml
+    result = {}
+    for arcname, source in sources.items():
+        if arcname.startswith("spritesheets/") and arcname.lower().endswith(".toml") and source is not None:
+            if isinstance(source, bytes):
+                data = toml.loads(source.decode("utf-8"))
+            else:
+                with open(source, "r", encoding="utf-8") as f:
+                    data = toml.load(f)
+            result[arcname + BINARY_SUFFIX] = compile_spritesheet(data)
+        else:
+            result[arcname] = source
+
+    return result
@@ -2,7 +2,11 @@ from PySide6.QtCore import *
 from PySide6.QtGui import *
 from PySide6.QtWidgets import *
 from editorwidget import EditorWidget, GraphicsView
-import toml
+from canvas import TiledImageItem, checkerboard_brush
+from imageloader import ImageLoader, LoadingBar
+import autoslice
+from documentsaver import save_document
+from documentstore import document_store
 import os
 
 class AnimationState:
@@ -29,6 +33,8 @@ class MovableRect(QGraphicsRectItem):
         self.setFlag(QGraphicsItem.ItemSendsGeometryChanges, True)
         self.setZValue(10)
         self.callback = None
+        self.release_callback = None
+        self.press_pos = QPointF()
 
     def itemChange(self, change, value):
         if change == QGraphicsItem.ItemPositionChange:
@@ -41,24 +47,317 @@ class MovableRect(QGraphicsRectItem):
     def set_position_callback(self, callback):
         self.callback = callback
 
+    # A drag reports once on release with where it started, not for every mouse move
+    def set_release_callback(self, callback):
+        self.release_callback = callback
+
+    def mousePressEvent(self, event):
+        self.press_pos = self.pos()
+        super().mousePressEvent(event)
+
+    def mouseReleaseEvent(self, event):
+        super().mouseReleaseEvent(event)
+        if self.release_callback and self.pos() != self.press_pos:
+            self.release_callback(self.press_pos, self.pos())
+
+
+# Commands keep only what they change, the stack drops the oldest past UNDO_LIMIT
+UNDO_LIMIT = 256
+FPS_COMMAND_ID = 1
+FRAME_SIZE_COMMAND_ID = 2
+
+
+class MoveFrameCommand(QUndoCommand):
+    def __init__(self, editor, anim, index, old, new):
+        super().__init__(f"Move {anim.name} Frame {index + 1}")
+        self.editor = editor
+        self.anim = anim
+        self.index = index
+        self.old = old
+        self.new = new
+
+    def redo(self):
+        self.editor.set_frame(self.anim, self.index, self.new)
+
+    def undo(self):
+        self.editor.set_frame(self.anim, self.index, self.old)
+
+
+class AddFrameCommand(QUndoCommand):
+    def __init__(self, editor, anim, index, pos):
+        super().__init__(f"Add {anim.name} Frame")
+        self.editor = editor
+        self.anim = anim
+        self.index = index
+        self.pos = pos
+
+    def redo(self):
+        self.editor.insert_frame(self.anim, self.index, self.pos)
+
+    def undo(self):
+        self.editor.delete_frame(self.anim, self.index)
+
+
+class RemoveFrameCommand(QUndoCommand):
+    def __init__(self, editor, anim, index):
+        super().__init__(f"Remove {anim.name} Frame {index + 1}")
+        self.editor = editor
+        self.anim = anim
+        self.index = index
+        self.pos = anim.frames[index]
+
+    def redo(self):
+        self.editor.delete_frame(self.anim, self.index)
+
+    def undo(self):
+        self.editor.insert_frame(self.anim, self.index, self.pos)
+
+
+class ReplaceFramesCommand(QUndoCommand):
+    def __init__(self, editor, anim, frames):
+        super().__init__(f"Replace {anim.name} Frames")
+        self.editor = editor
+        self.anim = anim
+        self.old = anim.frames
+        self.new = frames
+
+    def redo(self):
+        self.editor.set_frames(self.anim, list(self.new))
+
+    def undo(self):
+        self.editor.set_frames(self.anim, list(self.old))
+
+
+class AddStateCommand(QUndoCommand):
+    def __init__(self, editor, anim, row):
+        super().__init__(f"Add Animation {anim.name}")
+        self.editor = editor
+        self.anim = anim
+        self.row = row
+
+    def redo(self):
+        self.editor.insert_state(self.anim, self.row)
+
+    def undo(self):
+        self.editor.take_state(self.anim)
+
+
+class RemoveStateCommand(QUndoCommand):
+    # The state object itself is kept, undo puts it back with its frames at the same row
+    def __init__(self, editor, anim):
+        super().__init__(f"Remove Animation {anim.name}")
+        self.editor = editor
+        self.anim = anim
+        self.row = editor.state_row(anim)
+
+    def redo(self):
+        self.editor.take_state(self.anim)
+
+    def undo(self):
+        self.editor.insert_state(self.anim, self.row)
+
+
+class RenameStateCommand(QUndoCommand):
+    def __init__(self, editor, anim, old, new):
+        super().__init__(f"Rename Animation {old} to {new}")
+        self.editor = editor
+        self.anim = anim
+        self.old = old
+        self.new = new
+
+    def redo(self):
+        self.editor.set_state_name(self.anim, self.new)
+
+    def undo(self):
+        self.editor.set_state_name(self.anim, self.old)
+
+
+class SetFpsCommand(QUndoCommand):
+    def __init__(self, editor, anim, old, new):
+        super().__init__(f"Set {anim.name} FPS")
+        self.editor = editor
+        self.anim = anim
+        self.old = old
+        self.new = new
+
+    def id(self):
+        return FPS_COMMAND_ID
+
+    # Spinning through values is one edit, back at the start it is none
+    def mergeWith(self, other):
+        if other.anim is not self.anim:
+            return False
+        self.new = other.new
+        self.setObsolete(self.new == self.old)
+        return True
+
+    def redo(self):
+        self.editor.set_state_fps(self.anim, self.new)
+
+    def undo(self):
+        self.editor.set_state_fps(self.anim, self.old)
+
+
+class SetFrameSizeCommand(QUndoCommand):
+    def __init__(self, editor, old, new):
+        super().__init__(f"Set Sprite Size {new[0]}x{new[1]}")
+        self.editor = editor
+        self.old = old
+        self.new = new
+
+    def id(self):
+        return FRAME_SIZE_COMMAND_ID
+
+    def mergeWith(self, other):
+        self.new = other.new
+        self.setObsolete(self.new == self.old)
+        return True
+
+    def redo(self):
+        self.editor.set_frame_size(*self.new)
+
+    def undo(self):
+        self.editor.set_frame_size(*self.old)
+
+
+class SetImageCommand(QUndoCommand):
+    def __init__(self, editor, old, new):
+        super().__init__(f"Set Image {os.path.basename(new)}")
+        self.editor = editor
+        self.old = old
+        self.new = new
+
+    def redo(self):
+        self.editor.set_image_path(self.new)
+
+    def undo(self):
+        self.editor.set_image_path(self.old)
+
+
+class AnimationPreview(QWidget):
+    # Plays the selected state from frames cropped once per state, a tick only repaints the cached pixmap
+    def __init__(self, parent=None):
+        super().__init__(parent)
+        self.setMinimumSize(128, 128)
+
+        self.image = QImage()
+        self.frame_width = 16
+        self.frame_height = 16
+        self.anim: AnimationState | None = None
+        self.frame_cache: dict[AnimationState, list[QPixmap]] = {}
+        self.current = 0
+
+        self.timer = QTimer(self)
+        self.timer.setTimerType(Qt.PreciseTimer)
+        self.timer.timeout.connect(self.next_frame)
+
+    def crop(self, pos: QPointF):
+        rect = QRect(int(pos.x()), int(pos.y()), self.frame_width, self.frame_height)
+        return QPixmap.fromImage(self.image.copy(rect))
+
+    def frames(self):
+        if not self.anim:
+            return []
+
+        frames = self.frame_cache.get(self.anim)
+        if frames is None:
+            frames = self.frame_cache[self.anim] = [self.crop(pos) for pos in self.anim.frames]
+        return frames
+
+    def invalidate(self):
+        self.frame_cache.clear()
+        self.current = 0
+        self.update()
+
+    def set_image(self, image: QImage):
+        self.image = image
+        self.invalidate()
+
+    def set_frame_size(self, width, height):
+        self.frame_width, self.frame_height = width, height
+        self.invalidate()
+
+    def set_animation(self, anim):
+        self.anim = anim
+        self.current = 0
+        self.set_fps(anim.fps if anim else 0)
+        self.update()
+
+    def set_fps(self, fps):
+        if fps > 0:
+            self.timer.start(max(1, round(1000 / fps)))
+        else:
+            self.timer.stop()
+
+    def remove_animation(self, anim):
+        self.frame_cache.pop(anim, None)
+
+    # Frame edits patch only the affected entry of a cached state
+    def frame_changed(self, anim, index):
+        frames = self.frame_cache.get(anim)
+        if frames is not None and 0 <= index < len(frames):
+            frames[index] = self.crop(anim.frames[index])
+            self.update()
+
+    def frame_inserted(self, anim, index):
+        frames = self.frame_cache.get(anim)
+        if frames is not None:
+            frames.insert(index, self.crop(anim.frames[index]))
+            self.update()
+
+    def frame_removed(self, anim, index):
+        frames = self.frame_cache.get(anim)
+        if frames is not None and 0 <= index < len(frames):
+            del frames[index]
+            self.current = 0
+            self.update()
+
+    def next_frame(self):
+        frames = self.frames()
+        if len(frames) > 1:
+            self.current = (self.current + 1) % len(frames)
+            self.update()
+
+    def paintEvent(self, event):
+        painter = QPainter(self)
+        frames = self.frames()
+        if not frames:
+            return
+
+        pixmap = frames[self.current % len(frames)]
+        if pixmap.isNull():
+            return
+
+        # Integer scale keeps pixel art crisp
+        scale = max(1, min(self.width() // pixmap.width(), self.height() // pixmap.height()))
+        target = QRect(0, 0, pixmap.width() * scale, pixmap.height() * scale)
+        target.moveCenter(self.rect().center())
+
+        painter.fillRect(target, checkerboard_brush())
+        painter.drawPixmap(target, pixmap)
+
 
 class SpritesheetEditor(QWidget, EditorWidget):
+    modifiedChanged = Signal(bool)
+
     def __init__(self, toml_path,project_path):
         super().__init__()
         self.toml_path = toml_path
         self.project_path = project_path
         self.image_path = ""
+        self.frame_size = (16, 16)
         self.modified = False
         self._zoom = 1.0
         self._dragging = False
         self.anim_states: dict[str, AnimationState] = {}
 
+        self.undo_stack = QUndoStack(self)
+        self.undo_stack.setUndoLimit(UNDO_LIMIT)
+        # Modified is whether the stack moved away from the last saved state, undoing back to it is clean again
+        self.undo_stack.cleanChanged.connect(self.on_clean_changed)
+
         self.setup_ui()
 
-        self.pixmap = QPixmap(self.image_path)
-        if self.pixmap.isNull():
-            pass
-        
         self.update_selection_rect()
         
         self.load()
@@ -110,20 +409,16 @@ class SpritesheetEditor(QWidget, EditorWidget):
         self.scene = QGraphicsScene()
         self.view.setScene(self.scene)
 
-        self.pixmap = QPixmap(self.image_path)
-        if self.pixmap.isNull():
-            pass
+        self.canvas = TiledImageItem()
+        self.canvas.setZValue(-1)
+        self.scene.addItem(self.canvas)
 
-        self.checker_item = QGraphicsPixmapItem(self.generate_checkerboard_pixmap(
-            self.pixmap.width(), self.pixmap.height()))
-        self.checker_item.setZValue(-2)
-        self.scene.addItem(self.checker_item)
-
-        self.pixmap_item = QGraphicsPixmapItem(self.pixmap)
-        self.pixmap_item.setTransformationMode(Qt.TransformationMode.FastTransformation)
-        self.pixmap_item.setZValue(-1)
-        self.scene.addItem(self.pixmap_item)
+        self.image_loader = ImageLoader(self)
+        self.image_loader.loaded.connect(self.on_image_loaded)
+        self.image_loader.failed.connect(self.on_image_failed)
 
+        self.loading_bar = LoadingBar()
+        center_layout.addWidget(self.loading_bar)
         center_layout.addWidget(self.view)
 
         self.coord_label = QLabel("Mouse: ")
@@ -163,12 +458,12 @@ class SpritesheetEditor(QWidget, EditorWidget):
         self.tile_width_spin = QSpinBox()
         self.tile_width_spin.setRange(1, 1024)
         self.tile_width_spin.setValue(16)
-        self.tile_width_spin.valueChanged.connect(self.update_selection_rect)
+        self.tile_width_spin.valueChanged.connect(self.on_frame_size_changed)
 
         self.tile_height_spin = QSpinBox()
         self.tile_height_spin.setRange(1, 1024)
         self.tile_height_spin.setValue(16)
-        self.tile_height_spin.valueChanged.connect(self.update_selection_rect)
+        self.tile_height_spin.valueChanged.connect(self.on_frame_size_changed)
 
         self.fps_spin = QSpinBox()
         self.fps_spin.setRange(1, 240)
@@ -187,6 +482,22 @@ class SpritesheetEditor(QWidget, EditorWidget):
         right_layout.addSpacing(10)
         right_layout.addWidget(QLabel("Animation FPS:"))
         right_layout.addWidget(self.fps_spin)
+        right_layout.addSpacing(10)
+
+        self.slice_mode_combo = QComboBox()
+        self.slice_mode_combo.addItem("Grid", "grid")
+        self.slice_mode_combo.addItem("Opaque regions", "regions")
+        self.auto_slice_btn = QPushButton("Auto Slice")
+        self.auto_slice_btn.clicked.connect(self.auto_slice)
+
+        right_layout.addWidget(QLabel("Auto Slice:"))
+        right_layout.addWidget(self.slice_mode_combo)
+        right_layout.addWidget(self.auto_slice_btn)
+        right_layout.addSpacing(10)
+
+        self.preview = AnimationPreview()
+        right_layout.addWidget(QLabel("Preview:"))
+        right_layout.addWidget(self.preview)
         right_layout.addStretch()
 
         right_widget = QWidget()
@@ -209,12 +520,19 @@ class SpritesheetEditor(QWidget, EditorWidget):
         self.selection_rect.setPen(QPen(QColor(0, 0, 255, 255), 0))
         self.selection_rect.setBrush(QColor(0, 0, 255, 50))
         self.selection_rect.set_position_callback(self.on_rect_moved)
+        self.selection_rect.set_release_callback(self.on_rect_released)
         self.scene.addItem(self.selection_rect)
         self.update_selection_rect()
 
         # --- Animation Frame Storage ---
         self.anim_frames = {}
 
+        # --- Undo / Redo, only while this tab has focus ---
+        for keys, slot in ((QKeySequence.Undo, self.undo_stack.undo), (QKeySequence.Redo, self.undo_stack.redo)):
+            shortcut = QShortcut(QKeySequence(keys), self)
+            shortcut.setContext(Qt.WidgetWithChildrenShortcut)
+            shortcut.activated.connect(slot)
+
     def load_image(self):
         dialog = QFileDialog(self, "Select Spritesheet Image", self.project_path + "/assets")
         dialog.setNameFilter("Images (*.png *.jpg *.bmp *.gif)")
@@ -223,64 +541,60 @@ class SpritesheetEditor(QWidget, EditorWidget):
         if dialog.exec():
             selected = dialog.selectedFiles()[0]
             if selected.startswith(self.project_path + "/assets"):
-                self.image_path = selected
-                self.pixmap = QPixmap(self.image_path)
-                if not self.pixmap.isNull():
-                    self.update_image_scene()
-                    self.modified = True
+                if selected != self.image_path:
+                    self.undo_stack.push(SetImageCommand(self, self.image_path, selected))
             else:
                 QMessageBox.warning(self, "Invalid Selection", "Please select an image from within the 'assets' directory.")
 
-    def update_image_scene(self):
-        self.scene.removeItem(self.pixmap_item)
-        self.scene.removeItem(self.checker_item)
+    def set_image_path(self, path):
+        self.image_path = path
+        if path:
+            self.load_image_async(path)
+        else:
+            self.image_loader.cancel()
+            self.on_image_loaded(QImage())
 
-        self.checker_item = QGraphicsPixmapItem(self.generate_checkerboard_pixmap(
-            self.pixmap.width(), self.pixmap.height()))
-        self.checker_item.setZValue(-2)
-        self.scene.addItem(self.checker_item)
+    def load_image_async(self, path):
+        self.loading_bar.start(path)
+        self.image_loader.load(path)
 
-        self.pixmap_item = QGraphicsPixmapItem(self.pixmap)
-        self.pixmap_item.setTransformationMode(Qt.TransformationMode.FastTransformation)
-        self.pixmap_item.setZValue(-1)
-        self.scene.addItem(self.pixmap_item)
+    def on_image_loaded(self, image: QImage):
+        self.loading_bar.hide()
+        self.canvas.set_image(image)
+        self.preview.set_image(image)
 
-    def generate_checkerboard_pixmap(self, width, height, tile_size=8):
-        if width <= 0 or height <= 0:
-            return QPixmap()  
-        
-        pixmap = QPixmap(width, height)
-        pixmap.fill(Qt.transparent)
-        painter = QPainter(pixmap)
-        light, dark = QColor(200, 200, 200), QColor(150, 150, 150)
-        for y in range(0, height, tile_size):
-            for x in range(0, width, tile_size):
-                color = light if ((x // tile_size + y // tile_size) % 2 == 0) else dark
-                painter.fillRect(x, y, tile_size, tile_size, color)
-        painter.end()
-        return pixmap
+    def on_image_failed(self, error):
+        self.loading_bar.hide()
+        QMessageBox.warning(self, "Error", f"Failed to load {os.path.basename(self.image_path)}.\n{error}")
+
+    def close_editor(self):
+        self.image_loader.cancel()
+        self.preview.set_animation(None)
 
     def update_selection_rect(self):
         w, h = self.tile_width_spin.value(), self.tile_height_spin.value()
         self.selection_rect.setRect(0, 0, w, h)
+        self.preview.set_frame_size(w, h)
 
     def on_rect_moved(self, pos: QPointF):
         self.coord_label.setText(f"Selection Rect Position: ({int(pos.x())}, {int(pos.y())})")
+
+    def on_rect_released(self, start: QPointF, pos: QPointF):
         anim = self.get_current_animation()
         index = self.frames_list.currentRow()
-        if anim and 0 <= index < len(anim.frames):
-            anim.frames[index] = pos
-            self.modified = True
+        if anim and 0 <= index < len(anim.frames) and anim.frames[index] != pos:
+            self.undo_stack.push(MoveFrameCommand(self, anim, index, anim.frames[index], pos))
 
     def on_animation_changed(self):
         anim = self.get_current_animation()
+        self.preview.set_animation(anim)
+        self.frames_list.clear()
         if not anim:
             return
         self.fps_spin.blockSignals(True)
         self.fps_spin.setValue(anim.fps)
         self.fps_spin.blockSignals(False)
 
-        self.frames_list.clear()
         for i, _ in enumerate(anim.frames):
             self.frames_list.addItem(f"Frame {i + 1}")
             
@@ -289,9 +603,13 @@ class SpritesheetEditor(QWidget, EditorWidget):
 
     def on_fps_changed(self, fps):
         anim = self.get_current_animation()
-        if anim:
-            anim.fps = fps
-            self.modified = True
+        if anim and anim.fps != fps:
+            self.undo_stack.push(SetFpsCommand(self, anim, anim.fps, fps))
+
+    def on_frame_size_changed(self):
+        size = (self.tile_width_spin.value(), self.tile_height_spin.value())
+        if size != self.frame_size:
+            self.undo_stack.push(SetFrameSizeCommand(self, self.frame_size, size))
 
     def get_current_animation(self) -> AnimationState | None:
         item = self.anim_list.currentItem()
@@ -302,52 +620,164 @@ class SpritesheetEditor(QWidget, EditorWidget):
     def add_animation_state(self):
         name, ok = QInputDialog.getText(self, "Add Animation", "Enter animation name:")
         if ok and name and name not in self.anim_states:
-            anim = AnimationState(name)
-            self.anim_states[name] = anim
-            self.anim_list.addItem(name)
-            self.frames_list.clear()
-            self.modified = True
+            self.undo_stack.push(AddStateCommand(self, AnimationState(name), self.anim_list.count()))
 
     def remove_animation_state(self):
-        row = self.anim_list.currentRow()
-        if row >= 0:
-            name = self.anim_list.item(row).text()
-            del self.anim_states[name]
-            self.anim_list.takeItem(row)
-            self.frames_list.clear()
-            self.modified = True
+        anim = self.get_current_animation()
+        if anim:
+            self.undo_stack.push(RemoveStateCommand(self, anim))
 
     def rename_animation_state(self):
-        item = self.anim_list.currentItem()
-        if not item:
+        anim = self.get_current_animation()
+        if not anim:
             return
-        old_name = item.text()
+        old_name = anim.name
         new_name, ok = QInputDialog.getText(self, "Rename Animation", "Enter new name:", text=old_name)
         if ok and new_name and new_name != old_name:
             if new_name in self.anim_states:
                 QMessageBox.warning(self, "Duplicate", f"Animation '{new_name}' already exists.")
                 return
-            anim = self.anim_states.pop(old_name)
-            anim.rename(new_name)
-            self.anim_states[new_name] = anim
-            item.setText(new_name)
-            self.modified = True
+            self.undo_stack.push(RenameStateCommand(self, anim, old_name, new_name))
 
     def add_frame(self):
         anim = self.get_current_animation()
         if anim:
-            pos = self.selection_rect.pos()
-            anim.add_frame(pos)
-            self.frames_list.addItem(f"Frame {len(anim.frames)}")
-            self.modified = True
+            self.undo_stack.push(AddFrameCommand(self, anim, len(anim.frames), self.selection_rect.pos()))
 
     def remove_frame(self):
         anim = self.get_current_animation()
         index = self.frames_list.currentRow()
         if anim and 0 <= index < len(anim.frames):
-            anim.remove_frame(index)
-            self.frames_list.takeItem(index)
-            self.modified = True
+            self.undo_stack.push(RemoveFrameCommand(self, anim, index))
+
+    # Edits go through these so undo and redo update the lists and the preview like the first time.
+    # The affected state is selected first, an undo always shows what it changed.
+    def state_row(self, anim):
+        items = self.anim_list.findItems(anim.name, Qt.MatchExactly)
+        return self.anim_list.row(items[0]) if items else -1
+
+    def show_state(self, anim, reload=False):
+        row = self.state_row(anim)
+        if row != self.anim_list.currentRow():
+            self.anim_list.setCurrentRow(row)
+        elif reload:
+            self.on_animation_changed()
+
+    def sort_states(self):
+        # Saved in list order
+        names = [self.anim_list.item(i).text() for i in range(self.anim_list.count())]
+        self.anim_states = {name: self.anim_states[name] for name in names}
+
+    def insert_state(self, anim, row):
+        self.anim_states[anim.name] = anim
+        self.anim_list.insertItem(row, anim.name)
+        self.sort_states()
+        self.show_state(anim)
+
+    def take_state(self, anim):
+        self.preview.remove_animation(anim)
+        del self.anim_states[anim.name]
+        self.anim_list.takeItem(self.state_row(anim))
+        self.on_animation_changed()
+
+    def set_state_name(self, anim, name):
+        item = self.anim_list.item(self.state_row(anim))
+        del self.anim_states[anim.name]
+        anim.rename(name)
+        self.anim_states[name] = anim
+        item.setText(name)
+        self.sort_states()
+        self.show_state(anim)
+
+    def set_state_fps(self, anim, fps):
+        anim.fps = fps
+        self.show_state(anim)
+        self.fps_spin.blockSignals(True)
+        self.fps_spin.setValue(fps)
+        self.fps_spin.blockSignals(False)
+        self.preview.set_fps(fps)
+
+    def set_frame_size(self, width, height):
+        self.frame_size = (width, height)
+        for spin, value in ((self.tile_width_spin, width), (self.tile_height_spin, height)):
+            spin.blockSignals(True)
+            spin.setValue(value)
+            spin.blockSignals(False)
+        self.update_selection_rect()
+
+    def relabel_frames(self, start):
+        for i in range(start, self.frames_list.count()):
+            self.frames_list.item(i).setText(f"Frame {i + 1}")
+
+    def set_frame(self, anim, index, pos):
+        anim.frames[index] = pos
+        self.show_state(anim)
+        self.preview.frame_changed(anim, index)
+        self.frames_list.setCurrentRow(index)
+        self.selection_rect.setPos(pos)
+
+    def insert_frame(self, anim, index, pos):
+        anim.frames.insert(index, pos)
+        self.show_state(anim)
+        self.preview.frame_inserted(anim, index)
+        self.frames_list.insertItem(index, "")
+        self.relabel_frames(index)
+        self.frames_list.setCurrentRow(index)
+
+    def delete_frame(self, anim, index):
+        anim.remove_frame(index)
+        self.show_state(anim)
+        self.preview.frame_removed(anim, index)
+        self.frames_list.takeItem(index)
+        self.relabel_frames(index)
+
+    def set_frames(self, anim, frames):
+        anim.frames = frames
+        self.preview.remove_animation(anim)
+        self.show_state(anim, reload=True)
+
+    def auto_slice(self):
+        image = self.canvas.image
+        if image.isNull():
+            QMessageBox.warning(self, "Auto Slice", "No image loaded.")
+            return
+
+        # Existing states are replaced, a new name creates one
+        current = self.anim_list.currentItem()
+        name, ok = QInputDialog.getItem(
+            self, "Auto Slice", "Fill animation:", list(self.anim_states),
+            self.anim_list.currentRow() if current else 0, True
+        )
+        if not ok or not name:
+            return
+
+        alpha = autoslice.alpha_channel(image)
+        w, h = self.tile_width_spin.value(), self.tile_height_spin.value()
+
+        if self.slice_mode_combo.currentData() == "grid":
+            frames = autoslice.grid_frames(alpha, w, h)
+        else:
+            regions = autoslice.opaque_regions(alpha)
+            # The sprite size is shared by the whole sheet, it only grows so every region fits
+            w = max([w] + [x1 - x0 for x0, _, x1, _ in regions])
+            h = max([h] + [y1 - y0 for _, y0, _, y1 in regions])
+            frames = autoslice.region_frames(regions, w, h)
+
+        if not frames:
+            QMessageBox.information(self, "Auto Slice", "No frames found.")
+            return
+
+        frames = [QPointF(x, y) for x, y in frames]
+        anim = self.anim_states.get(name)
+
+        self.undo_stack.beginMacro("Auto Slice")
+        if (w, h) != self.frame_size:
+            self.undo_stack.push(SetFrameSizeCommand(self, self.frame_size, (w, h)))
+        if anim is None:
+            anim = AnimationState(name, fps=self.fps_spin.value())
+            self.undo_stack.push(AddStateCommand(self, anim, self.anim_list.count()))
+        self.undo_stack.push(ReplaceFramesCommand(self, anim, frames))
+        self.undo_stack.endMacro()
 
     def select_frame(self, index):
         anim = self.get_current_animation()
@@ -355,9 +785,9 @@ class SpritesheetEditor(QWidget, EditorWidget):
             self.selection_rect.setPos(anim.frames[index])
 
     def update_coordinates(self, scene_pos: QPointF):
-        image_pos = self.pixmap_item.mapFromScene(scene_pos)
+        image_pos = self.canvas.mapFromScene(scene_pos)
         x, y = int(image_pos.x()), int(image_pos.y())
-        if 0 <= x < self.pixmap.width() and 0 <= y < self.pixmap.height():
+        if 0 <= x < self.canvas.width() and 0 <= y < self.canvas.height():
             rect_pos = self.selection_rect.pos()
             self.coord_label.setText(f"Mouse: ({x}, {y}) | Rect: ({rect_pos.x()}, {rect_pos.y()})")
         else:
@@ -389,26 +819,35 @@ class SpritesheetEditor(QWidget, EditorWidget):
     def is_modified(self) -> bool:
         return self.modified
 
+    def on_clean_changed(self, clean):
+        self.modified = not clean
+        self.modifiedChanged.emit(self.modified)
+
+    # The clean state is where document() was taken, edits made while saving stay modified
+    def set_saved(self, saved):
+        if saved:
+            self.undo_stack.setClean()
+        else:
+            self.undo_stack.resetClean()
+
     def load(self):
         if not os.path.exists(self.toml_path):
             return
 
-        with open(self.toml_path, "r") as f:
-            data = toml.load(f)
+        data = document_store().load(self.toml_path)
 
         rel_image_path = data.get("image_path", "")
         abs_image_path = os.path.join(self.project_path, "assets", rel_image_path)
         if os.path.exists(abs_image_path):
             self.image_path = abs_image_path
-            self.pixmap = QPixmap(self.image_path)
-            if not self.pixmap.isNull():
-                self.update_image_scene()
+            self.load_image_async(self.image_path)
 
         self.tile_width_spin.setValue(data.get("width", 16))
         self.tile_height_spin.setValue(data.get("height", 16))
         self.fps_spin.setValue(data.get("fps", 12))
 
         self.anim_states.clear()
+        self.preview.frame_cache.clear()
         self.anim_list.clear()
         self.frames_list.clear()
 
@@ -426,13 +865,12 @@ class SpritesheetEditor(QWidget, EditorWidget):
         if self.anim_list.count() > 0:
             self.anim_list.setCurrentRow(0)
 
-        self.modified = False
+        self.undo_stack.clear()
 
 
-    def save(self):
+    def document(self):
         if not self.image_path:
-            QMessageBox.warning(self, "Save Error", "No image loaded.")
-            return
+            raise ValueError("No image loaded.")
 
         rel_image_path = os.path.relpath(self.image_path, self.project_path + "/assets").replace("\\", "/")
 
@@ -451,8 +889,11 @@ class SpritesheetEditor(QWidget, EditorWidget):
                 "frames": frames
             }
 
-        with open(self.toml_path, "w") as f:
-            toml.dump(data, f)
+        return self.toml_path, data
 
-        self.modified = False
+    def save(self):
+        document = self.document()
+        if document:
+            save_document(*document)
+            self.set_saved(True)
 
@@ -0,0 +1,325 @@
+from PySide6.QtCore import *
+from PySide6.QtGui import *
+from PySide6.QtWidgets import *
+from editorwidget import EditorWidget, GraphicsView
+from tilemap import TilemapItem, TileLayer, Tileset, CHUNK_SIZE, DEFAULT_TILE_SIZE, MAX_MAP_SIZE
+from imageloader import ImageLoader, LoadingBar
+from documentsaver import save_document
+from documentstore import document_store
+import os
+
+
+class TilePicker(QWidget):
+    # The tileset at a fixed zoom, clicking a cell selects it as the brush
+    tile_selected = Signal(int)
+
+    def __init__(self, parent=None):
+        super().__init__(parent)
+        self.tileset = Tileset()
+        self.pixmap = QPixmap()
+        self.scale = 2
+        self.selected = 1
+
+    def set_tileset(self, tileset: Tileset):
+        self.tileset = tileset
+        self.pixmap = QPixmap.fromImage(tileset.image) if not tileset.image.isNull() else QPixmap()
+        self.setFixedSize(self.pixmap.size() * self.scale if not self.pixmap.isNull() else QSize(0, 0))
+        self.update()
+
+    def mousePressEvent(self, event: QMouseEvent):
+        if not self.tileset.count:
+            return
+        size = self.tileset.tile_size * self.scale
+        column, row = int(event.position().x()) // size, int(event.position().y()) // size
+        if column < self.tileset.columns:
+            tile = row * self.tileset.columns + column + 1
+            if tile <= self.tileset.count:
+                self.selected = tile
+                self.tile_selected.emit(tile)
+                self.update()
+
+    def paintEvent(self, event):
+        if self.pixmap.isNull():
+            return
+        painter = QPainter(self)
+        painter.drawPixmap(self.rect(), self.pixmap)
+        if self.tileset.count and self.selected <= self.tileset.count:
+            cell = self.tileset.cell(self.selected)
+            painter.setPen(QPen(QColor(255, 255, 0), 2))
+            painter.drawRect(QRect(cell.topLeft() * self.scale, cell.size() * self.scale))
+
+
+class StageEditor(QWidget, EditorWidget):
+    def __init__(self, toml_path, project_path):
+        super().__init__()
+        self.toml_path = toml_path
+        self.project_path = project_path
+        self.tileset_path = ""
+        self.modified = False
+        self._zoom = 1.0
+        # Keys this editor does not show (e.g. actors) are written back untouched
+        self.data = {}
+
+        self.setup_ui()
+        self.load()
+
+    def setup_ui(self):
+        main_splitter = QSplitter(Qt.Horizontal)
+        layout = QHBoxLayout(self)
+        layout.addWidget(main_splitter)
+
+        # --- Left Panel (Layers) ---
+        self.layer_list = QListWidget()
+        self.layer_list.currentRowChanged.connect(self.on_layer_selected)
+        self.layer_list.itemChanged.connect(self.on_layer_item_changed)
+
+        self.add_layer_btn = QPushButton("Add Layer")
+        self.remove_layer_btn = QPushButton("Remove Layer")
+        self.add_layer_btn.clicked.connect(self.add_layer)
+        self.remove_layer_btn.clicked.connect(self.remove_layer)
+
+        left_layout = QVBoxLayout()
+        left_layout.addWidget(QLabel("Layers:"))
+        left_layout.addWidget(self.add_layer_btn)
+        left_layout.addWidget(self.remove_layer_btn)
+        left_layout.addWidget(self.layer_list)
+
+        left_widget = QWidget()
+        left_widget.setLayout(left_layout)
+        left_widget.setMinimumWidth(120)
+
+        # --- Center Panel (Map) ---
+        self.view = GraphicsView()
+        self.view.setRenderHint(QPainter.Antialiasing, False)
+        self.view.setRenderHint(QPainter.SmoothPixmapTransform, False)
+        self.view.setTransformationAnchor(QGraphicsView.AnchorUnderMouse)
+        # Presses on the map paint, presses around it pan
+        self.view.setDragMode(QGraphicsView.ScrollHandDrag)
+        self.view.setViewportUpdateMode(QGraphicsView.MinimalViewportUpdate)
+        self.view.cursorMoved.connect(self.update_coordinates)
+
+        self.scene = QGraphicsScene()
+        self.scene.setItemIndexMethod(QGraphicsScene.NoIndex)
+        self.view.setScene(self.scene)
+
+        self.tilemap = TilemapItem()
+        self.tilemap.stroked.connect(self.mark_modified)
+        self.scene.addItem(self.tilemap)
+
+        self.image_loader = ImageLoader(self)
+        self.image_loader.loaded.connect(self.on_tileset_loaded)
+        self.image_loader.failed.connect(self.on_tileset_failed)
+        self.loading_bar = LoadingBar()
+
+        self.coord_label = QLabel("Mouse: ")
+
+        center_layout = QVBoxLayout()
+        center_layout.addWidget(self.loading_bar)
+        center_layout.addWidget(self.view)
+        center_layout.addWidget(self.coord_label)
+
+        center_widget = QWidget()
+        center_widget.setLayout(center_layout)
+
+        # --- Right Panel (Settings + Tiles) ---
+        self.load_tileset_btn = QPushButton("Load Tileset")
+        self.load_tileset_btn.clicked.connect(self.load_tileset)
+
+        self.tile_size_spin = QSpinBox()
+        self.tile_size_spin.setRange(1, 256)
+        self.tile_size_spin.setValue(DEFAULT_TILE_SIZE)
+        self.tile_size_spin.setKeyboardTracking(False)
+        self.tile_size_spin.valueChanged.connect(self.on_tile_size_changed)
+
+        self.width_spin = QSpinBox()
+        self.height_spin = QSpinBox()
+        for spin in (self.width_spin, self.height_spin):
+            spin.setRange(1, MAX_MAP_SIZE)
+            spin.setValue(CHUNK_SIZE)
+            spin.setKeyboardTracking(False)
+            spin.valueChanged.connect(self.on_map_size_changed)
+
+        self.tile_picker = TilePicker()
+        self.tile_picker.tile_selected.connect(self.on_tile_selected)
+        picker_scroll = QScrollArea()
+        picker_scroll.setWidget(self.tile_picker)
+
+        right_layout = QVBoxLayout()
+        right_layout.addWidget(self.load_tileset_btn)
+        right_layout.addWidget(QLabel("Tile Size:"))
+        right_layout.addWidget(self.tile_size_spin)
+        right_layout.addSpacing(10)
+        right_layout.addWidget(QLabel("Map Width (tiles):"))
+        right_layout.addWidget(self.width_spin)
+        right_layout.addWidget(QLabel("Map Height (tiles):"))
+        right_layout.addWidget(self.height_spin)
+        right_layout.addSpacing(10)
+        right_layout.addWidget(QLabel("Tiles:"))
+        right_layout.addWidget(picker_scroll, 1)
+
+        right_widget = QWidget()
+        right_widget.setLayout(right_layout)
+        right_widget.setMinimumWidth(160)
+
+        main_splitter.addWidget(left_widget)
+        main_splitter.addWidget(center_widget)
+        main_splitter.addWidget(right_widget)
+        main_splitter.setStretchFactor(1, 1)
+        main_splitter.setSizes([150, 800, 200])
+
+    def mark_modified(self):
+        self.modified = True
+
+    # --- Tileset ---
+    def load_tileset(self):
+        dialog = QFileDialog(self, "Select Tileset Image", self.project_path + "/assets")
+        dialog.setNameFilter("Images (*.png *.jpg *.bmp *.gif)")
+        dialog.setFileMode(QFileDialog.ExistingFile)
+
+        if dialog.exec():
+            selected = dialog.selectedFiles()[0]
+            if selected.startswith(self.project_path + "/assets"):
+                self.tileset_path = selected
+                self.load_tileset_async(selected)
+                self.modified = True
+            else:
+                QMessageBox.warning(self, "Invalid Selection", "Please select an image from within the 'assets' directory.")
+
+    def load_tileset_async(self, path):
+        self.loading_bar.start(path)
+        self.image_loader.load(path)
+
+    def on_tileset_loaded(self, image: QImage):
+        self.loading_bar.hide()
+        self.set_tileset(Tileset(image, self.tile_size_spin.value()))
+
+    def on_tileset_failed(self, error):
+        self.loading_bar.hide()
+        QMessageBox.warning(self, "Error", f"Failed to load {os.path.basename(self.tileset_path)}.\n{error}")
+
+    def set_tileset(self, tileset):
+        self.tilemap.set_tileset(tileset)
+        self.tile_picker.set_tileset(tileset)
+
+    def on_tile_size_changed(self, size):
+        self.set_tileset(Tileset(self.tilemap.tileset.image, size))
+        self.modified = True
+
+    def on_tile_selected(self, tile):
+        self.tilemap.brush = tile
+
+    def on_map_size_changed(self):
+        self.tilemap.set_map_size(self.width_spin.value(), self.height_spin.value())
+        self.modified = True
+
+    def close_editor(self):
+        self.image_loader.cancel()
+
+    # --- Layers ---
+    def add_layer_item(self, layer):
+        item = QListWidgetItem(layer.name)
+        item.setFlags(item.flags() | Qt.ItemIsEditable | Qt.ItemIsUserCheckable)
+        item.setCheckState(Qt.Checked if layer.visible else Qt.Unchecked)
+        self.layer_list.blockSignals(True)
+        self.layer_list.addItem(item)
+        self.layer_list.blockSignals(False)
+
+    def add_layer(self):
+        layer = TileLayer(f"layer {len(self.tilemap.layers) + 1}")
+        self.tilemap.layers.append(layer)
+        self.add_layer_item(layer)
+        self.layer_list.setCurrentRow(len(self.tilemap.layers) - 1)
+        self.modified = True
+
+    def remove_layer(self):
+        row = self.layer_list.currentRow()
+        if row < 0:
+            return
+        layer = self.tilemap.layers.pop(row)
+        self.layer_list.takeItem(row)
+        self.on_layer_selected(self.layer_list.currentRow())
+        self.tilemap.update()
+        if layer.chunks:
+            self.modified = True
+
+    def on_layer_selected(self, row):
+        self.tilemap.current_layer = self.tilemap.layers[row] if 0 <= row < len(self.tilemap.layers) else None
+
+    def on_layer_item_changed(self, item):
+        layer = self.tilemap.layers[self.layer_list.row(item)]
+        visible = item.checkState() == Qt.Checked
+        if layer.name != item.text() or layer.visible != visible:
+            layer.name = item.text()
+            layer.visible = visible
+            self.tilemap.update()
+            self.modified = True
+
+    # --- View ---
+    def update_coordinates(self, scene_pos: QPointF):
+        x, y = self.tilemap.cell_at(self.tilemap.mapFromScene(scene_pos))
+        if 0 <= x < self.tilemap.map_width and 0 <= y < self.tilemap.map_height:
+            layer = self.tilemap.current_layer
+            tile = layer.get(x, y) if layer else 0
+            self.coord_label.setText(f"Tile: ({x}, {y}) | Chunk: ({x // CHUNK_SIZE}, {y // CHUNK_SIZE}) | Id: {tile}")
+        else:
+            self.coord_label.setText("Mouse: Out of bounds")
+
+    def wheelEvent(self, event: QWheelEvent):
+        self._zoom *= 1.25 if event.angleDelta().y() > 0 else 0.8
+        self.view.resetTransform()
+        self.view.scale(self._zoom, self._zoom)
+
+    # --- Document ---
+    def is_modified(self) -> bool:
+        return self.modified
+
+    def load(self):
+        if not os.path.exists(self.toml_path):
+            return
+
+        data = self.data = document_store().load(self.toml_path)
+
+        self.tile_size_spin.blockSignals(True)
+        self.tile_size_spin.setValue(data.get("tile_size", DEFAULT_TILE_SIZE))
+        self.tile_size_spin.blockSignals(False)
+        for spin, key in ((self.width_spin, "width"), (self.height_spin, "height")):
+            spin.blockSignals(True)
+            spin.setValue(data.get(key, CHUNK_SIZE))
+            spin.blockSignals(False)
+
+        self.tilemap.set_map_size(self.width_spin.value(), self.height_spin.value())
+        self.tilemap.set_layers([TileLayer.from_toml(layer) for layer in data.get("layers", [])])
+        self.set_tileset(Tileset(tile_size=self.tile_size_spin.value()))
+
+        self.layer_list.clear()
+        for layer in self.tilemap.layers:
+            self.add_layer_item(layer)
+        if self.tilemap.layers:
+            self.layer_list.setCurrentRow(0)
+
+        self.tileset_path = ""
+        rel_tileset_path = data.get("tileset", "")
+        abs_tileset_path = os.path.join(self.project_path, "assets", rel_tileset_path)
+        if rel_tileset_path and os.path.exists(abs_tileset_path):
+            self.tileset_path = abs_tileset_path
+            self.load_tileset_async(abs_tileset_path)
+
+        self.modified = False
+
+    def document(self):
+        # Only chunks edited since the last save are encoded again
+        width, height = self.width_spin.value(), self.height_spin.value()
+        data = dict(self.data)
+        data.update({
+            "width": width,
+            "height": height,
+            "tile_size": self.tile_size_spin.value(),
+            "layers": [layer.to_toml(width, height) for layer in self.tilemap.layers],
+        })
+        if self.tileset_path:
+            data["tileset"] = os.path.relpath(self.tileset_path, self.project_path + "/assets").replace("\\", "/")
+        return self.toml_path, data
+
+    def save(self):
+        save_document(*self.document())
+        self.modified = False
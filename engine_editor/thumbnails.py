@@ -0,0 +1,160 @@
+import os
+import hashlib
+import threading
+from collections import OrderedDict
+from PySide6.QtCore import *
+from PySide6.QtGui import *
+
+import exporter
+
+THUMBNAIL_SIZE = 64
+THUMBNAIL_CACHE_BYTES = 32 * 1024 * 1024
+# Decoded thumbnails kept by the tree, a few screens worth
+MEMORY_CACHE_ENTRIES = 2048
+
+
+def thumbnail_key(path, mtime_ns, size):
+    return hashlib.sha1(f"{path}\0{mtime_ns}\0{size}".encode("utf-8")).hexdigest()
+
+
+def scaled_size(size, max_size):
+    if size.width() <= max_size and size.height() <= max_size:
+        return size
+    return size.scaled(max_size, max_size, Qt.KeepAspectRatio)
+
+
+class ThumbnailDiskCache:
+    # PNG files under .arpg_cache/thumbnails, the file mtime is the last use so the oldest are evicted first
+    def __init__(self, project_path, max_bytes=THUMBNAIL_CACHE_BYTES):
+        self.root = os.path.join(project_path, exporter.CACHE_DIR_NAME, "thumbnails")
+        self.max_bytes = max_bytes
+        self.lock = threading.Lock()
+        self.total = None
+        os.makedirs(self.root, exist_ok=True)
+
+    def file_path(self, key):
+        return os.path.join(self.root, key + ".png")
+
+    def load(self, key):
+        path = self.file_path(key)
+        image = QImage(path)
+        if image.isNull():
+            return None
+
+        try:
+            os.utime(path)
+        except OSError:
+            pass
+        return image
+
+    def store(self, key, image):
+        path = self.file_path(key)
+        temp_path = path + f".{threading.get_ident()}.tmp"
+        if not image.save(temp_path, "PNG"):
+            return
+
+        size = os.path.getsize(temp_path)
+        os.replace(temp_path, path)
+
+        with self.lock:
+            if self.total is None:
+                self.total = sum(entry.stat().st_size for entry in os.scandir(self.root) if entry.name.endswith(".png"))
+            else:
+                self.total += size
+
+            if self.total > self.max_bytes:
+                self.evict()
+
+    def evict(self):
+        # Trims down to 90% of the cap so eviction does not run on every store
+        entries = []
+        for entry in os.scandir(self.root):
+            if entry.name.endswith(".png"):
+                st = entry.stat()
+                entries.append((st.st_mtime_ns, st.st_size, entry.path))
+        entries.sort()
+
+        self.total = sum(size for _, size, _ in entries)
+        for _, size, path in entries:
+            if self.total <= self.max_bytes * 0.9:
+                break
+            try:
+                os.remove(path)
+                self.total -= size
+            except OSError:
+                pass
+
+
+class ThumbnailTask(QRunnable):
+    def __init__(self, loader, key, path):
+        super().__init__()
+        self.loader = loader
+        self.key = key
+        self.path = path
+
+    def run(self):
+        image = self.loader.disk_cache.load(self.key)
+        if image is None:
+            # Decoders that support it (jpeg) scale while decoding, the others at least never hand back the full image
+            reader = QImageReader(self.path)
+            size = reader.size()
+            if size.isValid():
+                reader.setScaledSize(scaled_size(size, THUMBNAIL_SIZE))
+            image = reader.read()
+
+            if image.isNull():
+                image = QImage()
+            else:
+                self.loader.disk_cache.store(self.key, image)
+
+        self.loader.loaded.emit(self.key, image)
+
+
+class ThumbnailLoader(QObject):
+    # Emitted with the relative path once its thumbnail is ready
+    ready = Signal(str)
+    loaded = Signal(str, QImage)
+
+    def __init__(self, project_path, parent=None):
+        super().__init__(parent)
+        self.project_path = project_path
+        self.disk_cache = ThumbnailDiskCache(project_path)
+        self.icons = OrderedDict()
+        self.requests = {}
+        self.priority = 0
+
+        self.pool = QThreadPool(self)
+        self.loaded.connect(self.on_loaded)
+
+    def icon(self, path, mtime_ns, size):
+        # Returns the cached icon or None and queues the thumbnail, never decodes on the calling thread
+        key = thumbnail_key(path, mtime_ns, size)
+        icon = self.icons.get(key)
+        if icon is not None:
+            self.icons.move_to_end(key)
+            return icon
+
+        self.requests.setdefault(key, set()).add(path)
+        if len(self.requests[key]) == 1:
+            # The latest request runs first, those are the rows on screen
+            self.priority += 1
+            self.pool.start(ThumbnailTask(self, key, os.path.join(self.project_path, path)), self.priority)
+        return None
+
+    def on_loaded(self, key, image):
+        paths = self.requests.pop(key, ())
+        if image.isNull():
+            self.icons[key] = QIcon()
+        else:
+            self.icons[key] = QIcon(QPixmap.fromImage(image))
+
+        while len(self.icons) > MEMORY_CACHE_ENTRIES:
+            self.icons.popitem(last=False)
+
+        for path in paths:
+            self.ready.emit(path)
+
+    def close(self):
+        self.pool.clear()
+        self.pool.waitForDone()
+        self.requests.clear()
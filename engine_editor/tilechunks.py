@@ -0,0 +1,28 @@
+import zlib
+import base64
+import numpy as np
+
+# Stage layers as saved by the editor, shared by the editor (tilemap.py) and the exporter (tilemapcompiler.py)
+# without pulling Qt into the export. Layers are stored as CHUNK_SIZE x CHUNK_SIZE uint32 arrays, only for
+# chunks holding a tile. Tile 0 is empty, tile n is cell n - 1 of the tileset in reading order.
+CHUNK_SIZE = 64
+# Matches TILE_SIZE in engine_core/global.h
+DEFAULT_TILE_SIZE = 8
+
+
+def encode_chunk(chunk):
+    return base64.b64encode(zlib.compress(chunk.astype("<u4").tobytes(), 6)).decode("ascii")
+
+
+def decode_chunk(text):
+    data = zlib.decompress(base64.b64decode(text))
+    return np.frombuffer(data, dtype="<u4").astype(np.uint32).reshape(CHUNK_SIZE, CHUNK_SIZE)
+
+
+def chunk_name(key):
+    return f"{key[0]},{key[1]}"
+
+
+def parse_chunk_name(name):
+    cx, _, cy = name.partition(",")
+    return int(cx), int(cy)
@@ -0,0 +1,346 @@
+import math
+import time
+import itertools
+import numpy as np
+from PySide6.QtCore import *
+from PySide6.QtGui import *
+from PySide6.QtWidgets import *
+
+from canvas import TileCache, mip_level
+from tilechunks import CHUNK_SIZE, DEFAULT_TILE_SIZE, encode_chunk, decode_chunk, chunk_name, parse_chunk_name
+
+MAX_MAP_SIZE = 65536
+CHUNK_CACHE_BYTES = 192 * 1024 * 1024
+# Zoomed out, neighbouring chunks share a pixmap of at least this size, a paint draws a few large pixmaps
+# instead of thousands of tiny ones
+MIN_BLOCK_PIXELS = 128
+# Chunk pixmaps built per paint, the rest are built on the next passes so zooming out never stalls
+BUILD_BUDGET = 0.012
+
+layer_ids = itertools.count(1)
+tileset_ids = itertools.count(1)
+
+
+def image_array(image: QImage):
+    # (height, width, 4) premultiplied RGBA copy, premultiplied pixels can be averaged directly
+    image = image.convertToFormat(QImage.Format_RGBA8888_Premultiplied)
+    data = np.frombuffer(image.constBits(), dtype=np.uint8, count=image.sizeInBytes())
+    return data.reshape(image.height(), image.bytesPerLine())[:, : image.width() * 4].reshape(image.height(), image.width(), 4).copy()
+
+
+def array_image(pixels):
+    pixels = np.ascontiguousarray(pixels)
+    height, width = pixels.shape[:2]
+    return QImage(pixels.data, width, height, width * 4, QImage.Format_RGBA8888_Premultiplied).copy()
+
+
+class TileLayer:
+    def __init__(self, name, visible=True):
+        self.uid = next(layer_ids)
+        self.name = name
+        self.visible = visible
+        self.chunks: dict[tuple[int, int], np.ndarray] = {}
+        # Encoded chunk text reused by saves until the chunk is edited
+        self.encoded: dict[tuple[int, int], str] = {}
+
+    def get(self, x, y):
+        chunk = self.chunks.get((x // CHUNK_SIZE, y // CHUNK_SIZE))
+        return int(chunk[y % CHUNK_SIZE, x % CHUNK_SIZE]) if chunk is not None else 0
+
+    def set(self, x, y, tile):
+        # Returns the key of the chunk when the tile changed, None otherwise
+        key = (x // CHUNK_SIZE, y // CHUNK_SIZE)
+        chunk = self.chunks.get(key)
+        if chunk is None:
+            if not tile:
+                return None
+            chunk = self.chunks[key] = np.zeros((CHUNK_SIZE, CHUNK_SIZE), dtype=np.uint32)
+
+        if chunk[y % CHUNK_SIZE, x % CHUNK_SIZE] == tile:
+            return None
+        chunk[y % CHUNK_SIZE, x % CHUNK_SIZE] = tile
+        self.encoded.pop(key, None)
+        return key
+
+    def prune(self, keys):
+        for key in keys:
+            chunk = self.chunks.get(key)
+            if chunk is not None and not chunk.any():
+                del self.chunks[key]
+                self.encoded.pop(key, None)
+
+    def tile_count(self):
+        return sum(int(np.count_nonzero(chunk)) for chunk in self.chunks.values())
+
+    def to_toml(self, width=MAX_MAP_SIZE, height=MAX_MAP_SIZE):
+        # Only the tiles inside width x height are written, the layer itself keeps the rest. Chunks on the edge
+        # are cropped on a copy and encoded every time, the ones inside reuse their encoded text.
+        chunks = {}
+        for key in sorted(self.chunks, key=lambda key: (key[1], key[0])):
+            x0, y0 = key[0] * CHUNK_SIZE, key[1] * CHUNK_SIZE
+            if x0 >= width or y0 >= height:
+                continue
+
+            if x0 + CHUNK_SIZE <= width and y0 + CHUNK_SIZE <= height:
+                text = self.encoded.get(key)
+                if text is None:
+                    text = self.encoded[key] = encode_chunk(self.chunks[key])
+            else:
+                chunk = self.chunks[key].copy()
+                chunk[height - y0 :, :] = 0
+                chunk[:, width - x0 :] = 0
+                if not chunk.any():
+                    continue
+                text = encode_chunk(chunk)
+            chunks[chunk_name(key)] = text
+        return {"name": self.name, "visible": self.visible, "chunks": chunks}
+
+    @classmethod
+    def from_toml(cls, data):
+        layer = cls(data.get("name", "layer"), data.get("visible", True))
+        for name, text in data.get("chunks", {}).items():
+            key = parse_chunk_name(name)
+            layer.chunks[key] = decode_chunk(text)
+            layer.encoded[key] = text
+        return layer
+
+
+class Tileset:
+    # The tileset image cut into tile_size cells, with a downscaled copy of every cell per mip level
+    def __init__(self, image=None, tile_size=DEFAULT_TILE_SIZE):
+        if image is None:
+            image = QImage()
+        self.uid = next(tileset_ids)
+        self.image = image
+        self.tile_size = tile_size
+        self.columns = image.width() // tile_size if not image.isNull() else 0
+        rows = image.height() // tile_size if not image.isNull() else 0
+        self.count = self.columns * rows
+
+        tiles = np.zeros((self.count + 1, tile_size, tile_size, 4), dtype=np.uint8)
+        if self.count:
+            pixels = image_array(image)[: rows * tile_size, : self.columns * tile_size]
+            cells = pixels.reshape(rows, tile_size, self.columns, tile_size, 4).transpose(0, 2, 1, 3, 4)
+            tiles[1:] = cells.reshape(-1, tile_size, tile_size, 4)
+        self.levels = {0: tiles}
+
+    def tiles(self, level):
+        # (count + 1, size, size, 4) cells at 1/2^level scale, at least one pixel each
+        tiles = self.levels.get(level)
+        if tiles is None:
+            full = self.levels[0]
+            size = max(1, self.tile_size >> level)
+            if self.tile_size % size == 0:
+                step = self.tile_size // size
+                pooled = full.reshape(len(full), size, step, size, step, 4).mean(axis=(2, 4), dtype=np.float32)
+                tiles = np.round(pooled).astype(np.uint8)
+            else:
+                index = np.arange(size) * self.tile_size // size
+                tiles = full[:, index][:, :, index]
+            self.levels[level] = tiles
+        return tiles
+
+    def cell(self, tile):
+        # Rect of a tile in the tileset image
+        column, row = (tile - 1) % self.columns, (tile - 1) // self.columns
+        return QRect(column * self.tile_size, row * self.tile_size, self.tile_size, self.tile_size)
+
+    def render(self, ids, level):
+        # ids already sampled to one per drawn tile. Tiles past the tileset, e.g. after switching to a
+        # smaller one, draw as empty.
+        tiles = self.tiles(level)
+        ids = np.where(ids < len(tiles), ids, 0)
+
+        size = tiles.shape[1]
+        rows, columns = ids.shape
+        pixels = tiles[ids].transpose(0, 2, 1, 3, 4).reshape(rows * size, columns * size, 4)
+        return array_image(pixels)
+
+
+class TilemapItem(QGraphicsObject):
+    # Draws the visible chunks of every visible layer from cached pixmaps at the mip level of the zoom.
+    # Brush strokes only drop the pixmaps of the chunks (or blocks holding them) they touched.
+    stroked = Signal()
+
+    def __init__(self, parent=None):
+        super().__init__(parent)
+        self.setFlag(QGraphicsItem.ItemUsesExtendedStyleOption, True)
+        self.setAcceptedMouseButtons(Qt.LeftButton | Qt.RightButton)
+
+        self.map_width = 0
+        self.map_height = 0
+        self.tileset = Tileset()
+        self.layers: list[TileLayer] = []
+        self.current_layer: TileLayer | None = None
+        self.brush = 1
+
+        self.cache = TileCache(CHUNK_CACHE_BYTES)
+        self.max_level = 0
+        self.stroke_tile = 0
+        self.stroke_chunks = set()
+        self.last_cell = None
+        self.repaint_pending = False
+
+    def tile_size(self):
+        return self.tileset.tile_size
+
+    def set_map_size(self, width, height):
+        # Tiles outside a shrunk map are kept but not saved, growing it back before saving shows them again
+        self.prepareGeometryChange()
+        self.map_width, self.map_height = width, height
+        self.update()
+
+    def set_tileset(self, tileset: Tileset):
+        # Cached pixmaps are keyed by tileset, the old ones age out of the cache
+        self.prepareGeometryChange()
+        self.tileset = tileset
+        self.update_levels()
+        self.update()
+
+    def set_layers(self, layers):
+        self.layers = layers
+        self.current_layer = layers[0] if layers else None
+        self.update()
+
+    def update_levels(self):
+        chunk_pixels = CHUNK_SIZE * self.tile_size()
+        self.max_level = max(0, int(math.log2(chunk_pixels)))
+
+    def boundingRect(self):
+        return QRectF(0, 0, self.map_width * self.tile_size(), self.map_height * self.tile_size())
+
+    def chunk_rect(self, key):
+        span = CHUNK_SIZE * self.tile_size()
+        return QRectF(key[0] * span, key[1] * span, span, span)
+
+    def block_shift(self, level):
+        # A block is 2^shift x 2^shift chunks drawn as one pixmap
+        shift = 0
+        while shift < level and (CHUNK_SIZE * self.tile_size() << shift) >> level < MIN_BLOCK_PIXELS:
+            shift += 1
+        return shift
+
+    def invalidate(self, layer, key):
+        for level in range(self.max_level + 1):
+            shift = self.block_shift(level)
+            self.cache.discard((self.tileset.uid, layer.uid, level, key[0] >> shift, key[1] >> shift))
+        self.update(self.chunk_rect(key).intersected(self.boundingRect()))
+
+    def render_block(self, layer, block, level, shift):
+        # Every chunk contributes one id per drawn tile, a block is sampled chunk by chunk and never
+        # assembled at full resolution
+        step = max(1, (1 << level) // self.tile_size())
+        side = len(range(0, CHUNK_SIZE, step))
+        count = 1 << shift
+        ids = np.zeros((count * side, count * side), dtype=np.uint32)
+
+        if count * count < len(layer.chunks):
+            keys = [(block[0] * count + x, block[1] * count + y) for y in range(count) for x in range(count)]
+        else:
+            keys = [key for key in layer.chunks if (key[0] >> shift, key[1] >> shift) == block]
+
+        for key in keys:
+            chunk = layer.chunks.get(key)
+            if chunk is not None:
+                x, y = (key[0] - block[0] * count) * side, (key[1] - block[1] * count) * side
+                ids[y : y + side, x : x + side] = chunk[::step, ::step]
+        return self.tileset.render(ids, level)
+
+    def pixmap(self, layer, block, level, shift, build):
+        cache_key = (self.tileset.uid, layer.uid, level) + block
+        pixmap = self.cache.get(cache_key)
+        if pixmap is None and build:
+            pixmap = self.cache.put(cache_key, self.render_block(layer, block, level, shift))
+        return pixmap
+
+    def paint(self, painter: QPainter, option: QStyleOptionGraphicsItem, widget=None):
+        bounds = self.boundingRect()
+        exposed = option.exposedRect.intersected(bounds)
+        if exposed.isEmpty():
+            return
+
+        painter.fillRect(exposed, QColor(40, 40, 40))
+        level = mip_level(option.levelOfDetailFromTransform(painter.worldTransform()), self.max_level)
+        shift = self.block_shift(level)
+        span = CHUNK_SIZE * self.tile_size() << shift
+        x_range = range(int(exposed.left()) // span, math.ceil(exposed.right() / span))
+        y_range = range(int(exposed.top()) // span, math.ceil(exposed.bottom() / span))
+
+        # Tiles past the map edge stay in their chunk, clipping hides them
+        painter.setClipRect(bounds)
+        deadline = time.perf_counter() + BUILD_BUDGET
+        incomplete = False
+        for layer in self.layers:
+            if not layer.visible or not layer.chunks:
+                continue
+            blocks = layer.chunks if shift == 0 else {(cx >> shift, cy >> shift) for cx, cy in layer.chunks}
+            for by in y_range:
+                for bx in x_range:
+                    if (bx, by) not in blocks:
+                        continue
+                    pixmap = self.pixmap(layer, (bx, by), level, shift, time.perf_counter() < deadline)
+                    if pixmap is None:
+                        incomplete = True
+                        continue
+                    painter.drawPixmap(QRectF(bx * span, by * span, span, span), pixmap, QRectF(pixmap.rect()))
+
+        if incomplete and not self.repaint_pending:
+            self.repaint_pending = True
+            QTimer.singleShot(0, self.finish_repaint)
+
+    def finish_repaint(self):
+        self.repaint_pending = False
+        self.update()
+
+    # --- Brush, left paints the selected tile and right erases ---
+    def cell_at(self, pos: QPointF):
+        size = self.tile_size()
+        return int(pos.x() // size), int(pos.y() // size)
+
+    def paint_cell(self, x, y):
+        if 0 <= x < self.map_width and 0 <= y < self.map_height:
+            key = self.current_layer.set(x, y, self.stroke_tile)
+            if key is not None:
+                self.stroke_chunks.add(key)
+                return key
+        return None
+
+    def paint_line(self, start, end):
+        # Every cell between two mouse events, fast strokes leave no gaps
+        (x0, y0), (x1, y1) = start, end
+        steps = max(abs(x1 - x0), abs(y1 - y0))
+        touched = set()
+        for i in range(steps + 1):
+            t = i / steps if steps else 0
+            key = self.paint_cell(x0 + round((x1 - x0) * t), y0 + round((y1 - y0) * t))
+            if key is not None:
+                touched.add(key)
+        for key in touched:
+            self.invalidate(self.current_layer, key)
+
+    def mousePressEvent(self, event: QGraphicsSceneMouseEvent):
+        if not self.current_layer or event.button() not in (Qt.LeftButton, Qt.RightButton):
+            event.ignore()
+            return
+
+        self.stroke_tile = self.brush if event.button() == Qt.LeftButton else 0
+        self.stroke_chunks = set()
+        self.last_cell = self.cell_at(event.pos())
+        self.paint_line(self.last_cell, self.last_cell)
+
+    def mouseMoveEvent(self, event: QGraphicsSceneMouseEvent):
+        if self.last_cell is None:
+            return
+        cell = self.cell_at(event.pos())
+        if cell != self.last_cell:
+            self.paint_line(self.last_cell, cell)
+            self.last_cell = cell
+
+    def mouseReleaseEvent(self, event: QGraphicsSceneMouseEvent):
+        if self.last_cell is None:
+            return
+        self.last_cell = None
+        # Chunks erased down to nothing are dropped, the layer stays sparse
+        self.current_layer.prune(self.stroke_chunks)
+        if self.stroke_chunks:
+            self.stroked.emit()
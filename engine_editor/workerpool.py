@@ -0,0 +1,8 @@
+import multiprocessing
+from concurrent.futures import ProcessPoolExecutor
+
+
+def worker_pool(jobs=None):
+    # Workers are spawned, not forked: the editor exports from a QThread and forking a process with running
+    # threads copies their held locks into the children, which can deadlock
+    return ProcessPoolExecutor(max_workers=jobs, mp_context=multiprocessing.get_context("spawn"))
@@ -0,0 +1,24 @@
+import os
+import sys
+
+import pytest
+
+# The editor modules import each other by bare name, like when main.py runs from engine_editor/
+sys.path.insert(0, os.path.join(os.path.dirname(os.path.dirname(os.path.abspath(__file__))), "engine_editor"))
+os.environ.setdefault("QT_QPA_PLATFORM", "offscreen")
+
+
+@pytest.fixture
+def make_project(tmp_path):
+    # Writes files (relative path -> str or bytes) into a new project folder and returns its path
+    def make(files, project_toml='name = "test"\n'):
+        root = tmp_path / "project"
+        for path, data in {"project.toml": project_toml, **files}.items():
+            target = root / path
+            target.parent.mkdir(parents=True, exist_ok=True)
+            if isinstance(data, str):
+                data = data.encode("utf-8")
+            target.write_bytes(data)
+        return str(root)
+
+    return make
@@ -0,0 +1,97 @@
+import numpy as np
+import pytest
+from PySide6.QtGui import QColor, QImage
+
+import autoslice
+
+
+def brute_force_regions(alpha, threshold=0):
+    # Flood fill over 8 neighbours, one pixel at a time
+    mask = alpha > threshold
+    seen = np.zeros_like(mask)
+    boxes = []
+    for y, x in zip(*np.nonzero(mask)):
+        if seen[y, x]:
+            continue
+        seen[y, x] = True
+        stack = [(y, x)]
+        x0, y0, x1, y1 = x, y, x + 1, y + 1
+        while stack:
+            cy, cx = stack.pop()
+            x0, y0, x1, y1 = min(x0, cx), min(y0, cy), max(x1, cx + 1), max(y1, cy + 1)
+            for ny in range(max(0, cy - 1), min(mask.shape[0], cy + 2)):
+                for nx in range(max(0, cx - 1), min(mask.shape[1], cx + 2)):
+                    if mask[ny, nx] and not seen[ny, nx]:
+                        seen[ny, nx] = True
+                        stack.append((ny, nx))
+        boxes.append([int(x0), int(y0), int(x1), int(y1)])
+    return boxes
+
+
+@pytest.mark.parametrize("seed", range(20))
+@pytest.mark.parametrize("density", [0.05, 0.3, 0.6])
+def test_regions_match_brute_force_labeling(seed, density):
+    rng = np.random.default_rng(seed)
+    height, width = rng.integers(1, 40, size=2)
+    alpha = np.where(rng.random((height, width)) < density, rng.integers(1, 256, (height, width)), 0).astype(np.uint8)
+
+    regions = autoslice.opaque_regions(alpha)
+
+    assert sorted(regions) == sorted(brute_force_regions(alpha))
+
+
+def test_threshold_drops_faint_pixels():
+    alpha = np.zeros((8, 8), dtype=np.uint8)
+    alpha[1:3, 1:3] = 255
+    alpha[3, 3] = 10
+    alpha[3:5, 4:6] = 255
+
+    assert autoslice.opaque_regions(alpha) == [[1, 1, 6, 5]]
+    assert autoslice.opaque_regions(alpha, threshold=10) == [[1, 1, 3, 3], [4, 3, 6, 5]]
+
+
+def test_diagonal_pixels_connect():
+    alpha = np.eye(5, dtype=np.uint8) * 255
+
+    assert autoslice.opaque_regions(alpha) == [[0, 0, 5, 5]]
+
+
+def test_regions_come_in_reading_order():
+    alpha = np.zeros((20, 30), dtype=np.uint8)
+    alpha[2:8, 20:25] = 255
+    alpha[4:6, 2:6] = 255
+    alpha[12:18, 10:14] = 255
+    alpha[14:16, 1:3] = 255
+
+    assert autoslice.opaque_regions(alpha) == [[2, 4, 6, 6], [20, 2, 25, 8], [1, 14, 3, 16], [10, 12, 14, 18]]
+
+
+def test_empty_image_has_no_regions():
+    assert autoslice.opaque_regions(np.zeros((4, 4), dtype=np.uint8)) == []
+
+
+def test_grid_frames_skip_empty_cells():
+    alpha = np.zeros((10, 13), dtype=np.uint8)
+    alpha[0, 5] = 1
+    alpha[6, 1] = 1
+
+    assert autoslice.grid_frames(alpha, 4, 5) == [(4, 0), (0, 5)]
+    assert len(autoslice.grid_frames(alpha, 4, 5, skip_empty=False)) == 6
+    assert autoslice.grid_frames(alpha, 20, 5) == []
+
+
+def test_region_frames_center_and_bottom_align():
+    assert autoslice.region_frames([[10, 4, 14, 20]], 8, 16) == [(8, 4)]
+    assert autoslice.region_frames([[0, 0, 2, 2]], 8, 8) == [(0, 0)]
+
+
+def test_alpha_channel_ignores_scanline_padding():
+    image = QImage(5, 3, QImage.Format_ARGB32)
+    image.fill(QColor(0, 0, 0, 0))
+    image.setPixelColor(4, 2, QColor(255, 255, 255, 200))
+
+    alpha = autoslice.alpha_channel(image)
+
+    assert alpha.shape == (3, 5)
+    assert alpha[2, 4] == 200
+    assert alpha.sum() == 200
@@ -0,0 +1,77 @@
+import os
+import tomllib
+
+import pytest
+
+import documentsaver
+
+
+def test_save_document_round_trip(tmp_path):
+    path = tmp_path / "stage.toml"
+    data = {
+        "name": 'a "quoted" name\n',
+        "chunk": "eJzt" + "A" * 100 + "==",
+        "layers": [{"name": "ground", "chunks": {"0,0": "x" * 80}}],
+    }
+
+    documentsaver.save_document(str(path), data)
+
+    text = path.read_text(encoding="utf-8")
+    assert tomllib.loads(text) == data
+    # Long safe strings are written as literal strings
+    assert "'eJzt" in text
+
+
+def test_write_atomic_replaces_the_file(tmp_path):
+    path = tmp_path / "actor.toml"
+    path.write_text("old", encoding="utf-8")
+
+    documentsaver.write_atomic(str(path), "new")
+
+    assert path.read_text(encoding="utf-8") == "new"
+    assert os.listdir(tmp_path) == ["actor.toml"]
+
+
+def test_failed_write_keeps_the_old_file(tmp_path, monkeypatch):
+    path = tmp_path / "actor.toml"
+    path.write_text("old", encoding="utf-8")
+
+    def fail(*args):
+        raise OSError("disk full")
+
+    monkeypatch.setattr(documentsaver.os, "fsync", fail)
+    with pytest.raises(OSError):
+        documentsaver.write_atomic(str(path), "new")
+
+    assert path.read_text(encoding="utf-8") == "old"
+    assert os.listdir(tmp_path) == ["actor.toml"]
+
+
+def test_failed_rename_removes_the_temp_file(tmp_path, monkeypatch):
+    path = tmp_path / "actor.toml"
+    path.write_text("old", encoding="utf-8")
+
+    def fail(*args):
+        raise KeyboardInterrupt()
+
+    monkeypatch.setattr(documentsaver.os, "replace", fail)
+    with pytest.raises(KeyboardInterrupt):
+        documentsaver.save_document(str(path), {"name": "new"})
+
+    assert path.read_text(encoding="utf-8") == "old"
+    assert os.listdir(tmp_path) == ["actor.toml"]
+
+
+def test_save_worker_reports_each_document(tmp_path):
+    good = tmp_path / "good.toml"
+    bad = tmp_path / "missing" / "bad.toml"
+    worker = documentsaver.SaveWorker([(str(good), {"a": 1}), (str(bad), {"b": 2})])
+    results = []
+    worker.saved.connect(lambda saved, seconds: results.extend(saved))
+
+    worker.run()
+
+    assert results[0] == (str(good), "")
+    assert results[1][0] == str(bad)
+    assert results[1][1].startswith("FileNotFoundError")
+    assert tomllib.loads(good.read_text(encoding="utf-8")) == {"a": 1}
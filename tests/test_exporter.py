@@ -0,0 +1,233 @@
+import os
+import zipfile
+
+import pytest
+import toml
+
+import exporter
+
+
+def project_files():
+    return {
+        "global/settings.toml": b'title = "test"\n',
+        "stages/start.toml": b'name = "start"\n',
+        "actors/hero.toml": b'name = "hero"\nspeed = 2\n',
+        "assets/hero.bin": bytes(range(256)) * 64,
+        "assets/sounds/step.bin": os.urandom(4096),
+    }
+
+
+def read_archive(project_path):
+    with zipfile.ZipFile(os.path.join(project_path, exporter.ARCHIVE_NAME)) as zip:
+        return {info.filename: zip.read(info) for info in zip.infolist() if not info.is_dir()}
+
+
+def test_export_writes_every_file(make_project):
+    files = project_files()
+    project_path = make_project(files)
+
+    stats = exporter.export_project(project_path, jobs=1)
+
+    archive = read_archive(project_path)
+    for path, data in files.items():
+        assert archive[path] == data
+    assert exporter.INDEX_NAME in archive
+    assert stats.reused == 0
+    assert stats.written == len(files) + 1
+
+
+def test_incremental_export_reuses_unchanged_entries(make_project):
+    project_path = make_project(project_files())
+    first = exporter.export_project(project_path, jobs=1)
+    before = read_archive(project_path)
+
+    second = exporter.export_project(project_path, jobs=1)
+
+    assert second.written == 0
+    assert second.reused == first.written
+    assert read_archive(project_path) == before
+
+
+def test_incremental_export_rewrites_changed_entries(make_project):
+    project_path = make_project(project_files())
+    exporter.export_project(project_path, jobs=1)
+
+    with open(os.path.join(project_path, "actors", "hero.toml"), "w", encoding="utf-8") as f:
+        f.write('name = "hero"\nspeed = 3\n')
+    stats = exporter.export_project(project_path, jobs=1)
+
+    assert stats.written == 1
+    assert read_archive(project_path)["actors/hero.toml"] == b'name = "hero"\nspeed = 3\n'
+
+
+def test_touched_file_with_same_content_is_reused(make_project):
+    project_path = make_project(project_files())
+    exporter.export_project(project_path, jobs=1)
+
+    path = os.path.join(project_path, "assets", "hero.bin")
+    st = os.stat(path)
+    os.utime(path, ns=(st.st_atime_ns, st.st_mtime_ns + 10**9))
+    stats = exporter.export_project(project_path, jobs=1)
+
+    assert stats.written == 0
+
+
+def test_full_export_ignores_the_manifest(make_project):
+    project_path = make_project(project_files())
+    first = exporter.export_project(project_path, jobs=1)
+
+    stats = exporter.export_project(project_path, incremental=False, jobs=1)
+
+    assert stats.reused == 0
+    assert stats.written == first.written
+
+
+def test_unreadable_previous_archive_means_a_full_rebuild(make_project):
+    files = project_files()
+    project_path = make_project(files)
+    first = exporter.export_project(project_path, jobs=1)
+
+    # Same size and mtime, so the manifest still trusts it
+    archive_path = os.path.join(project_path, exporter.ARCHIVE_NAME)
+    st = os.stat(archive_path)
+    with open(archive_path, "wb") as f:
+        f.write(bytes(st.st_size))
+    os.utime(archive_path, ns=(st.st_atime_ns, st.st_mtime_ns))
+    stats = exporter.export_project(project_path, jobs=1)
+
+    assert stats.reused == 0
+    assert stats.written == first.written
+    assert read_archive(project_path)["assets/hero.bin"] == files["assets/hero.bin"]
+
+def test_cancelled_export_keeps_the_previous_archive(make_project):
+    project_path = make_project(project_files())
+    exporter.export_project(project_path, jobs=1)
+    before = read_archive(project_path)
+
+    with open(os.path.join(project_path, "actors", "hero.toml"), "w", encoding="utf-8") as f:
+        f.write('name = "changed"\n')
+    with pytest.raises(exporter.ExportCancelled):
+        exporter.export_project(project_path, jobs=1, cancelled=lambda: True)
+
+    assert read_archive(project_path) == before
+    assert not os.path.exists(os.path.join(project_path, exporter.ARCHIVE_NAME + ".tmp"))
+    assert exporter.export_project(project_path, jobs=1).written == 1
+
+
+def archive_infos(project_path):
+    with zipfile.ZipFile(os.path.join(project_path, exporter.ARCHIVE_NAME)) as zip:
+        return {info.filename: info for info in zip.infolist()}
+
+
+def test_compression_policy_resolves_rules_in_order():
+    policy = exporter.CompressionPolicy(level=4, threshold=0.1, rules={"assets/music/*": "stored", "*.png": "deflate", "*.bin": 9})
+
+    assert policy.resolve("assets/music/theme.ogg") == "stored"
+    assert policy.resolve("assets/sounds/step.ogg") == "auto:4:0.1"
+    assert policy.resolve("assets/HERO.PNG") == "deflate:4"
+    assert policy.resolve("assets/hero.jpg") == "auto:4:0.1"
+    assert policy.resolve("assets/data.bin") == "deflate:9"
+    assert policy.resolve("stages/start.toml") == "deflate:4"
+    assert exporter.CompressionPolicy(level=0).resolve("stages/start.toml") == "stored"
+
+
+@pytest.mark.parametrize(
+    "config",
+    [
+        {"level": "deflate"},
+        {"level": 10},
+        {"level": True},
+        {"level": 6.0},
+        {"auto_threshold": 1},
+        {"auto_threshold": -0.1},
+        {"auto_threshold": "0.05"},
+        {"rules": {"*.png": "fast"}},
+        {"rules": {"*.png": 12}},
+        {"rules": {"*.png": True}},
+    ],
+)
+def test_invalid_compression_config_is_rejected(config):
+    with pytest.raises(ValueError):
+        exporter.load_compression_policy({"compression": config})
+
+
+def test_export_applies_the_compression_policy(make_project):
+    files = project_files()
+    files["assets/noise.png"] = os.urandom(8192)
+    files["assets/flat.png"] = bytes(8192)
+    project_path = make_project(files, '[compression]\nrules = { "actors/*" = "stored" }\n')
+
+    stats = exporter.export_project(project_path, jobs=1)
+
+    infos = archive_infos(project_path)
+    assert infos["assets/noise.png"].compress_type == zipfile.ZIP_STORED
+    assert infos["assets/flat.png"].compress_type == zipfile.ZIP_DEFLATED
+    assert infos["actors/hero.toml"].compress_type == zipfile.ZIP_STORED
+    assert infos["stages/start.toml"].compress_type == zipfile.ZIP_DEFLATED
+    assert infos[exporter.INDEX_NAME].compress_type == zipfile.ZIP_STORED
+    assert stats.choices["auto (stored)"].entries == 1
+    assert stats.choices["auto (deflated)"].entries == 1
+
+
+def test_policy_change_rewrites_reused_entries(make_project):
+    project_path = make_project(project_files())
+    exporter.export_project(project_path, jobs=1)
+
+    with open(os.path.join(project_path, "project.toml"), "a", encoding="utf-8") as f:
+        f.write('[compression]\nrules = { "actors/*" = "stored" }\n')
+    stats = exporter.export_project(project_path, jobs=1)
+
+    # project.toml itself changed too
+    assert stats.written == 2
+    assert archive_infos(project_path)["actors/hero.toml"].compress_type == zipfile.ZIP_STORED
+
+
+def read_aliases(project_path):
+    return toml.loads(read_archive(project_path)[exporter.ALIASES_NAME].decode("utf-8"))["aliases"]
+
+
+def test_identical_entries_are_stored_once(make_project):
+    files = project_files()
+    files["assets/later/copy.bin"] = files["assets/hero.bin"]
+    files["assets/other/copy.bin"] = files["assets/hero.bin"]
+    project_path = make_project(files)
+
+    stats = exporter.export_project(project_path, jobs=1)
+
+    archive = read_archive(project_path)
+    assert "assets/later/copy.bin" not in archive
+    # The first copy in scan order keeps the data
+    assert read_aliases(project_path) == {"assets/later/copy.bin": "assets/hero.bin", "assets/other/copy.bin": "assets/hero.bin"}
+    assert stats.deduplicated == 2
+
+    # Aliases are not in the index either, the runtime resolves them through arpg.aliases
+    assert b"assets/later/copy.bin" not in archive[exporter.INDEX_NAME]
+
+
+def test_aliases_survive_incremental_export(make_project):
+    files = project_files()
+    files["assets/later/copy.bin"] = files["assets/hero.bin"]
+    project_path = make_project(files)
+    exporter.export_project(project_path, jobs=1)
+
+    stats = exporter.export_project(project_path, jobs=1)
+
+    assert stats.written == 0
+    assert stats.deduplicated == 1
+    assert read_aliases(project_path) == {"assets/later/copy.bin": "assets/hero.bin"}
+
+
+def test_alias_becomes_an_entry_when_the_original_changes(make_project):
+    files = project_files()
+    files["assets/later/copy.bin"] = files["assets/hero.bin"]
+    project_path = make_project(files)
+    exporter.export_project(project_path, jobs=1)
+
+    with open(os.path.join(project_path, "assets", "hero.bin"), "wb") as f:
+        f.write(b"changed")
+    exporter.export_project(project_path, jobs=1)
+
+    archive = read_archive(project_path)
+    assert archive["assets/hero.bin"] == b"changed"
+    assert archive["assets/later/copy.bin"] == files["assets/later/copy.bin"]
+    assert exporter.ALIASES_NAME not in archive
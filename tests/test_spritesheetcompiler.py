@@ -0,0 +1,94 @@
+import struct
+
+import spritesheetcompiler
+
+
+def read_spritesheet(blob):
+    # Mirrors load_spritesheet_from_binary in engine_core/spritesheet.h, field by field
+    pos = 0
+
+    def read(fmt):
+        nonlocal pos
+        values = struct.unpack_from("<" + fmt, blob, pos)
+        pos += struct.calcsize("<" + fmt)
+        return values
+
+    def read_string():
+        nonlocal pos
+        (length,) = read("H")
+        pos += length
+        return blob[pos - length : pos].decode("utf-8")
+
+    magic, version, reserved, width, height = read("4sHHii")
+    sheet = {"magic": magic, "version": version, "reserved": reserved, "width": width, "height": height}
+    sheet["image_path"] = read_string()
+    sheet["states"] = {}
+
+    (state_count,) = read("I")
+    for _ in range(state_count):
+        name = read_string()
+        fps, frame_count = read("iI")
+        frames = read(f"{frame_count * 2}i")
+        sheet["states"][name] = {"fps": fps, "frames": [list(frames[i : i + 2]) for i in range(0, len(frames), 2)]}
+
+    assert pos == len(blob)
+    return sheet
+
+
+def test_binary_layout():
+    data = {"image_path": "a.png", "width": 32, "height": 48, "states": {"idle": {"fps": 4, "frames": [[0, 0], [32, -48]]}}}
+
+    blob = spritesheetcompiler.compile_spritesheet(data)
+
+    expected = (
+        b"ASPR" + struct.pack("<HHii", 1, 0, 32, 48)
+        + struct.pack("<H", 5) + b"a.png"
+        + struct.pack("<I", 1)
+        + struct.pack("<H", 4) + b"idle"
+        + struct.pack("<iI", 4, 2)
+        + struct.pack("<4i", 0, 0, 32, -48)
+    )
+    assert blob == expected
+
+
+def test_spritesheet_round_trip():
+    data = {
+        "image_path": "héros/walk.png",
+        "width": 24,
+        "height": 32,
+        "states": {
+            "walk_left": {"fps": 12, "frames": [[0, 0], [24, 0], [48, 0]]},
+            "idle": {"frames": [[0, 32]]},
+            "empty": {"fps": 1, "frames": []},
+        },
+    }
+
+    sheet = read_spritesheet(spritesheetcompiler.compile_spritesheet(data))
+
+    assert (sheet["magic"], sheet["version"], sheet["reserved"]) == (spritesheetcompiler.SPRITESHEET_MAGIC, spritesheetcompiler.SPRITESHEET_VERSION, 0)
+    assert (sheet["width"], sheet["height"], sheet["image_path"]) == (24, 32, "héros/walk.png")
+    assert list(sheet["states"]) == ["walk_left", "idle", "empty"]
+    assert sheet["states"]["walk_left"] == data["states"]["walk_left"]
+    # Same default as the TOML loader
+    assert sheet["states"]["idle"] == {"fps": 6, "frames": [[0, 32]]}
+    assert sheet["states"]["empty"] == {"fps": 1, "frames": []}
+
+
+def test_defaults_and_malformed_frames():
+    sheet = read_spritesheet(spritesheetcompiler.compile_spritesheet({"states": {"idle": {"frames": [[1, 2], [3], "x", [4, 5, 6], [7, 8]]}}}))
+
+    assert (sheet["width"], sheet["height"], sheet["image_path"]) == (16, 16, "")
+    assert sheet["states"]["idle"]["frames"] == [[1, 2], [7, 8]]
+
+
+def test_compile_spritesheets_replaces_the_toml():
+    sources = {
+        "spritesheets/": None,
+        "spritesheets/hero.toml": b'image_path = "hero.png"\nwidth = 8\nheight = 8\n',
+        "actors/hero.toml": b'name = "hero"\n',
+    }
+
+    result = spritesheetcompiler.compile_spritesheets(sources)
+
+    assert list(result) == ["spritesheets/", "spritesheets/hero.toml.bin", "actors/hero.toml"]
+    assert read_spritesheet(result["spritesheets/hero.toml.bin"])["image_path"] == "hero.png"
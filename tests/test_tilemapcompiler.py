@@ -0,0 +1,112 @@
+import tomllib
+
+import numpy as np
+import pytest
+import toml
+
+import spritesheetcompiler
+import tilemapcompiler
+from tilechunks import CHUNK_SIZE, chunk_name, decode_chunk, encode_chunk
+
+
+def make_chunks(rng):
+    # One chunk per codec the compiler can pick: flat, noise and mostly empty with some detail
+    detailed = np.zeros((CHUNK_SIZE, CHUNK_SIZE), dtype=np.uint32)
+    detailed[10:30, 5:60] = rng.integers(1, 4, (20, 55))
+    return {
+        (0, 0): np.full((CHUNK_SIZE, CHUNK_SIZE), 7, dtype=np.uint32),
+        (3, 1): rng.integers(0, 2**32, (CHUNK_SIZE, CHUNK_SIZE), dtype=np.uint32),
+        (1, 2): detailed,
+    }
+
+
+def make_stage(rng):
+    ground = make_chunks(rng)
+    decor = {(2, 2): rng.integers(0, 50, (CHUNK_SIZE, CHUNK_SIZE)).astype(np.uint32)}
+    stage = {
+        "name": "start",
+        "width": 256,
+        "height": 192,
+        "tile_size": 16,
+        "tileset": "tiles.png",
+        "layers": [
+            {"name": "ground", "visible": True, "chunks": {chunk_name(key): encode_chunk(ids) for key, ids in ground.items()}},
+            {"name": "decor", "visible": False, "chunks": {chunk_name(key): encode_chunk(ids) for key, ids in decor.items()}},
+        ],
+    }
+    return stage, [ground, decor]
+
+
+def test_editor_chunk_round_trip():
+    ids = np.random.default_rng(0).integers(0, 2**32, (CHUNK_SIZE, CHUNK_SIZE), dtype=np.uint32)
+
+    assert np.array_equal(decode_chunk(encode_chunk(ids)), ids)
+
+
+def test_compiled_chunks_decode_to_the_same_ids():
+    stage, layers = make_stage(np.random.default_rng(1))
+
+    blob = tilemapcompiler.compile_tilemap(stage)
+    tilemap = tilemapcompiler.read_tilemap(blob)
+
+    assert (tilemap["width"], tilemap["height"], tilemap["tile_size"], tilemap["chunk_size"]) == (256, 192, 16, CHUNK_SIZE)
+    assert tilemap["tileset"] == "tiles.png"
+    assert [(layer["name"], layer["visible"]) for layer in tilemap["layers"]] == [("ground", True), ("decor", False)]
+
+    for layer, chunks in zip(tilemap["layers"], layers):
+        assert set(layer["chunks"]) == set(chunks)
+        for key, ids in chunks.items():
+            assert np.array_equal(tilemapcompiler.read_tile_chunk(blob, tilemap, layer["chunks"][key]), ids)
+
+
+def test_each_chunk_gets_the_smallest_codec():
+    stage, _ = make_stage(np.random.default_rng(2))
+
+    tilemap = tilemapcompiler.read_tilemap(tilemapcompiler.compile_tilemap(stage))
+
+    codecs = {key: entry[0] for key, entry in tilemap["layers"][0]["chunks"].items()}
+    assert codecs == {(0, 0): tilemapcompiler.CODEC_RLE, (3, 1): tilemapcompiler.CODEC_RAW, (1, 2): tilemapcompiler.CODEC_DEFLATE}
+
+
+def test_negative_chunks_are_dropped_and_the_tileset_renamed():
+    ids = np.ones((CHUNK_SIZE, CHUNK_SIZE), dtype=np.uint32)
+    stage = {"tileset": "tiles.png", "layers": [{"name": "ground", "chunks": {"-1,0": encode_chunk(ids), "0,0": encode_chunk(ids)}}]}
+
+    tilemap = tilemapcompiler.read_tilemap(tilemapcompiler.compile_tilemap(stage, {"tiles.png": "tiles.png.qoi"}))
+
+    assert tilemap["tileset"] == "tiles.png.qoi"
+    assert list(tilemap["layers"][0]["chunks"]) == [(0, 0)]
+
+
+def test_compile_tilemaps_splits_stages_and_caches_them(tmp_path):
+    stage, layers = make_stage(np.random.default_rng(3))
+    sources = {
+        "stages/start.toml": toml.dumps(stage).encode("utf-8"),
+        "stages/empty.toml": b'name = "empty"\n',
+        "actors/hero.toml": b'name = "hero"\n',
+    }
+
+    result = tilemapcompiler.compile_tilemaps(sources, str(tmp_path), {"tiles.png": "tiles.png.qoi"})
+
+    assert result["stages/empty.toml"] == sources["stages/empty.toml"]
+    assert result["actors/hero.toml"] == sources["actors/hero.toml"]
+    assert "stages/empty.toml.tiles" not in result
+
+    rest = tomllib.loads(result["stages/start.toml"].decode("utf-8"))
+    assert "layers" not in rest
+    assert rest["tileset"] == "tiles.png.qoi"
+
+    blob = result["stages/start.toml.tiles"]
+    tilemap = tilemapcompiler.read_tilemap(blob)
+    assert np.array_equal(tilemapcompiler.read_tile_chunk(blob, tilemap, tilemap["layers"][1]["chunks"][(2, 2)]), layers[1][(2, 2)])
+
+    # The second run reads the cache, files of stages that are gone are removed
+    assert tilemapcompiler.compile_tilemaps(sources, str(tmp_path), {"tiles.png": "tiles.png.qoi"}) == result
+    tilemapcompiler.compile_tilemaps({}, str(tmp_path))
+    assert not list((tmp_path / "tilemaps").iterdir())
+
+
+def test_tilemaps_cannot_be_turned_off():
+    with pytest.raises(ValueError):
+        spritesheetcompiler.load_compile_settings({"compile": {"tilemaps": False}})
+    assert spritesheetcompiler.load_compile_settings({"compile": {"spritesheets": True}}) == {"spritesheets": True}
@@ -0,0 +1,181 @@
+import random
+import struct
+
+import pytest
+import toml
+from PySide6.QtCore import QBuffer, QByteArray, QIODevice
+from PySide6.QtGui import QColor, QImage
+
+import transcode
+
+
+def qoi_hash(px):
+    return (px[0] * 3 + px[1] * 5 + px[2] * 7 + px[3] * 11) % 64
+
+
+def reference_encode(width, height, pixels):
+    # Pixel by pixel, as in the QOI specification
+    out = bytearray(struct.pack(">4sIIBB", b"qoif", width, height, 4, 0))
+    index = [bytes(4)] * 64
+    previous = bytes((0, 0, 0, 255))
+    run = 0
+    count = width * height
+    for i in range(count):
+        px = pixels[i * 4 : i * 4 + 4]
+        if px == previous:
+            run += 1
+            if run == 62 or i == count - 1:
+                out.append(0xC0 | (run - 1))
+                run = 0
+            continue
+        if run:
+            out.append(0xC0 | (run - 1))
+            run = 0
+
+        h = qoi_hash(px)
+        if index[h] == px:
+            out.append(h)
+        else:
+            index[h] = px
+            if px[3] != previous[3]:
+                out += b"\xff" + px
+            else:
+                vr, vg, vb = ((px[c] - previous[c] + 128) % 256 - 128 for c in range(3))
+                if -2 <= vr <= 1 and -2 <= vg <= 1 and -2 <= vb <= 1:
+                    out.append(0x40 | (vr + 2) << 4 | (vg + 2) << 2 | (vb + 2))
+                elif -8 <= vr - vg <= 7 and -32 <= vg <= 31 and -8 <= vb - vg <= 7:
+                    out += bytes((0x80 | (vg + 32), (vr - vg + 8) << 4 | (vb - vg + 8)))
+                else:
+                    out += b"\xfe" + px[:3]
+        previous = px
+    return bytes(out) + b"\x00" * 7 + b"\x01"
+
+
+def reference_decode(data):
+    magic, width, height, channels, _ = struct.unpack_from(">4sIIBB", data)
+    assert (magic, channels) == (b"qoif", 4)
+    pos = 14
+    index = [bytes(4)] * 64
+    px = bytes((0, 0, 0, 255))
+    out = bytearray()
+    run = 0
+    for _ in range(width * height):
+        if run:
+            run -= 1
+        else:
+            b = data[pos]
+            pos += 1
+            if b == 0xFE:
+                px = data[pos : pos + 3] + px[3:]
+                pos += 3
+            elif b == 0xFF:
+                px = data[pos : pos + 4]
+                pos += 4
+            elif b >> 6 == 0:
+                px = index[b]
+            elif b >> 6 == 1:
+                px = bytes(((px[0] + (b >> 4 & 3) - 2) % 256, (px[1] + (b >> 2 & 3) - 2) % 256, (px[2] + (b & 3) - 2) % 256, px[3]))
+            elif b >> 6 == 2:
+                vg = (b & 63) - 32
+                b2 = data[pos]
+                pos += 1
+                px = bytes(((px[0] + vg - 8 + (b2 >> 4)) % 256, (px[1] + vg) % 256, (px[2] + vg - 8 + (b2 & 15)) % 256, px[3]))
+            else:
+                run = b & 63
+            index[qoi_hash(px)] = px
+        out += px
+    assert data[pos:] == b"\x00" * 7 + b"\x01"
+    return width, height, bytes(out)
+
+
+def sprite_pixels(rng, count):
+    # Runs of palette colors with small and large steps, transparent areas and alpha changes
+    palette = [bytes((rng.randrange(256), rng.randrange(256), rng.randrange(256), rng.choice((0, 128, 255)))) for _ in range(rng.choice((1, 4, 80)))]
+    palette += [bytes(4), bytes((0, 0, 0, 255))]
+    out = bytearray()
+    px = rng.choice(palette)
+    while len(out) < count * 4:
+        r = rng.random()
+        if r < 0.3:
+            px = rng.choice(palette)
+        elif r < 0.6:
+            step = rng.choice((2, 20, 40))
+            px = bytes([(px[c] + rng.randrange(-step, step)) % 256 for c in range(3)] + [px[3]])
+        out += px * rng.choice((1, 1, 2, 5, 61, 62, 63, 124, 200))
+    return bytes(out[: count * 4])
+
+
+@pytest.mark.parametrize("seed", range(25))
+def test_qoi_matches_the_reference_encoder(seed, monkeypatch):
+    rng = random.Random(seed)
+    width, height = rng.randrange(1, 80), rng.randrange(1, 50)
+    pixels = sprite_pixels(rng, width * height)
+    expected = reference_encode(width, height, pixels)
+
+    # Small blocks carry runs, the index and the previous pixel over block edges
+    for block in (1, 7, 62, 63, 100, transcode.QOI_BLOCK_PIXELS):
+        monkeypatch.setattr(transcode, "QOI_BLOCK_PIXELS", block)
+        assert transcode.encode_qoi(width, height, pixels) == expected
+
+    assert reference_decode(expected) == (width, height, pixels)
+
+
+def test_qoi_noise_round_trip():
+    rng = random.Random(0)
+    pixels = bytes(rng.randrange(256) for _ in range(64 * 64 * 4))
+
+    assert reference_decode(transcode.encode_qoi(64, 64, pixels)) == (64, 64, pixels)
+
+
+def test_qoi_long_runs():
+    pixels = bytes((0, 0, 0, 255)) * 200 + bytes((1, 2, 3, 4)) * 130
+
+    encoded = transcode.encode_qoi(330, 1, pixels)
+
+    assert encoded == reference_encode(330, 1, pixels)
+    assert reference_decode(encoded)[2] == pixels
+
+
+def png_bytes(width, height, color):
+    image = QImage(width, height, QImage.Format_ARGB32)
+    image.fill(color)
+    data = QByteArray()
+    buffer = QBuffer(data)
+    buffer.open(QIODevice.OpenModeFlag.WriteOnly)
+    image.save(buffer, "PNG")
+    buffer.close()
+    return bytes(data)
+
+
+def test_transcode_data_decodes_the_image():
+    data = png_bytes(5, 3, QColor(10, 20, 30, 255))
+
+    assert reference_decode(transcode.transcode_data(data, "qoi")) == (5, 3, bytes((10, 20, 30, 255)) * 15)
+    assert transcode.transcode_data(data, "rgba") == transcode.RGBA_HEADER.pack(b"RGBA", 5, 3) + bytes((10, 20, 30, 255)) * 15
+
+
+def test_transcode_images_renames_spritesheet_images(tmp_path):
+    sources = {
+        "spritesheets/hero.toml": toml.dumps({"image_path": "hero.png", "width": 8}).encode("utf-8"),
+        "assets/hero.png": png_bytes(8, 8, QColor(255, 0, 0, 255)),
+        "assets/unused.png": png_bytes(4, 4, QColor(0, 255, 0, 255)),
+    }
+
+    result, renames = transcode.transcode_images(sources, {"format": "qoi"}, str(tmp_path), jobs=1)
+
+    assert renames == {"hero.png": "hero.png.qoi"}
+    assert toml.loads(result["spritesheets/hero.toml"].decode("utf-8"))["image_path"] == "hero.png.qoi"
+    assert reference_decode(result["assets/hero.png.qoi"])[2] == bytes((255, 0, 0, 255)) * 64
+    assert "assets/unused.png.qoi" not in result
+    assert len(list((tmp_path / "transcode").iterdir())) == 1
+
+    # Only the rewritten spritesheet referred to the original
+    dropped = transcode.drop_replaced_images(result, renames)
+    assert "assets/hero.png" not in dropped
+    assert "assets/hero.png.qoi" in dropped
+    assert "assets/unused.png" in dropped
+
+
+def test_unknown_format_is_rejected():
+    with pytest.raises(ValueError):
+        transcode.load_transcode_settings({"transcode": {"format": "dds"}})